@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from backfill_utils import discover_transcripts, file_signature, get_projects_dir, parse_transcript_file, resume_index
+from bank_utils import get_bank_id
+from client_utils import HindsightClient, circuit_open
+from scoring_utils import decide
+from session_utils import get_live_turns
+from state_utils import get_state_dir, read_state, write_state
+from throttle_utils import PRIORITY_BACKGROUND, acquire
+from transcript_utils import parse_timestamp
+
+DEBUG = os.environ.get("HINDSIGHT_DEBUG", "").lower() in ("1", "true", "yes")
+
+CHECKPOINT_INTERVAL = 1.0  # seconds between checkpoint writes
+PROGRESS_INTERVAL = 10.0  # seconds between progress lines
+THROTTLE_WAIT = 300.0  # seconds a retain waits for a rate limiter token
+
+
+def debug(msg: str) -> None:
+    if DEBUG:
+        print(f"[hindsight-cc:backfill-transcripts] {msg}", file=sys.stderr)
+
+
+class Backfill:
+    """Bounded-concurrency retain pipeline fed by a process pool of transcript parsers."""
+
+    def __init__(self, args, checkpoint: dict, checkpoint_file: Path):
+        self.args = args
+        self.checkpoint = checkpoint
+        self.checkpoint_file = checkpoint_file
+        self.files = checkpoint.setdefault("files", {})
+        self.started = time.monotonic()
+        self.last_checkpoint = 0.0
+        self.last_progress = 0.0
+        self.stats = {
+            "files": 0,
+            "skipped_files": 0,
+            "turns": 0,
+            "would_retain": 0,
+            "failed_turns": 0,
+            "throttled_turns": 0,
+            "low_value_turns": 0,
+            "live_turns": 0,
+            "bytes_read": 0,
+            "bytes_before": 0,
+            "bytes_after": 0,
+        }
+
+    def save(self, force: bool = False) -> None:
+        if self.args.dry_run:
+            return
+        now = time.monotonic()
+        if force or now - self.last_checkpoint >= CHECKPOINT_INTERVAL:
+            write_state(self.checkpoint_file, self.checkpoint)
+            self.last_checkpoint = now
+
+    def throughput(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        turns = self.stats["would_retain"] if self.args.dry_run else self.stats["turns"]
+        verb = "Would retain" if self.args.dry_run else "Retained"
+        return (
+            f"{verb} {turns} turns from {self.stats['files']} files in {elapsed:.1f}s: "
+            f"{turns / elapsed:.1f} turns/sec, "
+            f"{self.stats['bytes_read'] / elapsed / 1_000_000:.2f} MB/sec read"
+        )
+
+    def progress(self) -> None:
+        now = time.monotonic()
+        if now - self.last_progress >= PROGRESS_INTERVAL:
+            print(self.throughput())
+            self.last_progress = now
+
+    async def produce(self, paths: list, queue: asyncio.Queue) -> None:
+        """Parse transcripts in the process pool and queue them for retaining."""
+        loop = asyncio.get_running_loop()
+        # Spawn rather than fork: the event loop already runs helper threads
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.args.workers, mp_context=context) as pool:
+            pending = set()
+            for path in paths:
+                pending.add(loop.run_in_executor(pool, parse_transcript_file, str(path)))
+                if len(pending) >= self.args.workers * 2:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for future in done:
+                        await self.enqueue(future, queue)
+            for future in asyncio.as_completed(pending):
+                await self.enqueue(future, queue)
+        for _ in range(self.args.concurrency):
+            await queue.put(None)
+
+    async def enqueue(self, future, queue: asyncio.Queue) -> None:
+        try:
+            parsed = await future
+        except Exception as e:
+            debug(f"Failed to parse transcript: {e}")
+            self.stats["skipped_files"] += 1
+            return
+        if parsed["bank_id"] is None:
+            debug(f"No working directory recorded, skipping {parsed['path']}")
+            self.stats["skipped_files"] += 1
+            return
+        if self.args.bank and parsed["bank_id"] != self.args.bank:
+            return
+        await queue.put(parsed)
+
+    async def consume(self, client, queue: asyncio.Queue) -> None:
+        """Retain the turns of one transcript at a time, in order."""
+        while True:
+            parsed = await queue.get()
+            if parsed is None:
+                return
+            await self.retain_file(client, parsed)
+
+    async def retain_file(self, client, parsed: dict) -> None:
+        path = parsed["path"]
+        signature = file_signature(Path(path))
+        start = resume_index(self.files.get(path), signature) or 0
+        record = {**signature, "bank_id": parsed["bank_id"], "turns_done": start, "complete": False}
+        self.files[path] = record
+        # Turns the hooks already retained; anything they shed or failed is backfilled
+        live_turns = get_live_turns(parsed["session_id"])
+
+        for index, turn in enumerate(parsed["turns"][start:], start):
+            if turn["timestamp"] in live_turns:
+                debug(f"Skipping turn {index} of {path}, retained live")
+                self.stats["live_turns"] += 1
+            elif decide(turn["score"], turn["document_id"]) == "skip":
+                debug(f"Skipping low-value turn {index} of {path} (score {turn['score']})")
+                self.stats["low_value_turns"] += 1
+            elif self.args.dry_run:
+                self.stats["would_retain"] += 1
+            else:
+                if not self.args.no_throttle and not await asyncio.to_thread(
+                    acquire, PRIORITY_BACKGROUND, debug, THROTTLE_WAIT
+                ):
+                    debug(f"No rate limiter token for turn {index} of {path} within {THROTTLE_WAIT:.0f}s")
+                    self.stats["throttled_turns"] += 1
+                    # Stop this file here so the next run retries from this turn
+                    self.save(force=True)
+                    return
+                try:
+                    await client.aretain(
+                        bank_id=parsed["bank_id"],
+                        content=turn["content"],
+                        timestamp=parse_timestamp(turn["timestamp"]),
+                        document_id=turn["document_id"],
+                        tags=turn["tags"],
+                        metadata=turn["metadata"],
+                    )
+                except Exception as e:
+                    debug(f"Failed to retain turn {index} of {path}: {e}")
+                    self.stats["failed_turns"] += 1
+                    # Stop this file here so the next run retries from this turn
+                    self.save(force=True)
+                    return
+                self.stats["turns"] += 1
+            record["turns_done"] = index + 1
+            self.save()
+            self.progress()
+
+        record["complete"] = True
+        self.stats["files"] += 1
+        self.stats["bytes_read"] += parsed["bytes"]
+        self.stats["bytes_before"] += parsed["bytes_before"]
+        self.stats["bytes_after"] += parsed["bytes_after"]
+        debug(f"Processed {len(parsed['turns']) - start} turns from {path} into {parsed['bank_id']}")
+        self.save()
+
+    async def run(self, paths: list) -> None:
+        client = None
+        if not self.args.dry_run:
+            client = HindsightClient(debug_callback=debug)
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.args.concurrency * 2)
+        try:
+            await asyncio.gather(
+                self.produce(paths, queue),
+                *(self.consume(client, queue) for _ in range(self.args.concurrency)),
+            )
+        finally:
+            self.save(force=True)
+            if client is not None:
+                await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Retain historical Claude Code transcripts into their project memory banks"
+    )
+    parser.add_argument(
+        "--projects-dir",
+        type=Path,
+        default=None,
+        help="Claude Code projects directory (default: ~/.claude/projects)",
+    )
+    parser.add_argument(
+        "--current-project",
+        action="store_true",
+        help="Only backfill transcripts that map to the current project's bank",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Maximum retains in flight (default: 4)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 2,
+        help="Transcript parser processes (default: CPU count)",
+    )
+    parser.add_argument(
+        "--no-throttle",
+        action="store_true",
+        help="Ignore the machine-wide rate limiter (e.g. for off-hours runs)",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Parse and report without retaining anything",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Discard saved progress and backfill every transcript again",
+    )
+
+    args = parser.parse_args()
+    args.concurrency = max(1, args.concurrency)
+    args.workers = max(1, args.workers)
+    args.bank = get_bank_id(debug_callback=debug) if args.current_project else None
+
+    projects_dir = args.projects_dir or get_projects_dir()
+    paths = discover_transcripts(projects_dir) if projects_dir.is_dir() else []
+    print(f"Found {len(paths)} transcripts in {projects_dir}")
+
+    checkpoint_file = get_state_dir() / "backfill.json"
+    checkpoint = {} if args.restart else read_state(checkpoint_file)
+
+    files = checkpoint.get("files", {})
+    paths = [path for path in paths if resume_index(files.get(str(path)), file_signature(path)) is not None]
+    print(f"{len(paths)} transcripts need backfilling")
+    if not paths:
+        return
+    if not args.dry_run and circuit_open(debug_callback=debug):
+        print("Hindsight server is failing; try again once it is back up", file=sys.stderr)
+        sys.exit(1)
+
+    backfill = Backfill(args, checkpoint, checkpoint_file)
+    try:
+        asyncio.run(backfill.run(paths))
+    except KeyboardInterrupt:
+        backfill.save(force=True)
+        print("\nInterrupted; progress saved. Re-run the same command to resume.", file=sys.stderr)
+        sys.exit(130)
+
+    stats = backfill.stats
+    print(backfill.throughput())
+    if stats["bytes_before"]:
+        print(f"Compaction: {stats['bytes_before']} -> {stats['bytes_after']} bytes of turn text")
+    if stats["low_value_turns"]:
+        print(f"Scoring: skipped {stats['low_value_turns']} low-value turns")
+    if stats["live_turns"]:
+        print(f"Skipped {stats['live_turns']} turns already retained by the live hooks")
+    if stats["skipped_files"] or stats["failed_turns"] or stats["throttled_turns"]:
+        print(
+            f"Skipped {stats['skipped_files']} unreadable transcripts, "
+            f"{stats['failed_turns']} failed and {stats['throttled_turns']} throttled retains (re-run to retry)"
+        )
+    if args.dry_run:
+        print("Dry run: nothing was retained.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Shared utilities for backfilling historical Claude Code transcripts.
+
+Claude Code keeps one JSONL transcript per session under ~/.claude/projects. The
+plugin only ever retains the last turn of the live session, so sessions from before
+the plugin was installed never reach Hindsight. These helpers discover historical
+transcripts, map each one to its memory bank through bank_utils using the working
+directory recorded in the transcript, split it into compacted turns, and track
+per-file progress so an interrupted backfill resumes where it stopped.
+
+parse_transcript_file() is self-contained so backfill-transcripts.py can run it in
+a process pool.
+"""
+
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional
+
+from bank_utils import get_bank_id, get_project_dir
+from metadata_utils import build_retain_metadata, extract_touched_paths, transcript_branch
+from scoring_utils import score_turn
+from transcript_utils import format_turn, split_turns
+
+
+def get_projects_dir() -> Path:
+    """
+    Return the directory where Claude Code stores session transcripts.
+
+    Honours CLAUDE_CONFIG_DIR, defaulting to ~/.claude/projects.
+    """
+    config_dir = os.environ.get("CLAUDE_CONFIG_DIR") or str(Path.home() / ".claude")
+    return Path(config_dir) / "projects"
+
+
+def discover_transcripts(projects_dir: Path) -> List[Path]:
+    """
+    Find session transcripts, oldest first.
+
+    Args:
+        projects_dir: Claude Code projects directory
+
+    Returns:
+        Paths of <project>/<session>.jsonl files sorted by modification time
+    """
+    paths = [path for path in projects_dir.glob("*/*.jsonl") if path.is_file()]
+    return sorted(paths, key=lambda path: path.stat().st_mtime)
+
+
+def file_signature(path: Path) -> dict:
+    """Return the size and modification time used to detect changed transcripts."""
+    stat = path.stat()
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def resume_index(record: Optional[dict], signature: dict) -> Optional[int]:
+    """
+    Return the first turn still to retain for a transcript, or None if it is done.
+
+    Transcripts are append-only, so a file that only grew since the last run
+    resumes after the turns already retained; the last of those is retained again
+    in case it was still in progress, which is safe because turns are retained
+    with a stable document ID. A file that shrank was rewritten and starts over.
+
+    Args:
+        record: Checkpoint record for the file, if any
+        signature: Current file_signature() of the file
+
+    Returns:
+        Turn index to resume from, or None if the file needs no work
+    """
+    if not record:
+        return 0
+    if signature["size"] < record.get("size", 0):
+        return 0
+    if record.get("complete") and signature == {"size": record.get("size"), "mtime": record.get("mtime")}:
+        return None
+    done = record.get("turns_done", 0)
+    return max(done - 1, 0) if record.get("complete") else done
+
+
+@lru_cache(maxsize=None)
+def _bank_id_for(cwd: str) -> str:
+    """Cache bank IDs per working directory; each lookup runs git twice."""
+    return get_bank_id(cwd=cwd)
+
+
+@lru_cache(maxsize=None)
+def _project_dir_for(cwd: str) -> str:
+    return get_project_dir(cwd=cwd)
+
+
+def _read_entries(path: Path) -> List[dict]:
+    """Read transcript entries, skipping lines that are not valid JSON (e.g. a truncated last line)."""
+    entries = []
+    with open(path, "r", errors="replace") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(entry, dict):
+                entries.append(entry)
+    return entries
+
+
+def parse_transcript_file(path: str) -> dict:
+    """
+    Parse a historical transcript into compacted turns ready to retain.
+
+    Args:
+        path: Path to a session transcript
+
+    Returns:
+        Dict with "path", "bank_id" (None if no working directory is recorded),
+        "session_id", "bytes" (file size), "bytes_before"/"bytes_after"
+        (formatted turn text before and after compaction) and "turns", a list of
+        dicts with "content", "timestamp", "document_id", "score" (see
+        scoring_utils.score_turn), and "tags" and "metadata" (see
+        metadata_utils.build_retain_metadata)
+    """
+    file_path = Path(path)
+    entries = _read_entries(file_path)
+
+    cwd = next((entry["cwd"] for entry in entries if entry.get("cwd")), None)
+    session_id = next((entry["sessionId"] for entry in entries if entry.get("sessionId")), file_path.stem)
+
+    project_dir = _project_dir_for(cwd) if cwd else None
+    turns = []
+    bytes_before = bytes_after = 0
+    for index, turn in enumerate(split_turns(entries)):
+        content, before, after = format_turn(turn)
+        tags, metadata = build_retain_metadata(
+            branch=transcript_branch(turn),
+            paths=extract_touched_paths(turn, project_dir) if project_dir else [],
+            session_id=session_id,
+            timestamp=turn[0].get("timestamp"),
+        )
+        bytes_before += before
+        bytes_after += after
+        turns.append(
+            {
+                "content": content,
+                "timestamp": turn[0].get("timestamp"),
+                "document_id": f"transcript-{session_id}-{index}",
+                "score": score_turn(turn, after)[0],
+                "tags": tags,
+                "metadata": metadata,
+            }
+        )
+
+    return {
+        "path": path,
+        "bank_id": _bank_id_for(cwd) if cwd else None,
+        "session_id": session_id,
+        "bytes": file_path.stat().st_size,
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "turns": turns,
+    }
@@ -13,12 +13,16 @@ from pathlib import Path
 from typing import Callable, Optional
 
 
-def get_project_dir() -> str:
+def get_project_dir(cwd: Optional[str] = None) -> str:
     """
     Auto-detect project directory
 
     Tries to find git repository root first, falls back to current working directory.
 
+    Args:
+        cwd: Optional directory to detect from instead of the process working
+            directory (e.g. the cwd recorded in a historical transcript)
+
     Returns:
         Absolute path to project directory
 
@@ -28,8 +32,11 @@ def get_project_dir() -> str:
     """
     try:
         # Try to get git repository root
+        command = ["git", "rev-parse", "--show-toplevel"]
+        if cwd:
+            command[1:1] = ["-C", cwd]
         result = subprocess.run(
-            ["git", "rev-parse", "--show-toplevel"],
+            command,
             capture_output=True,
             text=True,
             timeout=2,
@@ -45,7 +52,7 @@ def get_project_dir() -> str:
         pass
 
     # Fall back to current working directory
-    return os.getcwd()
+    return cwd or os.getcwd()
 
 
 def get_git_remote_id(project_dir: str) -> Optional[str]:
@@ -151,7 +158,10 @@ def get_path_based_id(project_dir: str) -> str:
         return "unknown-unknown"
 
 
-def get_bank_id(debug_callback: Optional[Callable[[str], None]] = None) -> str:
+def get_bank_id(
+    debug_callback: Optional[Callable[[str], None]] = None,
+    cwd: Optional[str] = None,
+) -> str:
     """
     Generate bank ID for Hindsight memory storage.
 
@@ -164,6 +174,8 @@ def get_bank_id(debug_callback: Optional[Callable[[str], None]] = None) -> str:
 
     Args:
         debug_callback: Optional function to call with debug messages
+        cwd: Optional directory to detect the project from (defaults to the
+            process working directory)
 
     Returns:
         Bank ID string with "claude-code--" prefix
@@ -181,7 +193,7 @@ def get_bank_id(debug_callback: Optional[Callable[[str], None]] = None) -> str:
 
     # Auto-detect project directory
     try:
-        project_dir = get_project_dir()
+        project_dir = get_project_dir(cwd) if cwd else get_project_dir()
         debug(f"Detected project directory: {project_dir}")
     except Exception as e:
         debug(f"Failed to detect project directory: {e}")
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Machine-wide circuit breaker for Hindsight server calls.
+
+When the Hindsight server is down or overloaded, every hook in every session would
+otherwise wait for its own connection error or timeout. The breaker state lives in
+the plugin state directory, so once one process has seen enough consecutive
+failures, all of them skip their calls immediately:
+
+- "closed": calls go through; consecutive failures are counted.
+- "open": after HINDSIGHT_BREAKER_THRESHOLD consecutive failures, calls are
+  short-circuited for HINDSIGHT_BREAKER_COOLDOWN seconds.
+- "half_open": after the cool-down, a single process is allowed a probe call.
+  Its success closes the circuit; its failure opens it for another cool-down.
+
+is_open() answers the same question as allow() from a plain read, so scripts can
+skip rate limiting and client setup while the circuit is open.
+
+Each server URL has its own circuit. Transitions are kept for get-status.py and
+reported through the debug callback.
+"""
+
+import os
+import time
+from typing import Callable, Optional, Tuple
+
+from state_utils import get_state_dir, locked_state, read_state
+
+STATE_NAME = "breaker"
+
+DEFAULT_THRESHOLD = 5  # consecutive failures before opening
+DEFAULT_COOLDOWN = 30.0  # seconds to short-circuit before probing
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+MAX_TRANSITIONS = 20
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the server while the circuit is open."""
+
+
+def get_breaker_config() -> Tuple[int, float]:
+    """
+    Return the configured (threshold, cooldown).
+
+    HINDSIGHT_BREAKER_THRESHOLD sets the consecutive failures that open the
+    circuit (0 disables the breaker) and HINDSIGHT_BREAKER_COOLDOWN the seconds
+    to wait before probing. Invalid or negative values fall back to the defaults.
+    """
+    try:
+        threshold = int(os.environ.get("HINDSIGHT_BREAKER_THRESHOLD", DEFAULT_THRESHOLD))
+    except ValueError:
+        threshold = DEFAULT_THRESHOLD
+    try:
+        cooldown = float(os.environ.get("HINDSIGHT_BREAKER_COOLDOWN", DEFAULT_COOLDOWN))
+    except ValueError:
+        cooldown = DEFAULT_COOLDOWN
+    if threshold < 0:
+        threshold = DEFAULT_THRESHOLD
+    if cooldown < 0:
+        cooldown = DEFAULT_COOLDOWN
+    return threshold, cooldown
+
+
+def _circuit(state: dict, endpoint: str) -> dict:
+    return state.setdefault("circuits", {}).setdefault(
+        endpoint, {"state": CLOSED, "failures": 0, "opened_at": None, "short_circuited": 0, "transitions": []}
+    )
+
+
+def _transition(circuit: dict, new_state: str, reason: str, now: float, debug) -> None:
+    old_state = circuit["state"]
+    circuit["state"] = new_state
+    circuit["transitions"] = (
+        circuit["transitions"] + [{"at": now, "from": old_state, "to": new_state, "reason": reason}]
+    )[-MAX_TRANSITIONS:]
+    debug(f"Circuit breaker {old_state} -> {new_state}: {reason}")
+
+
+def allow(endpoint: str, debug_callback: Optional[Callable[[str], None]] = None) -> bool:
+    """
+    Decide whether a call to the server may be made.
+
+    While the circuit is open, calls are refused until the cool-down has passed;
+    then the first caller becomes the half-open probe and the rest keep being
+    refused until the probe reports back (or takes longer than a cool-down, in
+    which case the next caller probes instead).
+
+    Args:
+        endpoint: Server base URL
+        debug_callback: Optional function to call with debug messages
+
+    Returns:
+        True if the call may proceed, False if it should be short-circuited
+    """
+
+    def debug(msg: str):
+        if debug_callback:
+            debug_callback(msg)
+
+    threshold, cooldown = get_breaker_config()
+    if threshold <= 0:
+        return True
+
+    try:
+        with locked_state(STATE_NAME) as state:
+            circuit = _circuit(state, endpoint)
+            if circuit["state"] == CLOSED:
+                return True
+            now = time.time()
+            since = now - (circuit["opened_at"] or 0)
+            if since >= cooldown:
+                if circuit["state"] == OPEN:
+                    _transition(circuit, HALF_OPEN, "cool-down elapsed, probing", now, debug)
+                else:
+                    debug("Previous probe did not report back, probing again")
+                circuit["opened_at"] = now
+                return True
+            circuit["short_circuited"] += 1
+            debug(f"Circuit {circuit['state']}, skipping call (next probe in {cooldown - since:.0f}s)")
+            return False
+    except OSError as e:
+        # The breaker is best-effort; never block a call on state file errors
+        debug(f"Circuit breaker unavailable: {e}")
+        return True
+
+
+def is_open(endpoint: str, debug_callback: Optional[Callable[[str], None]] = None) -> bool:
+    """
+    Return whether calls to the server are being short-circuited.
+
+    Unlike allow(), this reads the state without taking the lock and never starts
+    a probe: once the cool-down has passed it returns False and leaves the probe
+    to the call's own allow(). Refusals are still counted as short-circuited.
+
+    Args:
+        endpoint: Server base URL
+        debug_callback: Optional function to call with debug messages
+
+    Returns:
+        True if a call made now would be short-circuited
+    """
+    threshold, cooldown = get_breaker_config()
+    if threshold <= 0:
+        return False
+    circuit = read_state(get_state_dir() / f"{STATE_NAME}.json").get("circuits", {}).get(endpoint)
+    if not circuit or circuit.get("state") == CLOSED:
+        return False
+    since = time.time() - (circuit.get("opened_at") or 0)
+    if since >= cooldown:
+        return False
+    try:
+        with locked_state(STATE_NAME) as state:
+            _circuit(state, endpoint)["short_circuited"] += 1
+    except OSError:
+        pass
+    if debug_callback:
+        debug_callback(f"Circuit {circuit['state']}, skipping call (next probe in {cooldown - since:.0f}s)")
+    return True
+
+
+def record_result(endpoint: str, success: bool, debug_callback: Optional[Callable[[str], None]] = None) -> None:
+    """
+    Record the outcome of a call allowed by allow().
+
+    Args:
+        endpoint: Server base URL
+        success: Whether the server answered (including client errors such as 404)
+        debug_callback: Optional function to call with debug messages
+    """
+
+    def debug(msg: str):
+        if debug_callback:
+            debug_callback(msg)
+
+    threshold, _ = get_breaker_config()
+    if threshold <= 0:
+        return
+
+    try:
+        with locked_state(STATE_NAME) as state:
+            circuit = _circuit(state, endpoint)
+            now = time.time()
+            if success:
+                circuit["failures"] = 0
+                if circuit["state"] != CLOSED:
+                    _transition(circuit, CLOSED, "probe succeeded", now, debug)
+                    circuit["opened_at"] = None
+                return
+            circuit["failures"] += 1
+            if circuit["state"] == HALF_OPEN:
+                _transition(circuit, OPEN, "probe failed", now, debug)
+                circuit["opened_at"] = now
+            elif circuit["state"] == CLOSED and circuit["failures"] >= threshold:
+                _transition(circuit, OPEN, f"{circuit['failures']} consecutive failures", now, debug)
+                circuit["opened_at"] = now
+    except OSError as e:
+        debug(f"Circuit breaker unavailable: {e}")
+
+
+def get_status(endpoint: str) -> dict:
+    """
+    Return the circuit for an endpoint.
+
+    Returns:
+        Dict with "state", "failures", "opened_at", "short_circuited",
+        "transitions" (most recent last), "threshold" and "cooldown"
+    """
+    threshold, cooldown = get_breaker_config()
+    with locked_state(STATE_NAME) as state:
+        circuit = dict(_circuit(state, endpoint))
+    circuit["threshold"] = threshold
+    circuit["cooldown"] = cooldown
+    return circuit
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+import json
+import os
+import sys
+from session_utils import end_session, prune_sessions, reset_injected
+
+DEBUG = os.environ.get("HINDSIGHT_DEBUG", "").lower() in ("1", "true", "yes")
+
+
+def debug(msg: str) -> None:
+    if DEBUG:
+        print(f"[hindsight-cc:cleanup-session] {msg}", file=sys.stderr)
+
+
+def main():
+    debug("Starting")
+
+    try:
+        input_data = json.load(sys.stdin)
+        debug(f"Received input keys: {list(input_data.keys())}")
+    except Exception as e:
+        debug(f"Failed to parse input: {e}")
+        return
+
+    session_id = input_data.get("session_id")
+    event = input_data.get("hook_event_name", "")
+    if not session_id:
+        debug("No session_id provided")
+        return
+
+    try:
+        if event == "SessionEnd":
+            end_session(session_id)
+            debug(f"Removed state for session {session_id}")
+            pruned = prune_sessions()
+            if pruned:
+                debug(f"Pruned state of {pruned} abandoned sessions")
+        elif event == "SessionStart" and input_data.get("source") == "compact":
+            # Memories injected before compaction are no longer in context
+            reset_injected(session_id)
+            debug(f"Reset injected memories for compacted session {session_id}")
+    except OSError as e:
+        debug(f"Failed to clean up session state: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Shared Hindsight client for the plugin scripts.
+
+Every script talks to the same Hindsight server, so the endpoint, timeouts and HTTP
+session setup live here instead of in each script. HindsightClient wraps the
+hindsight_client SDK with:
+
+- a configurable base URL (HINDSIGHT_URL), so a team can point every session at a
+  shared server instead of the local container
+- per-operation timeouts (HINDSIGHT_TIMEOUT_<OPERATION>), so a slow reflect does not
+  share a deadline with a recall that runs while the user waits
+- one pooled keep-alive HTTP session per client, so scripts that make several calls
+  (backfill, maintenance) reuse connections instead of reconnecting for each one
+- optional gzip of large retain payloads (HINDSIGHT_GZIP_MIN_BYTES), for servers or
+  proxies that accept gzip-encoded request bodies
+- the machine-wide circuit breaker from breaker_utils, so calls fail fast with
+  CircuitOpenError while the server is known to be down; scripts check
+  circuit_open() first to skip rate limiting and client setup as well
+
+Connection reuse and compression stats are reported through the debug callback when
+the client is closed.
+"""
+
+import asyncio
+import gzip
+import os
+from typing import Callable, Optional
+
+from breaker_utils import CircuitOpenError, allow, is_open, record_result
+
+DEFAULT_BASE_URL = "http://localhost:8888"
+
+# Seconds allowed per operation; interactive recalls fail fast, reflect may take minutes
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_TIMEOUTS = {
+    "recall": 30.0,
+    "retain": 120.0,
+    "reflect": 300.0,
+}
+
+POOL_SIZE = 8
+KEEPALIVE_SECONDS = 30.0
+
+
+def get_base_url() -> str:
+    """
+    Return the Hindsight server URL.
+
+    Uses HINDSIGHT_URL when set, otherwise the local container on port 8888.
+
+    Returns:
+        Base URL without a trailing slash
+    """
+    return (os.environ.get("HINDSIGHT_URL") or DEFAULT_BASE_URL).rstrip("/")
+
+
+def get_timeout(operation: str) -> float:
+    """
+    Return the timeout in seconds for an operation.
+
+    Read from HINDSIGHT_TIMEOUT_<OPERATION> (e.g. HINDSIGHT_TIMEOUT_RECALL), falling
+    back to DEFAULT_TIMEOUTS and then DEFAULT_TIMEOUT. Invalid or non-positive values
+    are ignored.
+
+    Args:
+        operation: Operation name such as "recall", "retain" or "reflect"
+
+    Returns:
+        Timeout in seconds
+    """
+    default = DEFAULT_TIMEOUTS.get(operation, DEFAULT_TIMEOUT)
+    value = os.environ.get(f"HINDSIGHT_TIMEOUT_{operation.upper()}")
+    if value:
+        try:
+            timeout = float(value)
+            if timeout > 0:
+                return timeout
+        except ValueError:
+            pass
+    return default
+
+
+def get_gzip_min_bytes() -> int:
+    """
+    Return the retain payload size above which request bodies are gzipped.
+
+    Read from HINDSIGHT_GZIP_MIN_BYTES. Unset, invalid or 0 disables compression,
+    since the server must accept Content-Encoding: gzip request bodies.
+
+    Returns:
+        Minimum payload size in bytes, or 0 if compression is disabled
+    """
+    try:
+        return max(0, int(os.environ.get("HINDSIGHT_GZIP_MIN_BYTES", "0")))
+    except ValueError:
+        return 0
+
+
+def circuit_open(base_url: Optional[str] = None, debug_callback: Optional[Callable[[str], None]] = None) -> bool:
+    """
+    Return whether the circuit breaker is short-circuiting calls to the server.
+
+    Cheap enough to run before throttle_utils.acquire() and client construction,
+    so a hook can return at once while the server is known to be down.
+
+    Args:
+        base_url: Server URL (default: get_base_url())
+        debug_callback: Optional function to call with debug messages
+    """
+    return is_open((base_url or get_base_url()).rstrip("/"), debug_callback=debug_callback)
+
+
+def is_server_failure(error: Exception) -> bool:
+    """
+    Return whether an error means the server is unavailable.
+
+    Connection errors, timeouts, 5xx and 429 responses count against the circuit
+    breaker; other HTTP errors (e.g. 404 for a new bank) mean the server answered.
+    """
+    status = getattr(error, "status", None)
+    if isinstance(status, int) and 0 < status < 500:
+        return status == 429
+    return True
+
+
+class HindsightClient:
+    """
+    Hindsight client with a pooled keep-alive session and per-operation timeouts.
+
+    Offers async methods (arecall, aretain, ...) for scripts that run their own event
+    loop and sync equivalents (recall, retain, ...) that run on a private loop. Use
+    one style per instance: the HTTP session is bound to the loop that first uses it.
+
+    Examples:
+        client = HindsightClient(debug_callback=debug)
+        try:
+            response = client.recall(bank_id=bank_id, query=prompt)
+        finally:
+            client.close()
+    """
+
+    def __init__(self, base_url: Optional[str] = None, debug_callback: Optional[Callable[[str], None]] = None):
+        self.base_url = (base_url or get_base_url()).rstrip("/")
+        # Skip importing and setting up the SDK while the server is known to be down
+        if is_open(self.base_url, debug_callback=debug_callback):
+            raise CircuitOpenError(f"Hindsight server at {self.base_url} is failing, not connecting")
+
+        from hindsight_client import Hindsight
+
+        self.gzip_min_bytes = get_gzip_min_bytes()
+        self._debug = debug_callback
+        # The SDK's own deadline only backstops the per-operation timeouts
+        longest = max(map(get_timeout, [*DEFAULT_TIMEOUTS, "list", "update"]))
+        self._client = Hindsight(base_url=self.base_url, timeout=longest)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session_attached = False
+        self.stats = {
+            "requests": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "compressed_requests": 0,
+            "bytes_uncompressed": 0,
+            "bytes_compressed": 0,
+        }
+
+    def debug(self, msg: str) -> None:
+        if self._debug:
+            self._debug(msg)
+
+    # Session setup
+
+    def _attach_session(self) -> None:
+        """
+        Give the SDK's REST client a keep-alive session that reports connection reuse.
+
+        The generated REST client creates its aiohttp session lazily on first use, so
+        installing ours beforehand replaces it. If the SDK internals differ (older or
+        newer versions), the SDK's default session is used and stats stay at zero.
+        """
+        if self._session_attached:
+            return
+        self._session_attached = True
+
+        rest_client = getattr(getattr(self._client, "_api_client", None), "rest_client", None)
+        if rest_client is None or getattr(rest_client, "_pool_manager", True) is not None:
+            self.debug("Using the SDK's default HTTP session")
+            return
+
+        import aiohttp
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._on_request_start)
+        trace.on_connection_create_end.append(self._on_connection_create_end)
+        trace.on_connection_reuseconn.append(self._on_connection_reuseconn)
+
+        kwargs = {}
+        if self.gzip_min_bytes:
+            if hasattr(aiohttp.ClientRequest, "update_body"):
+                kwargs["middlewares"] = (self._gzip_middleware,)
+            else:
+                self.debug("Installed aiohttp does not support client middlewares, not compressing retains")
+
+        connector = aiohttp.TCPConnector(limit=POOL_SIZE, keepalive_timeout=KEEPALIVE_SECONDS)
+        rest_client._pool_manager = aiohttp.ClientSession(
+            connector=connector,
+            trust_env=True,
+            trace_configs=[trace],
+            **kwargs,
+        )
+
+    async def _on_request_start(self, session, context, params) -> None:
+        self.stats["requests"] += 1
+
+    async def _on_connection_create_end(self, session, context, params) -> None:
+        self.stats["connections_created"] += 1
+
+    async def _on_connection_reuseconn(self, session, context, params) -> None:
+        self.stats["connections_reused"] += 1
+
+    async def _gzip_middleware(self, request, handler):
+        """Gzip retain request bodies of at least gzip_min_bytes."""
+        if request.method == "POST" and request.url.path.endswith("/memories"):
+            raw = await request.body.as_bytes()
+            if len(raw) >= self.gzip_min_bytes:
+                compressed = gzip.compress(raw)
+                await request.update_body(compressed)
+                request.headers["Content-Encoding"] = "gzip"
+                self.stats["compressed_requests"] += 1
+                self.stats["bytes_uncompressed"] += len(raw)
+                self.stats["bytes_compressed"] += len(compressed)
+        return await handler(request)
+
+    async def _guarded(self, operation: str, make_call: Callable):
+        """Run a server call under the circuit breaker and the operation's timeout."""
+        if not allow(self.base_url, debug_callback=self._debug):
+            raise CircuitOpenError(f"Hindsight server at {self.base_url} is failing, skipping {operation}")
+        self._attach_session()
+        try:
+            result = await asyncio.wait_for(make_call(), timeout=get_timeout(operation))
+        except Exception as e:
+            record_result(self.base_url, success=not is_server_failure(e), debug_callback=self._debug)
+            raise
+        record_result(self.base_url, success=True, debug_callback=self._debug)
+        return result
+
+    async def _call(self, operation: str, method: str, **kwargs):
+        return await self._guarded(operation, lambda: getattr(self._client, method)(**kwargs))
+
+    # Async interface
+
+    async def arecall(self, bank_id: str, query: str, **kwargs):
+        """Recall memories relevant to a query."""
+        return await self._call("recall", "arecall", bank_id=bank_id, query=query, **kwargs)
+
+    async def aretain(self, bank_id: str, content: str, **kwargs):
+        """Retain content into a bank."""
+        return await self._call("retain", "aretain", bank_id=bank_id, content=content, **kwargs)
+
+    async def areflect(self, bank_id: str, query: str, **kwargs):
+        """Reflect on a query using the bank's memories."""
+        return await self._call("reflect", "areflect", bank_id=bank_id, query=query, **kwargs)
+
+    async def alist_memories(self, bank_id: str, **kwargs):
+        """List one page of memories in a bank."""
+        return await self._call("list", "alist_memories", bank_id=bank_id, **kwargs)
+
+    async def ainvalidate_memory(self, bank_id: str, memory_id: str, reason: str):
+        """Mark a memory as invalidated so it is no longer recalled."""
+        from hindsight_client_api.models.update_memory_request import UpdateMemoryRequest
+
+        request = UpdateMemoryRequest(state="invalidated", reason=reason)
+        return await self._guarded("update", lambda: self._client.memory.update_memory(bank_id, memory_id, request))
+
+    async def aclose(self) -> None:
+        """Close the HTTP session and report connection and compression stats."""
+        await self._client.aclose()
+        stats = self.stats
+        if stats["requests"]:
+            self.debug(
+                f"HTTP pool: {stats['requests']} requests over {stats['connections_created']} connections "
+                f"({stats['connections_reused']} reused) to {self.base_url}"
+            )
+        if stats["compressed_requests"]:
+            self.debug(
+                f"Gzipped {stats['compressed_requests']} retain payloads: "
+                f"{stats['bytes_uncompressed']} -> {stats['bytes_compressed']} bytes"
+            )
+
+    # Sync interface
+
+    def _run(self, coro):
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coro)
+
+    def recall(self, bank_id: str, query: str, **kwargs):
+        """Recall memories relevant to a query."""
+        return self._run(self.arecall(bank_id, query, **kwargs))
+
+    def retain(self, bank_id: str, content: str, **kwargs):
+        """Retain content into a bank."""
+        return self._run(self.aretain(bank_id, content, **kwargs))
+
+    def reflect(self, bank_id: str, query: str, **kwargs):
+        """Reflect on a query using the bank's memories."""
+        return self._run(self.areflect(bank_id, query, **kwargs))
+
+    def list_memories(self, bank_id: str, **kwargs):
+        """List one page of memories in a bank."""
+        return self._run(self.alist_memories(bank_id, **kwargs))
+
+    def close(self) -> None:
+        """Close the HTTP session and the private event loop."""
+        if self._loop is None:
+            return
+        try:
+            self._run(self.aclose())
+        finally:
+            self._loop.close()
+            self._loop = None
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+import os
+import sys
+from typing import Tuple
+from client_utils import HindsightClient, circuit_open
+from retain_queue_utils import (
+    KIND_PROMPT,
+    KIND_TRANSCRIPT,
+    claim_drainer,
+    pending_count,
+    pop_retain,
+    record_sent,
+    release_drainer,
+    requeue_retain,
+    start_drainer,
+)
+from session_utils import record_live_turn, record_retained_hash
+from throttle_utils import PRIORITY_BACKGROUND, acquire
+
+DEBUG = os.environ.get("HINDSIGHT_DEBUG", "").lower() in ("1", "true", "yes")
+
+THROTTLE_WAIT = 60.0  # seconds to wait for a rate limiter token before stopping
+
+
+def debug(msg: str) -> None:
+    if DEBUG:
+        print(f"[hindsight-cc:drain-retains] {msg}", file=sys.stderr)
+
+
+def record_retained(item: dict) -> None:
+    """Record a sent retain the same way the hook would have."""
+    session_id = item.get("session_id")
+    if not session_id:
+        return
+    try:
+        if item["kind"] == KIND_PROMPT and item.get("prompt_hash"):
+            record_retained_hash(session_id, item["prompt_hash"])
+        elif item["kind"] == KIND_TRANSCRIPT:
+            record_live_turn(session_id, item.get("turn_timestamp"))
+    except OSError as e:
+        debug(f"Session state unavailable: {e}")
+
+
+def drain(client) -> Tuple[int, bool]:
+    """
+    Send queued retains until the queue is empty or the server or rate limiter says stop.
+
+    Returns:
+        (sent, emptied) where emptied is False if the worker stopped early
+    """
+    sent = 0
+    while pending_count():
+        if circuit_open(debug_callback=debug):
+            return sent, False
+        if not acquire(PRIORITY_BACKGROUND, debug_callback=debug, max_wait=THROTTLE_WAIT):
+            debug(f"No rate limiter token within {THROTTLE_WAIT:.0f}s, stopping")
+            return sent, False
+        item = pop_retain()
+        if item is None:
+            break
+        try:
+            client.retain(
+                bank_id=item["bank_id"],
+                content=item["content"],
+                tags=item.get("tags"),
+                metadata=item.get("metadata"),
+            )
+        except Exception as e:
+            debug(f"Failed to retain queued {item['kind']}: {e}")
+            requeue_retain(item)
+            return sent, False
+        record_sent()
+        record_retained(item)
+        sent += 1
+    return sent, True
+
+
+def main():
+    if not claim_drainer():
+        debug("Another drain worker is running")
+        return
+    emptied = False
+    try:
+        client = HindsightClient(debug_callback=debug)
+        try:
+            sent, emptied = drain(client)
+        finally:
+            client.close()
+        debug(f"Sent {sent} queued retains, {pending_count()} left")
+    except Exception as e:
+        debug(f"Drain failed: {e}")
+    finally:
+        release_drainer()
+    # A hook may have queued a retain after the last check, seeing this worker still running
+    if emptied:
+        start_drainer(debug_callback=debug)
+
+
+if __name__ == "__main__":
+    main()
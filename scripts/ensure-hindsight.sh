@@ -4,8 +4,12 @@
 # Called by SessionStart hook to auto-start the server
 
 CONTAINER_NAME="hindsight-cc"
-HEALTH_URL="http://localhost:8888/health"
-HINDSIGHT_IMAGE_DEFAULT="ghcr.io/vectorize-io/hindsight:0.1.16"
+HINDSIGHT_URL="${HINDSIGHT_URL:-http://localhost:8888}"
+HEALTH_URL="${HINDSIGHT_URL%/}/health"
+# Keep in step with the hindsight-client floor in requirements.txt; the scripts use
+# server APIs (memory updates, state and tag filters) that older releases lack
+HINDSIGHT_IMAGE_DEFAULT="ghcr.io/vectorize-io/hindsight:0.10.3"
+HINDSIGHT_IMAGE="${HINDSIGHT_IMAGE:-$HINDSIGHT_IMAGE_DEFAULT}"
 
 # Debug function - only outputs if HINDSIGHT_DEBUG is set
 debug() {
@@ -18,6 +22,15 @@ debug() {
 
 debug "Starting"
 
+# Only manage the local container; a remote server is someone else's to run
+case "$HINDSIGHT_URL" in
+http://localhost:8888 | http://localhost:8888/ | http://127.0.0.1:8888 | http://127.0.0.1:8888/) ;;
+*)
+	debug "Using Hindsight server at $HINDSIGHT_URL, not starting a container"
+	exit 0
+	;;
+esac
+
 # Check Docker is available
 if ! command -v docker >/dev/null 2>&1; then
 	debug "Docker not found in PATH"
@@ -29,6 +42,19 @@ if ! docker info >/dev/null 2>&1; then
 	exit 0
 fi
 
+CONTAINER_ID=$(docker ps -aq -f "name=$CONTAINER_NAME" 2>/dev/null)
+
+# A container from another image (e.g. before a plugin upgrade) is replaced;
+# memory data lives in ~/hindsight-data, outside the container
+if [ -n "$CONTAINER_ID" ]; then
+	CONTAINER_IMAGE=$(docker inspect -f '{{.Config.Image}}' "$CONTAINER_ID" 2>/dev/null)
+	if [ -n "$CONTAINER_IMAGE" ] && [ "$CONTAINER_IMAGE" != "$HINDSIGHT_IMAGE" ]; then
+		debug "Container runs ${CONTAINER_IMAGE}, replacing it with ${HINDSIGHT_IMAGE}"
+		docker rm -f "$CONTAINER_ID" >/dev/null 2>&1
+		CONTAINER_ID=""
+	fi
+fi
+
 # Check if Hindsight server is already responding
 if curl -s --connect-timeout 2 "$HEALTH_URL" >/dev/null 2>&1; then
 	debug "Server already running"
@@ -37,9 +63,6 @@ fi
 
 debug "Server not responding, checking container status"
 
-# Check if container exists but is stopped
-CONTAINER_ID=$(docker ps -aq -f "name=$CONTAINER_NAME" 2>/dev/null)
-
 if [ -n "$CONTAINER_ID" ]; then
 	# Container exists, try to start it
 	debug "Found existing container $CONTAINER_ID, starting it"
@@ -57,7 +80,6 @@ else
 		echo "Hindsight LLM features may not work" >&2
 	fi
 
-	HINDSIGHT_IMAGE="${HINDSIGHT_IMAGE:-$HINDSIGHT_IMAGE_DEFAULT}"
 	debug "Starting new container with image ${HINDSIGHT_IMAGE}"
 	debug "Starting Hindsight with model: ${HINDSIGHT_API_LLM_MODEL:-gpt-4o-mini}"
 
@@ -1,8 +1,16 @@
 #!/usr/bin/env python3
 import os
 import subprocess
+import time
 import urllib.request
 from bank_utils import get_bank_id, get_project_dir
+from breaker_utils import CLOSED
+from breaker_utils import get_status as get_breaker_status
+from client_utils import get_base_url
+from retain_queue_utils import get_queue_stats
+from scoring_utils import get_scoring_config, get_scoring_stats
+from session_utils import get_avoided
+from throttle_utils import get_stats
 
 
 def main():
@@ -27,12 +35,83 @@ def main():
         print(f"Docker check failed: {e}")
 
     # Check server health
+    base_url = get_base_url()
     try:
-        with urllib.request.urlopen("http://localhost:8888/health", timeout=2) as response:
-            print(f"Hindsight server: Healthy (HTTP {response.status})")
+        with urllib.request.urlopen(f"{base_url}/health", timeout=2) as response:
+            print(f"Hindsight server: Healthy at {base_url} (HTTP {response.status})")
     except Exception as e:
         print(f"Hindsight server: Unavailable ({e})")
 
+    # Report shared circuit breaker state
+    try:
+        breaker = get_breaker_status(base_url)
+        if breaker["threshold"] <= 0:
+            print("Circuit breaker: Disabled")
+        elif breaker["state"] == CLOSED:
+            print(f"Circuit breaker: Closed ({breaker['failures']}/{breaker['threshold']} consecutive failures)")
+        else:
+            retry_in = max(0.0, breaker["opened_at"] + breaker["cooldown"] - time.time())
+            print(
+                f"Circuit breaker: {breaker['state'].replace('_', '-').capitalize()} "
+                f"(next probe in {retry_in:.0f}s, {breaker['short_circuited']} calls skipped)"
+            )
+        for transition in breaker["transitions"][-5:]:
+            at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(transition["at"]))
+            print(f"  {at} {transition['from']} -> {transition['to']}: {transition['reason']}")
+    except Exception as e:
+        print(f"Circuit breaker check failed: {e}")
+
+    # Report shared rate limiter state
+    try:
+        throttle = get_stats()
+        if throttle["rate"] > 0:
+            print(
+                f"Rate limiter: {throttle['tokens']:.1f}/{throttle['burst']:.0f} tokens, "
+                f"{throttle['rate']:g}/s refill"
+            )
+            for priority, stats in sorted(throttle["stats"].items()):
+                print(
+                    f"  {priority}: {stats['granted']} granted, {stats['throttled']} throttled "
+                    f"({stats['throttled_seconds']:.1f}s waiting), {stats['shed']} shed"
+                )
+        else:
+            print("Rate limiter: Disabled")
+    except Exception as e:
+        print(f"Rate limiter check failed: {e}")
+
+    # Report retains deferred under backpressure
+    try:
+        queue = get_queue_stats()
+        print(
+            f"Retain queue: {queue['pending']} pending, {queue['sent']} sent, "
+            f"{queue['dropped']} dropped, {queue['expired']} expired"
+        )
+    except Exception as e:
+        print(f"Retain queue check failed: {e}")
+
+    # Report retain work saved by not retaining prompts twice
+    try:
+        avoided = get_avoided()
+        print(
+            f"Retain dedupe: {avoided['retains_avoided']} retains and "
+            f"{avoided['bytes_avoided']} bytes avoided"
+        )
+    except Exception as e:
+        print(f"Retain dedupe check failed: {e}")
+
+    # Report how many turns retain-side scoring let through
+    try:
+        min_score, sample_rate = get_scoring_config()
+        scoring = get_scoring_stats()
+        counts = scoring["counts"]
+        print(
+            f"Retain scoring (min score {min_score:g}, sample rate {sample_rate:g}): "
+            f"{counts['retain']} retained, {counts['sample']} sampled, {counts['skip']} skipped "
+            f"(mean score {scoring['mean_score']:.2f})"
+        )
+    except Exception as e:
+        print(f"Retain scoring check failed: {e}")
+
 
 if __name__ == "__main__":
     main()
@@ -2,7 +2,13 @@
 import json
 import os
 import sys
-from bank_utils import get_bank_id
+import time
+from bank_utils import get_bank_id, get_project_dir
+from client_utils import HindsightClient, circuit_open
+from metadata_utils import TAGS_MATCH, build_recall_tags, get_recall_scopes
+from query_utils import build_recall_query
+from session_utils import filter_injected, memory_key
+from throttle_utils import PRIORITY_INTERACTIVE, acquire
 
 DEBUG = os.environ.get("HINDSIGHT_DEBUG", "").lower() in ("1", "true", "yes")
 
@@ -33,24 +39,56 @@ def main():
         prompt = str(prompt)
 
     debug(f"prompt: {prompt[:100]}{'...' if len(prompt) > 100 else ''}")
-    debug(f"Query length: {len(prompt)} chars")
+    query = build_recall_query(prompt)
+    debug(f"Query length: {len(prompt)} -> {len(query)} chars")
 
-    try:
-        from hindsight_client import Hindsight
+    # Optionally narrow recall to memories from this branch, directory or session
+    session_id = input_data.get("session_id")
+    recall_kwargs = {}
+    scopes = get_recall_scopes()
+    if scopes:
+        tags = build_recall_tags(scopes, get_project_dir(), prompt=prompt, session_id=session_id)
+        if tags:
+            recall_kwargs = {"tags": tags, "tags_match": TAGS_MATCH}
+        debug(f"Recall scope {','.join(scopes)}: {tags or 'none applies, searching whole bank'}")
+
+    if circuit_open(debug_callback=debug):
+        return
+    acquire(PRIORITY_INTERACTIVE, debug_callback=debug)
 
+    try:
         debug("Connecting to Hindsight server")
-        client = Hindsight(base_url="http://localhost:8888")
-        response = client.recall(bank_id=bank_id, query=prompt)
-        client.close()
+        client = HindsightClient(debug_callback=debug)
+        try:
+            start = time.perf_counter()
+            response = client.recall(bank_id=bank_id, query=query, **recall_kwargs)
+            debug(f"Recall took {(time.perf_counter() - start) * 1000:.0f} ms")
+        finally:
+            client.close()
 
-        memories = [r.text for r in response.results]
+        memories = {memory_key(getattr(r, "id", None), r.text): r.text for r in response.results}
         debug(f"Found {len(memories)} memories")
-        if memories:
-            memory_block = "<hindsight-memories>\n" + "\n".join(memories) + "\n</hindsight-memories>"
-            print(memory_block)
-            debug("Injected memories into prompt")
-        else:
+        if not memories:
             debug("No relevant memories found")
+            return
+
+        # Skip memories already injected earlier in this session
+        keys = list(memories)
+        if session_id:
+            try:
+                keys = filter_injected(session_id, keys)
+            except OSError as e:
+                debug(f"Session ledger unavailable: {e}")
+        suppressed = len(memories) - len(keys)
+        if suppressed:
+            debug(f"Suppressed {suppressed} memories already injected in this session")
+
+        lines = [memories[key] for key in keys]
+        if suppressed:
+            lines.append(f"({suppressed} relevant memories were already provided earlier in this session)")
+        memory_block = "<hindsight-memories>\n" + "\n".join(lines) + "\n</hindsight-memories>"
+        print(memory_block)
+        debug(f"Injected {len(keys)} memories into prompt")
     except Exception as e:
         debug(f"Failed to recall memories: {e}")
         # Silently fail if Hindsight is unavailable
@@ -1,11 +1,29 @@
 #!/bin/sh
 
+# Install the plugin's Python dependencies into scripts/.venv
+#
+# Called by the SessionStart hook, which must not wait on pip. When the venv is
+# missing or out of date, the install is started in the background and the hook
+# returns at once; hook scripts run through run-hook.sh, which skips them until
+# the install has finished. Packages come from a local wheelhouse when one is
+# present, so setup also works offline.
+#
+# Usage: install-dependencies.sh [--foreground]
+#   --foreground  Install synchronously instead of in the background
+
 set -e
 
 # Script works from scripts/ directory where venv lives
 SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
 cd "$SCRIPT_DIR"
 
+# Written after a successful install; holds the requirements hash and Python version
+STAMP=".venv/.hindsight-cc-ready"
+LOCK_DIR=".install.lock"
+WHEELHOUSE="${HINDSIGHT_WHEELHOUSE:-$SCRIPT_DIR/wheelhouse}"
+STATE_DIR="${HINDSIGHT_STATE_DIR:-$HOME/.hindsight-cc}"
+LOG_FILE="$STATE_DIR/install.log"
+
 # Debug helper - only outputs if HINDSIGHT_DEBUG is set
 debug() {
     case "${HINDSIGHT_DEBUG:-}" in
@@ -20,47 +38,107 @@ soft_fail() {
     exit 0
 }
 
-# Quick check: Is everything already set up?
-if [ -x ".venv/bin/python3" ] && \
-   .venv/bin/python3 -c "import hindsight_client" 2>/dev/null; then
+# Quick check: stamp newer than requirements.txt and the interpreter (no process spawned)
+if [ "${1:-}" != "--install" ] && [ -f "$STAMP" ] && [ -x ".venv/bin/python3" ] && \
+   [ "$STAMP" -nt requirements.txt ] && [ "$STAMP" -nt .venv/bin/python3 ]; then
     debug "Dependencies already installed, skipping setup"
     exit 0
 fi
 
-debug "Setting up hindsight-cc plugin..."
-
 # Check Python version (requires 3.10+)
-python_version=$(python3 -c "import sys; print('%s.%s' % (sys.version_info[0], sys.version_info[1]))" 2>/dev/null)
+python_version=$(python3 -c "import sys; print('%s.%s.%s' % sys.version_info[:3])" 2>/dev/null) || true
 if [ -z "$python_version" ]; then
     soft_fail "python3 not found"
 fi
 
 IFS=.
-set -- $python_version
+set -- "${1:-}" $python_version
 IFS=' '
-major=$1
-minor=$2
+mode=$1
+major=$2
+minor=$3
 if [ "$major" -lt 3 ] || { [ "$major" -eq 3 ] && [ "$minor" -lt 10 ]; }; then
     soft_fail "Python 3.10+ required (found $python_version)"
 fi
 debug "Python version: $python_version"
 
-# Create virtual environment if it doesn't exist
-if [ ! -d ".venv" ]; then
-    debug "Creating virtual environment..."
-    if ! python3 -m venv .venv; then
-        soft_fail "Failed to create virtual environment; skipping setup"
+requirements_hash=$(cksum < requirements.txt | cut -d ' ' -f 1)
+ready_key="requirements $requirements_hash python $python_version"
+
+# The stamp is older than requirements.txt but still matches (e.g. after a checkout)
+if [ "$mode" != "--install" ] && [ -f "$STAMP" ] && [ "$(cat "$STAMP")" = "$ready_key" ]; then
+    touch "$STAMP"
+    debug "Dependencies up to date, refreshed readiness stamp"
+    exit 0
+fi
+
+if [ "$mode" != "--install" ] && [ "$mode" != "--foreground" ]; then
+    mkdir -p "$STATE_DIR"
+    debug "Installing dependencies in the background (log: $LOG_FILE)"
+    nohup "$SCRIPT_DIR/install-dependencies.sh" --install </dev/null >>"$LOG_FILE" 2>&1 &
+    exit 0
+fi
+
+log() {
+    echo "[hindsight-cc:install-dependencies] $(date '+%Y-%m-%d %H:%M:%S') $*" >&2
+}
+
+# Only one installer at a time; a lock left by a dead installer is taken over
+if ! mkdir "$LOCK_DIR" 2>/dev/null; then
+    pid=$(cat "$LOCK_DIR/pid" 2>/dev/null || true)
+    if [ -n "$pid" ] && kill -0 "$pid" 2>/dev/null; then
+        soft_fail "Install already running (pid $pid)"
+    fi
+    rm -rf "$LOCK_DIR"
+    mkdir "$LOCK_DIR" 2>/dev/null || soft_fail "Install already running"
+fi
+echo $$ >"$LOCK_DIR/pid"
+trap 'rm -rf "$LOCK_DIR"' EXIT
+
+started=$(date +%s)
+log "Setting up hindsight-cc plugin ($ready_key)"
+
+# Hooks skip while the stamp is missing, so none runs against a half-installed venv
+installed_python=$(sed -n 's/.* python //p' "$STAMP" 2>/dev/null || true)
+rm -f "$STAMP"
+
+# Create the virtual environment, or recreate it for a different Python version
+if [ ! -x ".venv/bin/python3" ] || \
+   { [ -n "$installed_python" ] && [ "${installed_python%.*}" != "$major.$minor" ]; }; then
+    log "Creating virtual environment..."
+    if ! python3 -m venv --clear .venv; then
+        log "Failed to create virtual environment; skipping setup"
+        exit 0
     fi
 fi
 
-# Install dependencies
-debug "Installing Python dependencies..."
-if ! .venv/bin/pip install --upgrade pip -q; then
-    soft_fail "Failed to upgrade pip; skipping setup"
+# Install dependencies, from the wheelhouse alone if it has everything
+export PIP_DISABLE_PIP_VERSION_CHECK=1
+installed=""
+if [ -d "$WHEELHOUSE" ]; then
+    log "Installing Python dependencies from $WHEELHOUSE..."
+    if .venv/bin/pip install --no-index --find-links "$WHEELHOUSE" -r requirements.txt -q; then
+        installed=1
+    else
+        log "Wheelhouse incomplete, falling back to the package index"
+    fi
 fi
-if ! .venv/bin/pip install -r requirements.txt -q; then
-    soft_fail "Failed to install requirements; skipping setup"
+if [ -z "$installed" ]; then
+    log "Installing Python dependencies..."
+    find_links=""
+    if [ -d "$WHEELHOUSE" ]; then
+        find_links="--find-links=$WHEELHOUSE"
+    fi
+    # shellcheck disable=SC2086
+    if ! .venv/bin/pip install $find_links -r requirements.txt -q; then
+        log "Failed to install requirements; skipping setup"
+        exit 0
+    fi
 fi
 
 # Make scripts executable
 chmod +x *.sh *.py 2>/dev/null || true
+
+echo "$ready_key" >"$STAMP.tmp"
+mv "$STAMP.tmp" "$STAMP"
+log "Dependencies installed in $(($(date +%s) - started))s"
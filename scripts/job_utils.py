@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Shared utilities for background reflect jobs.
+
+A reflection can take minutes, during which the calling command blocks. With
+`reflect.py --async` the request is stored as a job file and handed to a detached
+worker process; the caller gets a job ID back and collects the output later with
+`--result`. Jobs live in the plugin state directory, so results survive the
+session that submitted them.
+
+Workers for the same bank queue for a limited number of slots
+(HINDSIGHT_REFLECT_CONCURRENCY), taken in submission order, so a burst of async
+reflections does not overload the server. Each job records how long it waited for
+a slot and how long the reflection ran.
+"""
+
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+from state_utils import get_state_dir, locked_state, read_state, safe_name, write_state
+
+DEFAULT_CONCURRENCY = 2  # reflections running at once per bank
+JOB_MAX_AGE = 7 * 24 * 3600  # finished jobs are pruned after this many seconds
+SLOTS_STATE_NAME = "reflect-slots"
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED = (DONE, FAILED)
+
+
+def get_concurrency() -> int:
+    """
+    Return how many reflections may run at once per bank.
+
+    Read from HINDSIGHT_REFLECT_CONCURRENCY, defaulting to 2. Invalid or
+    non-positive values fall back to the default.
+    """
+    try:
+        value = int(os.environ.get("HINDSIGHT_REFLECT_CONCURRENCY", DEFAULT_CONCURRENCY))
+    except ValueError:
+        return DEFAULT_CONCURRENCY
+    return value if value > 0 else DEFAULT_CONCURRENCY
+
+
+def get_jobs_dir() -> Path:
+    """Return the directory holding job files, creating it if needed."""
+    jobs_dir = get_state_dir() / "reflect-jobs"
+    jobs_dir.mkdir(parents=True, exist_ok=True)
+    return jobs_dir
+
+
+def _job_path(job_id: str) -> Path:
+    return get_jobs_dir() / f"{safe_name(job_id)}.json"
+
+
+def create_job(bank_id: str, request: dict) -> dict:
+    """
+    Store a new queued job.
+
+    Args:
+        bank_id: Bank to reflect against
+        request: Keyword arguments for the reflect call (query, budget, ...)
+
+    Returns:
+        The job record, including its new "id"
+    """
+    job = {
+        "id": uuid.uuid4().hex[:12],
+        "bank_id": bank_id,
+        "request": request,
+        "status": QUEUED,
+        "submitted_at": time.time(),
+    }
+    write_state(_job_path(job["id"]), job)
+    return job
+
+
+def load_job(job_id: str) -> Optional[dict]:
+    """Return a job record, or None if there is no such job."""
+    return read_state(_job_path(job_id)) or None
+
+
+def update_job(job: dict, **fields) -> dict:
+    """Update a job record in place and persist it."""
+    job.update(fields)
+    write_state(_job_path(job["id"]), job)
+    return job
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def claim_slot(bank_id: str, job_id: str, limit: Optional[int] = None) -> bool:
+    """
+    Try to start a job, keeping at most `limit` running per bank.
+
+    The first call queues the job. Jobs start in submission order; slots and
+    queue places held by workers that have died are released.
+
+    Args:
+        bank_id: Bank the job reflects against
+        job_id: Job ID
+        limit: Maximum running jobs for the bank (default: get_concurrency())
+
+    Returns:
+        True if the job holds a slot and may run now
+    """
+    limit = limit or get_concurrency()
+    pid = os.getpid()
+    with locked_state(SLOTS_STATE_NAME) as state:
+        bank = state.setdefault(bank_id, {"running": {}, "queued": {}})
+        bank["running"] = {jid: p for jid, p in bank["running"].items() if _alive(p)}
+        bank["queued"] = {jid: p for jid, p in bank["queued"].items() if _alive(p)}
+        if job_id in bank["running"]:
+            return True
+        bank["queued"].setdefault(job_id, pid)
+        free = limit - len(bank["running"])
+        if job_id in list(bank["queued"])[: max(free, 0)]:
+            del bank["queued"][job_id]
+            bank["running"][job_id] = pid
+            return True
+        return False
+
+
+def release_slot(bank_id: str, job_id: str) -> None:
+    """Give up a job's slot or queue place."""
+    with locked_state(SLOTS_STATE_NAME) as state:
+        bank = state.get(bank_id)
+        if bank:
+            bank["running"].pop(job_id, None)
+            bank["queued"].pop(job_id, None)
+
+
+def reap_job(job: dict, exited: bool = False) -> dict:
+    """
+    Mark a job failed if its worker exited without finishing it.
+
+    Args:
+        job: Job record
+        exited: Whether the caller knows the worker has exited (e.g. from its
+            own subprocess handle); otherwise the recorded worker PID is checked
+
+    Returns:
+        The up-to-date job record
+    """
+    if job.get("status") in FINISHED:
+        return job
+    pid = job.get("pid")
+    if not exited and (not pid or _alive(pid)):
+        return job
+    # The worker may have finished between reads
+    latest = load_job(job["id"]) or job
+    if latest.get("status") in FINISHED:
+        return latest
+    return update_job(latest, status=FAILED, error="worker exited before finishing", finished_at=time.time())
+
+
+def list_jobs() -> List[dict]:
+    """Return all stored jobs, most recently submitted first."""
+    jobs = [read_state(path) for path in get_jobs_dir().glob("*.json")]
+    return sorted((job for job in jobs if job), key=lambda job: job.get("submitted_at", 0), reverse=True)
+
+
+def prune_jobs(max_age: float = JOB_MAX_AGE) -> int:
+    """
+    Delete finished jobs older than max_age seconds.
+
+    Returns:
+        Number of jobs deleted
+    """
+    cutoff = time.time() - max_age
+    pruned = 0
+    for job in list_jobs():
+        if job.get("status") in FINISHED and job.get("finished_at", 0) < cutoff:
+            _job_path(job["id"]).unlink(missing_ok=True)
+            pruned += 1
+    return pruned
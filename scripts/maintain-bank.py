@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from bank_utils import get_bank_id
+from client_utils import HindsightClient
+from maintenance_utils import DEFAULT_SIMILARITY, plan_maintenance
+from state_utils import get_state_dir, read_state, safe_name, write_state
+
+DEBUG = os.environ.get("HINDSIGHT_DEBUG", "").lower() in ("1", "true", "yes")
+
+PAGE_SIZE = 500
+CHECKPOINT_EVERY = 25
+
+
+def debug(msg: str) -> None:
+    if DEBUG:
+        print(f"[hindsight-cc:maintain-bank] {msg}", file=sys.stderr)
+
+
+def checkpoint_path(bank_id: str):
+    return get_state_dir() / f"maintenance-{safe_name(bank_id)}.json"
+
+
+def items_path(bank_id: str):
+    return get_state_dir() / f"maintenance-{safe_name(bank_id)}.items.jsonl"
+
+
+def read_items(path) -> list:
+    """Read scanned memories, skipping a line cut short by an interrupted write."""
+    items = []
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    items.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return items
+
+
+def preview(text: str, width: int = 80) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= width else text[: width - 3] + "..."
+
+
+async def scan_bank(client, bank_id: str, checkpoint: dict, path, scanned_path) -> list:
+    """
+    Page through the bank's valid memories, saving progress after every page.
+
+    Scanned memories are appended to scanned_path and the checkpoint holds only
+    the offset, so each page costs a write of its own items.
+    """
+    items = read_items(scanned_path)
+    seen = {item["id"] for item in items}
+    offset = checkpoint.get("offset", 0)
+    if offset:
+        print(f"Resuming scan at offset {offset} ({len(items)} memories already scanned)")
+
+    while True:
+        page = await client.alist_memories(bank_id=bank_id, limit=PAGE_SIZE, offset=offset, state="valid")
+        new_items = []
+        for row in page.items:
+            if row.id in seen:
+                continue
+            seen.add(row.id)
+            new_items.append(
+                {
+                    "id": row.id,
+                    "text": row.text or "",
+                    "fact_type": row.fact_type,
+                    "date": row.var_date,
+                    "mentioned_at": row.mentioned_at,
+                    "proof_count": row.proof_count,
+                    "state": getattr(row, "state", None),
+                }
+            )
+        with open(scanned_path, "a") as f:
+            f.writelines(json.dumps(item) + "\n" for item in new_items)
+        items.extend(new_items)
+        offset += len(page.items)
+        checkpoint["offset"] = offset
+        checkpoint["total"] = page.total
+        write_state(path, checkpoint)
+        debug(f"Scanned {offset}/{page.total}")
+        if not page.items or offset >= page.total:
+            break
+
+    checkpoint["scan_complete"] = True
+    checkpoint["scanned_at"] = datetime.now(timezone.utc).isoformat()
+    write_state(path, checkpoint)
+    return items
+
+
+async def measure_recall(client, bank_id: str, queries: list, runs: int):
+    """Return the median recall latency in milliseconds over the probe queries."""
+    if not queries or runs <= 0:
+        return None
+    timings = []
+    for query in queries:
+        for _ in range(runs):
+            start = time.perf_counter()
+            await client.arecall(bank_id=bank_id, query=query)
+            timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+async def invalidate(client, bank_id: str, actions: list, checkpoint: dict, path) -> int:
+    """Invalidate planned memories, recording each one so an interrupted run resumes."""
+    applied = set(checkpoint.setdefault("applied", []))
+    pending = [action for action in actions if action["id"] not in applied]
+    if applied:
+        print(f"Resuming: {len(applied)} memories already invalidated, {len(pending)} remaining")
+
+    for i, action in enumerate(pending, 1):
+        try:
+            await client.ainvalidate_memory(bank_id, action["id"], action["reason"])
+        except Exception as e:
+            print(f"Failed to invalidate {action['id']}: {e}", file=sys.stderr)
+            continue
+        checkpoint["applied"].append(action["id"])
+        if i % CHECKPOINT_EVERY == 0:
+            write_state(path, checkpoint)
+            print(f"Invalidated {i}/{len(pending)}")
+    write_state(path, checkpoint)
+    return len(checkpoint["applied"])
+
+
+def print_plan(items: list, actions: list, limit) -> None:
+    by_id = {item["id"]: item for item in items}
+    expired = [a for a in actions if a["action"] == "expired"]
+    duplicates = [a for a in actions if a["action"] == "duplicate"]
+    keepers = {a["keeper"] for a in duplicates}
+
+    print(f"Scanned memories: {len(items)}")
+    print(f"Expired by age: {len(expired)}")
+    print(f"Near-duplicates: {len(duplicates)} in {len(keepers)} clusters")
+    print(f"Memories after maintenance: {len(items) - len(actions)}")
+
+    if duplicates and limit != 0:
+        print()
+        for keeper_id in sorted(keepers)[:limit]:
+            print(f"keep    {preview(by_id[keeper_id]['text'])}")
+            for action in duplicates:
+                if action["keeper"] == keeper_id:
+                    print(f"  drop  {preview(by_id[action['id']]['text'])}")
+    if expired and limit != 0:
+        print()
+        for action in expired[:limit]:
+            print(f"expire  {preview(by_id[action['id']]['text'])}")
+
+
+async def run(args, bank_id: str) -> None:
+    path = checkpoint_path(bank_id)
+    scanned_path = items_path(bank_id)
+    checkpoint = {} if args.restart else read_state(path)
+    if checkpoint.get("bank_id") not in (None, bank_id):
+        checkpoint = {}
+    if not checkpoint:
+        scanned_path.unlink(missing_ok=True)
+    checkpoint["bank_id"] = bank_id
+
+    client = HindsightClient(debug_callback=debug)
+    try:
+        if checkpoint.get("scan_complete"):
+            items = read_items(scanned_path)
+            print(f"Using scan from {checkpoint.get('scanned_at')} (pass --restart to rescan)")
+        else:
+            items = await scan_bank(client, bank_id, checkpoint, path, scanned_path)
+
+        actions = plan_maintenance(items, threshold=args.similarity, ttl_days=args.ttl_days)
+        print_plan(items, actions, limit=None if args.verbose else (0 if args.apply else 20))
+
+        probes = args.probe or [preview(item["text"], 200) for item in items[:: max(1, len(items) // 3)][:3]]
+        before = await measure_recall(client, bank_id, probes, args.probe_runs)
+        if before is not None:
+            print(f"Recall latency before: {before:.0f} ms (median of {len(probes) * args.probe_runs} recalls)")
+
+        if not args.apply:
+            print("\nDry run: no memories were changed. Re-run with --apply to invalidate them.")
+            return
+
+        count = await invalidate(client, bank_id, actions, checkpoint, path)
+        print(f"Invalidated {count} memories")
+
+        after = await measure_recall(client, bank_id, probes, args.probe_runs)
+        if after is not None:
+            print(f"Recall latency after: {after:.0f} ms")
+        # Maintenance complete: the next run starts from a fresh scan
+        path.unlink(missing_ok=True)
+        scanned_path.unlink(missing_ok=True)
+    finally:
+        await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Deduplicate and expire memories in the current project's bank"
+    )
+    parser.add_argument(
+        "--apply",
+        action="store_true",
+        help="Invalidate the planned memories (default: dry run)",
+    )
+    parser.add_argument(
+        "--similarity",
+        type=float,
+        default=DEFAULT_SIMILARITY,
+        help=f"Word-shingle similarity for near-duplicates, 0-1 (default: {DEFAULT_SIMILARITY})",
+    )
+    parser.add_argument(
+        "--ttl-days",
+        type=float,
+        default=None,
+        help="Expire memories older than this many days (default: never)",
+    )
+    parser.add_argument(
+        "--probe",
+        action="append",
+        default=None,
+        help="Query used to measure recall latency (repeatable; default: sampled from the bank)",
+    )
+    parser.add_argument(
+        "--probe-runs",
+        type=int,
+        default=3,
+        help="Recalls per probe query; 0 skips latency measurement (default: 3)",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Discard saved progress and rescan the bank",
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="List every affected memory (default: first 20 clusters on a dry run)",
+    )
+
+    args = parser.parse_args()
+
+    bank_id = get_bank_id(debug_callback=debug)
+    print(f"Memory bank ID: {bank_id}")
+
+    try:
+        asyncio.run(run(args, bank_id))
+    except KeyboardInterrupt:
+        print("\nInterrupted; progress saved. Re-run the same command to resume.", file=sys.stderr)
+        sys.exit(130)
+    except Exception as e:
+        debug(f"Maintenance failed: {e}")
+        print(f"Error maintaining bank: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
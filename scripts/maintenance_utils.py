@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Shared utilities for memory bank maintenance.
+
+Long-lived project banks accumulate near-identical memories (the same prompt asked
+again, the same fact extracted from several turns) and stale ones, which slows
+recall and crowds out better results. This module plans maintenance over memories
+fetched from the listing API: expired memories are selected by age, and the rest are
+clustered into near-duplicate groups using MinHash over word shingles, keeping one
+memory per group.
+
+Planning is pure and works on plain dicts, so maintain-bank.py can checkpoint and
+resume a scan without re-fetching the bank.
+"""
+
+import hashlib
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set
+
+from transcript_utils import parse_timestamp
+
+DEFAULT_SIMILARITY = 0.8
+SHINGLE_SIZE = 3
+
+# MinHash signature length and LSH banding (BANDS * ROWS == NUM_PERM).
+# Pairs with Jaccard similarity around 0.8 share a band with high probability,
+# while dissimilar pairs rarely do.
+NUM_PERM = 32
+BANDS = 8
+ROWS = 4
+
+_MASK64 = (1 << 64) - 1
+_PERMUTATION_SEEDS = [
+    int.from_bytes(hashlib.blake2b(str(i).encode(), digest_size=8).digest(), "big") for i in range(NUM_PERM)
+]
+
+# Only raw facts can be invalidated; observations are derived by the server
+CURATABLE_FACT_TYPES = {"world", "experience", None, ""}
+
+# Servers without invalidation report no state
+VALID_STATES = {"valid", None}
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize memory text for comparison.
+
+    Examples:
+        "Use  Postgres, not MySQL!" -> "use postgres not mysql"
+    """
+    return " ".join(re.sub(r"[^\w]+", " ", text.lower()).split())
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """
+    Return the set of word n-grams of normalized text.
+
+    Texts shorter than size words yield a single shingle of the whole text.
+    """
+    words = normalize_text(text).split()
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    """Return the Jaccard similarity of two sets (1.0 for two empty sets)."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def minhash_signature(shingle_set: Set[str]) -> List[int]:
+    """
+    Compute a MinHash signature for a shingle set.
+
+    Each shingle is hashed once; the permutations are derived by XOR with fixed
+    seeds, which is cheap and stable across runs.
+    """
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big") for s in shingle_set]
+    if not hashes:
+        return [0] * NUM_PERM
+    return [min((h ^ seed) & _MASK64 for h in hashes) for seed in _PERMUTATION_SEEDS]
+
+
+def find_duplicate_clusters(items: List[dict], threshold: float = DEFAULT_SIMILARITY) -> List[List[str]]:
+    """
+    Group near-duplicate memories.
+
+    Candidate pairs come from MinHash LSH buckets and are confirmed with exact
+    Jaccard similarity on word shingles, so the cost stays close to linear in the
+    number of memories.
+
+    Args:
+        items: Memories as dicts with at least "id" and "text"
+        threshold: Minimum Jaccard similarity for two memories to be duplicates
+
+    Returns:
+        Clusters of two or more memory IDs
+    """
+    shingle_sets = {item["id"]: shingles(item.get("text") or "") for item in items}
+    parent: Dict[str, str] = {item_id: item_id for item_id in shingle_sets}
+
+    def find(item_id: str) -> str:
+        while parent[item_id] != item_id:
+            parent[item_id] = parent[parent[item_id]]
+            item_id = parent[item_id]
+        return item_id
+
+    buckets: Dict[tuple, List[str]] = {}
+    for item_id, shingle_set in shingle_sets.items():
+        if not shingle_set:
+            continue
+        signature = minhash_signature(shingle_set)
+        for band in range(BANDS):
+            key = (band, *signature[band * ROWS : (band + 1) * ROWS])
+            buckets.setdefault(key, []).append(item_id)
+
+    for bucket in buckets.values():
+        for i, first in enumerate(bucket):
+            for second in bucket[i + 1 :]:
+                root_a, root_b = find(first), find(second)
+                if root_a == root_b:
+                    continue
+                if jaccard(shingle_sets[first], shingle_sets[second]) >= threshold:
+                    parent[root_b] = root_a
+
+    clusters: Dict[str, List[str]] = {}
+    for item_id in shingle_sets:
+        clusters.setdefault(find(item_id), []).append(item_id)
+    return [cluster for cluster in clusters.values() if len(cluster) > 1]
+
+
+def memory_time(item: dict) -> Optional[datetime]:
+    """Return when a memory was recorded, preferring mention time over event date."""
+    return parse_timestamp(item.get("mentioned_at")) or parse_timestamp(item.get("date"))
+
+
+def choose_keeper(items: List[dict]) -> dict:
+    """
+    Pick the memory to keep from a duplicate cluster.
+
+    Prefers the most independently confirmed memory (proof_count), then the most
+    recent, then the longest text.
+    """
+    oldest = datetime.min.replace(tzinfo=timezone.utc)
+    return max(
+        items,
+        key=lambda item: (
+            item.get("proof_count") or 1,
+            memory_time(item) or oldest,
+            len(item.get("text") or ""),
+        ),
+    )
+
+
+def plan_maintenance(
+    items: List[dict],
+    threshold: float = DEFAULT_SIMILARITY,
+    ttl_days: Optional[float] = None,
+    now: Optional[datetime] = None,
+) -> List[dict]:
+    """
+    Plan which memories to invalidate.
+
+    Memories older than ttl_days are expired first; the remaining memories are
+    clustered and every cluster member except its keeper is marked duplicate.
+    Observations are never selected because the server derives them, and
+    memories that are no longer valid (invalidated by an earlier run) are
+    neither selected nor kept in place of a valid copy.
+
+    Args:
+        items: Memories from the listing API as dicts
+        threshold: Jaccard similarity threshold for duplicates
+        ttl_days: Maximum memory age in days, or None to disable expiry
+        now: Reference time for expiry (defaults to the current time)
+
+    Returns:
+        Actions as dicts with "id", "action" ("expired" or "duplicate"), "reason"
+        and, for duplicates, "keeper"
+    """
+    now = now or datetime.now(timezone.utc)
+    curatable = [
+        item
+        for item in items
+        if item.get("fact_type") in CURATABLE_FACT_TYPES and item.get("state") in VALID_STATES
+    ]
+    actions: List[dict] = []
+
+    remaining = []
+    cutoff = now - timedelta(days=ttl_days) if ttl_days else None
+    for item in curatable:
+        recorded = memory_time(item)
+        if cutoff and recorded and recorded < cutoff:
+            actions.append(
+                {
+                    "id": item["id"],
+                    "action": "expired",
+                    "reason": f"hindsight-cc maintenance: older than {ttl_days:g} days",
+                }
+            )
+        else:
+            remaining.append(item)
+
+    by_id = {item["id"]: item for item in remaining}
+    for cluster in find_duplicate_clusters(remaining, threshold):
+        keeper = choose_keeper([by_id[item_id] for item_id in cluster])
+        for item_id in cluster:
+            if item_id != keeper["id"]:
+                actions.append(
+                    {
+                        "id": item_id,
+                        "action": "duplicate",
+                        "keeper": keeper["id"],
+                        "reason": f"hindsight-cc maintenance: duplicate of {keeper['id']}",
+                    }
+                )
+    return actions
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Shared utilities for tagging retains and scoping recalls.
+
+Retains carry where the work happened: the git branch, the top-level project
+directories of the files a turn touched (from its tool calls), and the session.
+These are sent as Hindsight tags, which the server can filter on, and again as
+metadata together with the full file paths and a timestamp:
+
+    tags:     ["branch:main", "dir:scripts", "session:4f1c..."]
+    metadata: {"branch": "main", "paths": "scripts/a.py,README.md", ...}
+
+Recalls can then be narrowed to the same branch, to the directories a prompt
+mentions, or to the current session (HINDSIGHT_RECALL_SCOPE). Recall uses the
+server's "all" tag matching, which still includes untagged memories, so memories
+retained before tagging stay reachable.
+"""
+
+import os
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from query_utils import PATH_PATTERN
+
+SCOPES = ("branch", "path", "session")
+TAGS_MATCH = "all"
+
+MAX_PATHS = 20  # file paths kept in metadata per retain
+MAX_DIRS = 5  # directory tags per retain or recall
+
+# Tool input fields that hold a file or directory path
+PATH_FIELDS = ("file_path", "notebook_path", "path")
+
+
+def get_git_branch(project_dir: str) -> Optional[str]:
+    """
+    Return the checked-out git branch of a project.
+
+    Args:
+        project_dir: Absolute path to project directory
+
+    Returns:
+        Branch name, or None outside a git repo or on a detached HEAD
+    """
+    try:
+        result = subprocess.run(
+            ["git", "-C", project_dir, "rev-parse", "--abbrev-ref", "HEAD"],
+            capture_output=True,
+            text=True,
+            timeout=2,
+        )
+    except (subprocess.TimeoutExpired, FileNotFoundError):
+        return None
+    branch = result.stdout.strip()
+    if result.returncode != 0 or not branch or branch == "HEAD":
+        return None
+    return branch
+
+
+def transcript_branch(entries: List[dict]) -> Optional[str]:
+    """Return the git branch recorded in transcript entries, if any (latest wins)."""
+    for entry in reversed(entries):
+        if entry.get("gitBranch") and entry["gitBranch"] != "HEAD":
+            return entry["gitBranch"]
+    return None
+
+
+def relative_path(path: str, project_dir: str) -> Optional[str]:
+    """
+    Return path relative to the project directory.
+
+    Returns:
+        The relative path, or None if it lies outside the project
+    """
+    project = Path(project_dir)
+    candidate = Path(path)
+    if not candidate.is_absolute():
+        candidate = project / candidate
+    try:
+        relative = Path(os.path.normpath(candidate)).relative_to(os.path.normpath(project))
+    except ValueError:
+        return None
+    return relative.as_posix() if relative.parts else None
+
+
+def extract_touched_paths(entries: List[dict], project_dir: str) -> List[str]:
+    """
+    Collect the project files a turn's tool calls touched.
+
+    Args:
+        entries: Transcript entries of one turn
+        project_dir: Project directory the paths are made relative to
+
+    Returns:
+        Relative paths in first-touched order, without duplicates, at most MAX_PATHS
+    """
+    paths: List[str] = []
+    for entry in entries:
+        if entry.get("isSidechain"):
+            continue
+        content = entry.get("message", {}).get("content", "")
+        if not isinstance(content, list):
+            continue
+        for part in content:
+            if not isinstance(part, dict) or part.get("type") != "tool_use":
+                continue
+            tool_input = part.get("input") or {}
+            for field in PATH_FIELDS:
+                value = tool_input.get(field) if isinstance(tool_input, dict) else None
+                if not isinstance(value, str) or not value:
+                    continue
+                path = relative_path(value, project_dir)
+                if path and path not in paths:
+                    paths.append(path)
+                    if len(paths) >= MAX_PATHS:
+                        return paths
+    return paths
+
+
+def path_dirs(paths: Iterable[str]) -> List[str]:
+    """
+    Return the top-level directories of relative paths.
+
+    Files in the project root map to ".".
+
+    Examples:
+        ["scripts/test/x.py", "README.md"] -> ["scripts", "."]
+    """
+    dirs: List[str] = []
+    for path in paths:
+        parts = Path(path).parts
+        top = parts[0] if len(parts) > 1 else "."
+        if top not in dirs:
+            dirs.append(top)
+            if len(dirs) >= MAX_DIRS:
+                break
+    return dirs
+
+
+def prompt_dirs(prompt: str, project_dir: str) -> List[str]:
+    """
+    Return the project directories a prompt mentions by path.
+
+    Only paths with a directory part that exist in the project count, so words
+    like "and/or" do not narrow recall.
+    """
+    paths = []
+    for match in PATH_PATTERN.findall(prompt):
+        path = relative_path(match.rstrip(".,:;"), project_dir)
+        if path and "/" in path and (Path(project_dir) / path).exists():
+            paths.append(path)
+    return path_dirs(paths)
+
+
+def build_tags(
+    branch: Optional[str] = None,
+    dirs: Iterable[str] = (),
+    session_id: Optional[str] = None,
+) -> List[str]:
+    """Return Hindsight tags for a branch, directories and session."""
+    tags = []
+    if branch:
+        tags.append(f"branch:{branch}")
+    tags.extend(f"dir:{directory}" for directory in dirs)
+    if session_id:
+        tags.append(f"session:{session_id}")
+    return tags
+
+
+def build_retain_metadata(
+    branch: Optional[str] = None,
+    paths: Iterable[str] = (),
+    session_id: Optional[str] = None,
+    timestamp: Optional[str] = None,
+) -> Tuple[List[str], Dict[str, str]]:
+    """
+    Build the tags and metadata sent with a retain.
+
+    Args:
+        branch: Git branch the work happened on
+        paths: Project-relative file paths the content touched
+        session_id: Claude session ID
+        timestamp: ISO 8601 time of the content (default: now)
+
+    Returns:
+        (tags, metadata); metadata values are strings, as the API requires
+    """
+    paths = list(paths)[:MAX_PATHS]
+    tags = build_tags(branch, path_dirs(paths), session_id)
+    metadata = {"timestamp": timestamp or datetime.now(timezone.utc).isoformat(timespec="seconds")}
+    if branch:
+        metadata["branch"] = branch
+    if paths:
+        metadata["paths"] = ",".join(paths)
+    if session_id:
+        metadata["session_id"] = session_id
+    return tags, metadata
+
+
+def get_recall_scopes() -> List[str]:
+    """
+    Return the scopes recall is narrowed to.
+
+    Read from HINDSIGHT_RECALL_SCOPE, a comma-separated subset of "branch",
+    "path" and "session". Unset or empty searches the whole bank; unknown names
+    are ignored.
+    """
+    value = os.environ.get("HINDSIGHT_RECALL_SCOPE", "")
+    return [scope for scope in (part.strip().lower() for part in value.split(",")) if scope in SCOPES]
+
+
+def build_recall_tags(
+    scopes: Iterable[str],
+    project_dir: str,
+    prompt: str = "",
+    session_id: Optional[str] = None,
+) -> List[str]:
+    """
+    Return the tags that narrow a recall to the given scopes.
+
+    Args:
+        scopes: Subset of SCOPES
+        project_dir: Project directory (for the branch and prompt paths)
+        prompt: Prompt whose mentioned directories the "path" scope uses
+        session_id: Current session, for the "session" scope
+
+    Returns:
+        Tags to pass to recall with tags_match=TAGS_MATCH; empty if no scope
+        applies (e.g. no branch, or the prompt mentions no paths)
+    """
+    scopes = set(scopes)
+    branch = get_git_branch(project_dir) if "branch" in scopes else None
+    dirs = prompt_dirs(prompt, project_dir) if "path" in scopes else []
+    return build_tags(branch, dirs, session_id if "session" in scopes else None)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Shared utilities for building recall queries from prompts.
+
+A prompt with a pasted log, stack trace or file dump can be tens of kilobytes. Sent
+as-is, it makes recall slow (the whole query is embedded and matched) and noisy
+(the paste swamps the question). Prompts over the query limit are reduced to a
+compact query: the natural-language part of the prompt plus the key terms that
+identify what it is about (error signatures, file paths and code identifiers).
+"""
+
+import os
+import re
+from collections import Counter
+from typing import List, Tuple
+
+from transcript_utils import FENCE_PATTERN, strip_ansi, strip_base64
+
+DEFAULT_MAX_QUERY_CHARS = 1000
+
+# Share of the query kept for natural language when key terms were found
+PROSE_SHARE = 0.6
+
+MAX_ERRORS = 5
+MAX_PATHS = 10
+MAX_IDENTIFIERS = 15
+
+ERROR_PATTERN = re.compile(
+    r"\b(?:[A-Z]\w*(?:Error|Exception|Warning|Fault)|error(?:\[\w+\])?|FAILED|FATAL|panic)\b:?[ \t]*[^\n]{0,80}"
+)
+PATH_PATTERN = re.compile(
+    r"(?<![\w/])/?(?:[\w.-]+/)+[\w.-]+|\b[\w-]+\.(?:py|pyi|js|jsx|ts|tsx|go|rs|java|kt|rb|c|h|cc|cpp|hpp|cs|swift|"
+    r"json|ya?ml|toml|ini|cfg|md|sh|sql|html|css)\b"
+)
+IDENTIFIER_PATTERN = re.compile(
+    r"\b(?:[A-Z][a-z0-9]+(?:[A-Z][a-z0-9]*)+|[a-z][a-z0-9]*(?:[A-Z][a-z0-9]*)+|[A-Za-z]\w*(?:_\w+)+)\b"
+    r"|\b[A-Za-z_]\w*(?=\()"
+)
+URL_PATTERN = re.compile(r"\w+://\S+")
+LOG_LINE_PATTERN = re.compile(
+    r"^\s*(?:\d{4}-\d{2}-\d{2}|\d{2}:\d{2}:\d{2}|\[\w+\]|at |File \"|Traceback|[+-]{3} |@@|\$ |>>> |[#/]{2})"
+)
+
+# Call names too common to identify anything
+COMMON_CALLS = {"print", "len", "str", "int", "list", "dict", "range", "get", "set", "map", "open", "format"}
+
+
+def get_max_query_chars() -> int:
+    """
+    Return the maximum recall query length in characters.
+
+    Read from HINDSIGHT_RECALL_MAX_QUERY_CHARS, defaulting to 1000. Invalid or
+    non-positive values fall back to the default.
+    """
+    try:
+        value = int(os.environ.get("HINDSIGHT_RECALL_MAX_QUERY_CHARS", DEFAULT_MAX_QUERY_CHARS))
+    except ValueError:
+        return DEFAULT_MAX_QUERY_CHARS
+    return value if value > 0 else DEFAULT_MAX_QUERY_CHARS
+
+
+def _is_prose(line: str) -> bool:
+    """Return whether a line outside code fences reads as natural language."""
+    stripped = line.strip()
+    if not stripped or line.startswith(("    ", "\t")) or LOG_LINE_PATTERN.match(line):
+        return False
+    letters = sum(c.isalpha() or c.isspace() for c in stripped)
+    return letters / len(stripped) >= 0.8 and " " in stripped
+
+
+def split_prose(text: str) -> Tuple[str, str]:
+    """
+    Separate the natural-language part of a prompt from pasted code and logs.
+
+    Fenced blocks, indented blocks and lines that look like logs, stack frames,
+    diffs or symbol-heavy code go to the pasted part.
+
+    Args:
+        text: Prompt text
+
+    Returns:
+        (prose, pasted) with lines in their original order
+    """
+    prose, pasted = [], []
+    in_fence = False
+    for line in text.splitlines():
+        if FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+            continue
+        if not in_fence and _is_prose(line):
+            prose.append(line.strip())
+        else:
+            pasted.append(line)
+    return "\n".join(prose), "\n".join(pasted)
+
+
+def _unique(items, limit: int) -> List[str]:
+    result = []
+    for item in items:
+        item = item.strip().rstrip(".,:;")
+        if item and item not in result:
+            result.append(item)
+            if len(result) >= limit:
+                break
+    return result
+
+
+def extract_key_terms(text: str) -> List[str]:
+    """
+    Pick the terms that identify what a prompt is about.
+
+    Args:
+        text: Prompt text, including any pasted code or logs
+
+    Returns:
+        Error signatures first, then file paths, then identifiers ordered by how
+        often they occur, without duplicates
+    """
+    without_urls = URL_PATTERN.sub(" ", text)
+    errors = _unique((match.group(0) for match in ERROR_PATTERN.finditer(without_urls)), MAX_ERRORS)
+    paths = _unique(PATH_PATTERN.findall(without_urls), MAX_PATHS)
+
+    counts = Counter(
+        name for name in IDENTIFIER_PATTERN.findall(without_urls) if name.lower() not in COMMON_CALLS
+    )
+    already = " ".join(errors + paths)
+    identifiers = _unique(
+        (name for name, _ in counts.most_common() if name not in already),
+        MAX_IDENTIFIERS,
+    )
+    return errors + paths + identifiers
+
+
+def _head_tail(text: str, max_chars: int) -> str:
+    """Keep the start and end of text within max_chars, cut at word boundaries."""
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    marker = " ... "
+    head = max(0, (max_chars - len(marker)) * 2 // 3)
+    tail = max(0, max_chars - len(marker) - head)
+    head_text = text[:head].rsplit(" ", 1)[0] if head else ""
+    tail_text = text[len(text) - tail :].split(" ", 1)[-1] if tail else ""
+    return f"{head_text}{marker}{tail_text}".strip()
+
+
+def build_recall_query(prompt: str, max_chars: int = 0) -> str:
+    """
+    Build a bounded recall query from a prompt.
+
+    Prompts within the limit are returned unchanged. Longer prompts become their
+    natural-language part (start and end kept if it is itself too long) followed
+    by key terms from the whole prompt, within max_chars.
+
+    Args:
+        prompt: User prompt
+        max_chars: Query limit (default: get_max_query_chars())
+
+    Returns:
+        Recall query of at most max_chars characters
+
+    Examples:
+        build_recall_query("why does login fail?") -> "why does login fail?"
+    """
+    max_chars = max_chars or get_max_query_chars()
+    if len(prompt) <= max_chars:
+        return prompt
+
+    text = strip_base64(strip_ansi(prompt))
+    prose, _ = split_prose(text)
+    terms = extract_key_terms(text)
+
+    prose_budget = int(max_chars * PROSE_SHARE) if terms else max_chars
+    query = _head_tail(prose, prose_budget)
+    for term in terms:
+        if term in query:
+            continue
+        candidate = f"{query} {term}" if query else term
+        if len(candidate) > max_chars:
+            continue
+        query = candidate
+    if not query:
+        # Nothing recognisable: fall back to the start and end of the prompt
+        query = _head_tail(text, max_chars)
+    return query
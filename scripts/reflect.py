@@ -2,22 +2,150 @@
 import argparse
 import json
 import os
+import subprocess
 import sys
+import time
 from bank_utils import get_bank_id
+from breaker_utils import CircuitOpenError
+from client_utils import HindsightClient, circuit_open
+from job_utils import (
+    DONE,
+    FAILED,
+    FINISHED,
+    RUNNING,
+    claim_slot,
+    create_job,
+    load_job,
+    prune_jobs,
+    reap_job,
+    release_slot,
+    update_job,
+)
+from throttle_utils import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, acquire
 
 DEBUG = os.environ.get("HINDSIGHT_DEBUG", "").lower() in ("1", "true", "yes")
 
+POLL_INTERVAL = 0.5  # seconds between job status checks
+SLOT_TIMEOUT = 600.0  # seconds a job waits for a reflect slot before failing
+THROTTLE_TIMEOUT = 120.0  # seconds a running job waits for a rate limiter token
+
 
 def debug(msg: str) -> None:
     if DEBUG:
         print(f"[hindsight-cc:reflect] {msg}", file=sys.stderr)
 
 
+def format_response(response) -> str:
+    """Return the reflection text from a reflect response."""
+    if hasattr(response, "text"):
+        return response.text
+    elif isinstance(response, dict) and "text" in response:
+        return response["text"]
+    elif isinstance(response, str):
+        return response
+    # Fallback: the response as-is
+    return str(response)
+
+
+def run_job(job_id: str) -> None:
+    """Worker: wait for a slot for the job's bank, reflect and store the result."""
+    job = load_job(job_id)
+    if not job:
+        debug(f"No job {job_id}")
+        return
+    update_job(job, pid=os.getpid())
+
+    try:
+        deadline = time.monotonic() + SLOT_TIMEOUT
+        while not claim_slot(job["bank_id"], job_id):
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"no reflect slot free within {SLOT_TIMEOUT:.0f}s")
+            time.sleep(POLL_INTERVAL)
+        started_at = time.time()
+        queue_seconds = round(started_at - job["submitted_at"], 3)
+        update_job(job, status=RUNNING, started_at=started_at, queue_seconds=queue_seconds)
+        debug(f"Job {job_id} started after {queue_seconds:.1f}s in queue")
+
+        if circuit_open(debug_callback=debug):
+            raise CircuitOpenError("Hindsight server is failing, try again later")
+        if not acquire(PRIORITY_BACKGROUND, debug_callback=debug, max_wait=THROTTLE_TIMEOUT):
+            raise TimeoutError(f"throttled: no rate limiter token within {THROTTLE_TIMEOUT:.0f}s")
+
+        client = HindsightClient(debug_callback=debug)
+        try:
+            response = client.reflect(bank_id=job["bank_id"], **job["request"])
+        finally:
+            client.close()
+        finished_at = time.time()
+        update_job(
+            job,
+            status=DONE,
+            result=format_response(response),
+            finished_at=finished_at,
+            run_seconds=round(finished_at - started_at, 3),
+        )
+    except Exception as e:
+        debug(f"Job {job_id} failed: {e}")
+        finished_at = time.time()
+        update_job(
+            job,
+            status=FAILED,
+            error=str(e),
+            finished_at=finished_at,
+            run_seconds=round(finished_at - job.get("started_at", finished_at), 3),
+        )
+    finally:
+        release_slot(job["bank_id"], job_id)
+
+
+def submit_job(bank_id: str, request: dict):
+    """Store a job and start a detached worker for it; return the job and worker."""
+    prune_jobs()
+    job = create_job(bank_id, request)
+    worker = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--run-job", job["id"]],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=None if DEBUG else subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    debug(f"Submitted job {job['id']}")
+    return job, worker
+
+
+def wait_for_job(job_id: str, worker=None) -> dict:
+    """Poll until a job finishes, or its worker dies."""
+    while True:
+        job = load_job(job_id)
+        if job is None:
+            return {"id": job_id, "status": FAILED, "error": "job record disappeared"}
+        job = reap_job(job, exited=worker is not None and worker.poll() is not None)
+        if job["status"] in FINISHED:
+            return job
+        time.sleep(POLL_INTERVAL)
+
+
+def print_job(job: dict) -> None:
+    """Print a job's result, or its status if it has not finished."""
+    if job["status"] not in FINISHED:
+        waited = time.time() - job["submitted_at"]
+        print(f"Reflect job {job['id']} is {job['status']} (submitted {waited:.0f}s ago)")
+        print(f"Check again with: reflect.py --result {job['id']} [--wait]")
+        return
+
+    timing = f"queued {job.get('queue_seconds', 0):.1f}s, ran {job.get('run_seconds', 0):.1f}s"
+    if job["status"] == FAILED:
+        print(f"Error reflecting (job {job['id']}, {timing}): {job.get('error')}", file=sys.stderr)
+        return
+    debug(f"Job {job['id']}: {timing}")
+    print(job["result"])
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Reflect using Hindsight for decision-making and analysis"
     )
-    parser.add_argument("query", help="Question or decision to reflect upon")
+    parser.add_argument("query", nargs="?", help="Question or decision to reflect upon")
     parser.add_argument(
         "--budget",
         default="low",
@@ -38,9 +166,43 @@ def main():
         default=None,
         help="JSON Schema for structured output (as JSON string)",
     )
+    parser.add_argument(
+        "--async",
+        dest="run_async",
+        action="store_true",
+        help="Run the reflection in a background worker and print its job ID",
+    )
+    parser.add_argument(
+        "--result",
+        metavar="JOB_ID",
+        default=None,
+        help="Print the result of a background reflection",
+    )
+    parser.add_argument(
+        "--wait",
+        action="store_true",
+        help="With --async or --result, wait for the reflection to finish",
+    )
+    parser.add_argument("--run-job", default=None, help=argparse.SUPPRESS)
 
     args = parser.parse_args()
 
+    if args.run_job:
+        run_job(args.run_job)
+        return
+
+    if args.result:
+        job = load_job(args.result)
+        if not job:
+            print(f"Error: no reflect job {args.result}", file=sys.stderr)
+            sys.exit(1)
+        job = wait_for_job(args.result) if args.wait else reap_job(job)
+        print_job(job)
+        return
+
+    if not args.query:
+        parser.error("the following arguments are required: query")
+
     # Parse response_schema if provided
     response_schema = None
     if args.response_schema:
@@ -59,40 +221,45 @@ def main():
     debug(f"Context: {args.context}")
     debug(f"Max tokens: {args.max_tokens}")
 
-    try:
-        from hindsight_client import Hindsight
+    # Build kwargs for reflect call
+    kwargs = {
+        "query": args.query,
+        "budget": args.budget,
+    }
 
-        client = Hindsight(base_url="http://localhost:8888")
+    # Only add optional parameters if they're not None
+    if args.context is not None:
+        kwargs["context"] = args.context
+    if args.max_tokens != 4096:
+        kwargs["max_tokens"] = args.max_tokens
+    if response_schema is not None:
+        kwargs["response_schema"] = response_schema
 
-        # Build kwargs for reflect call
-        kwargs = {
-            "bank_id": bank_id,
-            "query": args.query,
-            "budget": args.budget,
-        }
+    if args.run_async:
+        job, worker = submit_job(bank_id, kwargs)
+        if args.wait:
+            print_job(wait_for_job(job["id"], worker))
+        else:
+            print(f"Reflect job ID: {job['id']}")
+            print(f"Collect the result with: reflect.py --result {job['id']} [--wait]")
+        return
 
-        # Only add optional parameters if they're not None
-        if args.context is not None:
-            kwargs["context"] = args.context
-        if args.max_tokens != 4096:
-            kwargs["max_tokens"] = args.max_tokens
-        if response_schema is not None:
-            kwargs["response_schema"] = response_schema
+    if circuit_open(debug_callback=debug):
+        print("Error reflecting: Hindsight server is failing, try again later", file=sys.stderr)
+        return
+    acquire(PRIORITY_INTERACTIVE, debug_callback=debug)
+
+    try:
+        client = HindsightClient(debug_callback=debug)
 
         debug(f"Calling reflect with: {kwargs}")
-        response = client.reflect(**kwargs)
-        client.close()
+        try:
+            response = client.reflect(bank_id=bank_id, **kwargs)
+        finally:
+            client.close()
 
         # Print the reflection output to stdout
-        if hasattr(response, "text"):
-            print(response.text)
-        elif isinstance(response, dict) and "text" in response:
-            print(response["text"])
-        elif isinstance(response, str):
-            print(response)
-        else:
-            # Fallback: print the response as-is
-            print(response)
+        print(format_response(response))
 
     except Exception as e:
         debug(f"Failed to reflect: {e}")
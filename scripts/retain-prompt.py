@@ -2,7 +2,13 @@
 import json
 import os
 import sys
-from bank_utils import get_bank_id
+from bank_utils import get_bank_id, get_project_dir
+from client_utils import HindsightClient, circuit_open
+from metadata_utils import build_retain_metadata, get_git_branch
+from retain_queue_utils import KIND_PROMPT, defer_retain
+from session_utils import content_hash, count_avoided, is_prompt_retained, record_retained_prompt
+from throttle_utils import PRIORITY_PROMPT, acquire
+from transcript_utils import byte_len, compact_text, get_role_budgets
 
 DEBUG = os.environ.get("HINDSIGHT_DEBUG", "").lower() in ("1", "true", "yes")
 
@@ -32,16 +38,52 @@ def main():
     elif not isinstance(content, str):
         content = str(content)
 
-    debug(f"Content length: {len(content)} chars")
+    prompt = content
+    bytes_before = byte_len(content)
+    content = compact_text(content, max_bytes=get_role_budgets()["user"])
+    debug(f"Compacted prompt: {bytes_before} -> {byte_len(content)} bytes")
 
+    # A prompt resubmitted in the same session is already in the bank
+    session_id = input_data.get("session_id")
     try:
-        from hindsight_client import Hindsight
+        if session_id and is_prompt_retained(session_id, prompt):
+            count_avoided(retains=1, bytes_saved=byte_len(content))
+            debug("Prompt already retained in this session, skipping")
+            return
+    except OSError as e:
+        debug(f"Session state unavailable: {e}")
 
+    tags, metadata = build_retain_metadata(branch=get_git_branch(get_project_dir()), session_id=session_id)
+    debug(f"Tags: {tags}")
+
+    # While the server is failing, the turn's transcript retain carries the prompt
+    if circuit_open(debug_callback=debug):
+        return
+    if not acquire(PRIORITY_PROMPT, debug_callback=debug):
+        debug("Deferring prompt retain under backpressure")
+        defer_retain(
+            KIND_PROMPT,
+            bank_id,
+            content,
+            debug_callback=debug,
+            tags=tags,
+            metadata=metadata,
+            session_id=session_id,
+            prompt_hash=content_hash(prompt),
+        )
+        return
+
+    try:
         debug("Connecting to Hindsight server")
-        client = Hindsight(base_url="http://localhost:8888")
-        client.retain(bank_id=bank_id, content=content)
-        client.close()
+        client = HindsightClient(debug_callback=debug)
+        try:
+            client.retain(bank_id=bank_id, content=content, tags=tags, metadata=metadata)
+        finally:
+            client.close()
         debug("Successfully retained prompt")
+        if session_id:
+            # Lets retain-transcript.py reference the prompt instead of resending it
+            record_retained_prompt(session_id, prompt)
     except Exception as e:
         debug(f"Failed to retain prompt: {e}")
         # Silently fail if Hindsight is unavailable
@@ -2,7 +2,23 @@
 import json
 import os
 import sys
-from bank_utils import get_bank_id
+from bank_utils import get_bank_id, get_project_dir
+from client_utils import HindsightClient, circuit_open, is_server_failure
+from metadata_utils import build_retain_metadata, extract_touched_paths, get_git_branch, transcript_branch
+from retain_queue_utils import KIND_TRANSCRIPT, defer_retain, start_drainer
+from scoring_utils import decide, record_decision, score_turn
+from session_utils import count_avoided, is_prompt_retained, record_live_turn
+from throttle_utils import PRIORITY_BACKGROUND, acquire
+from transcript_utils import (
+    byte_len,
+    compact_text,
+    extract_text,
+    format_turn,
+    get_last_turn,
+    get_role_budgets,
+    omit_retained_prompt,
+    read_transcript,
+)
 
 DEBUG = os.environ.get("HINDSIGHT_DEBUG", "").lower() in ("1", "true", "yes")
 
@@ -32,12 +48,8 @@ def main():
     debug(f"Reading transcript from: {transcript_path}")
 
     # Read the JSONL transcript file
-    messages = []
     try:
-        with open(os.path.expanduser(transcript_path), 'r') as f:
-            for line in f:
-                if line.strip():
-                    messages.append(json.loads(line))
+        messages = read_transcript(transcript_path)
         debug(f"Read {len(messages)} messages from transcript")
     except (FileNotFoundError, json.JSONDecodeError) as e:
         debug(f"Failed to read transcript: {e}")
@@ -47,50 +59,90 @@ def main():
         debug("No messages in transcript")
         return
 
-    # Find the last user message index
-    last_user_idx = -1
-    for i in range(len(messages) - 1, -1, -1):
-        if messages[i].get("message", {}).get("role") == "user":
-            last_user_idx = i
-            break
-
-    if last_user_idx == -1:
+    # Get messages from last user prompt onwards
+    recent_messages = get_last_turn(messages)
+    if not recent_messages:
         debug("No user message found in transcript")
         return
-
-    # Get messages from last user prompt onwards
-    recent_messages = messages[last_user_idx:]
     debug(f"Processing {len(recent_messages)} messages from last user prompt")
+    turn = recent_messages
 
-    # Format transcript section
-    lines = []
-    for msg in recent_messages:
-        inner = msg.get("message", {})
-        role = inner.get("role", "unknown")
-        content = inner.get("content", "")
-        if isinstance(content, list):
-            content = "\n".join(
-                part.get("text", "") for part in content if isinstance(part, dict) and part.get("type") == "text"
-            ).strip()
-        elif not isinstance(content, str):
-            content = json.dumps(content, ensure_ascii=True)
-        lines.append(f"{role}: {content}")
-
-    transcript = "\n".join(lines)
-    debug(f"Formatted transcript: {len(transcript)} chars")
-
+    # The prompt was retained on submit; only reference it here
+    session_id = input_data.get("session_id")
+    prompt = extract_text(recent_messages[0].get("message", {}).get("content", ""))
     try:
-        from hindsight_client import Hindsight
+        prompt_retained = bool(session_id) and is_prompt_retained(session_id, prompt)
+    except OSError as e:
+        debug(f"Session state unavailable: {e}")
+        prompt_retained = False
+    if prompt_retained:
+        has_reply = any(
+            extract_text(entry.get("message", {}).get("content", "")).strip()
+            for entry in recent_messages[1:]
+            if not entry.get("isSidechain")
+        )
+        if not has_reply:
+            prompt_bytes = byte_len(compact_text(prompt, max_bytes=get_role_budgets()["user"]))
+            count_avoided(retains=1, bytes_saved=prompt_bytes)
+            debug("Turn holds only the already-retained prompt, skipping")
+            record_live_turn(session_id, turn[0].get("timestamp"))
+            return
+        recent_messages, saved_bytes = omit_retained_prompt(recent_messages)
+        count_avoided(bytes_saved=saved_bytes)
+        debug(f"Referenced already-retained prompt, {saved_bytes} bytes avoided")
+
+    # Format and compact transcript section
+    transcript, bytes_before, bytes_after = format_turn(recent_messages)
+    saved = 100 * (bytes_before - bytes_after) // bytes_before if bytes_before else 0
+    debug(f"Compacted transcript: {bytes_before} -> {bytes_after} bytes ({saved}% saved)")
+
+    # Skip low-signal turns (small talk, quick lookups) unless sampled
+    score, signals = score_turn(turn, bytes_after)
+    decision = decide(score, transcript)
+    record_decision(decision, score)
+    debug(f"Turn score {score} ({', '.join(f'{k}={v}' for k, v in signals.items())}): {decision}")
+    if decision == "skip":
+        debug("Skipping low-value turn")
+        return
 
+    # Tag the turn with where the work happened, for scoped recall
+    project_dir = get_project_dir()
+    tags, metadata = build_retain_metadata(
+        branch=transcript_branch(turn) or get_git_branch(project_dir),
+        paths=extract_touched_paths(turn, project_dir),
+        session_id=session_id,
+        timestamp=turn[0].get("timestamp"),
+    )
+    debug(f"Tags: {tags}")
+
+    # Turns that cannot be sent now are queued for drain-retains.py instead of dropped
+    queued = {"tags": tags, "metadata": metadata, "session_id": session_id, "turn_timestamp": turn[0].get("timestamp")}
+    if circuit_open(debug_callback=debug):
+        defer_retain(KIND_TRANSCRIPT, bank_id, transcript, debug_callback=debug, start=False, **queued)
+        return
+    if not acquire(PRIORITY_BACKGROUND, debug_callback=debug):
+        debug("Deferring transcript retain under backpressure")
+        defer_retain(KIND_TRANSCRIPT, bank_id, transcript, debug_callback=debug, **queued)
+        return
+
+    try:
         debug("Connecting to Hindsight server")
-        client = Hindsight(base_url="http://localhost:8888")
-        client.retain(bank_id=bank_id, content=transcript)
-        client.close()
+        client = HindsightClient(debug_callback=debug)
+        try:
+            client.retain(bank_id=bank_id, content=transcript, tags=tags, metadata=metadata)
+        finally:
+            client.close()
         debug("Successfully retained transcript")
+        if session_id:
+            # Lets backfill-transcripts.py skip the turn
+            record_live_turn(session_id, turn[0].get("timestamp"))
     except Exception as e:
         debug(f"Failed to retain transcript: {e}")
-        # Silently fail if Hindsight is unavailable
-        pass
+        if is_server_failure(e):
+            defer_retain(KIND_TRANSCRIPT, bank_id, transcript, debug_callback=debug, start=False, **queued)
+        return
+    # The server is answering; send anything queued earlier
+    start_drainer(debug)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Shared utilities for deferring retains under backpressure.
+
+Hooks never wait on the rate limiter: the prompt and Stop hooks run while the
+user waits. When a retain cannot get a token at once (for example several
+sessions ending together), the hook puts the ready-to-send retain in a queue in
+the plugin state directory and starts a detached drain-retains.py worker, which
+waits for tokens and sends the queued retains in order.
+
+Only one worker runs at a time. It stops when the queue is empty, while the
+circuit breaker is open, or when no token arrives in time; the next hook that
+queues or retains starts it again. Queued retains expire after a day, and the
+oldest are dropped once the queue is full, counted for get-status.py.
+"""
+
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from state_utils import get_state_dir, locked_state, read_state
+
+STATE_NAME = "retain-queue"
+
+MAX_QUEUED = 200  # retains kept waiting; the oldest are dropped beyond this
+MAX_AGE = 24 * 3600  # seconds a queued retain stays worth sending
+MAX_ATTEMPTS = 3  # failed sends before a queued retain is dropped
+
+KIND_PROMPT = "prompt"
+KIND_TRANSCRIPT = "transcript"
+
+DRAIN_SCRIPT = Path(__file__).parent / "drain-retains.py"
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def enqueue_retain(kind: str, bank_id: str, content: str, **fields) -> None:
+    """
+    Queue a retain to be sent by the drain worker.
+
+    Args:
+        kind: KIND_PROMPT or KIND_TRANSCRIPT, which decides what the worker
+            records after a successful send
+        bank_id: Bank to retain into
+        content: Content to retain, already compacted
+        **fields: tags and metadata for the retain, and session_id plus
+            prompt_hash (prompts) or turn_timestamp (transcripts)
+    """
+    item = {"kind": kind, "bank_id": bank_id, "content": content, "queued_at": time.time(), "attempts": 0, **fields}
+    with locked_state(STATE_NAME) as state:
+        items = state.get("items", []) + [item]
+        dropped = max(len(items) - MAX_QUEUED, 0)
+        state["items"] = items[dropped:]
+        state["queued"] = state.get("queued", 0) + 1
+        state["dropped"] = state.get("dropped", 0) + dropped
+
+
+def pop_retain() -> Optional[dict]:
+    """Take the oldest queued retain that has not expired, or None if there is none."""
+    cutoff = time.time() - MAX_AGE
+    with locked_state(STATE_NAME) as state:
+        items = state.get("items", [])
+        while items:
+            item = items.pop(0)
+            if item["queued_at"] >= cutoff:
+                state["items"] = items
+                return item
+            state["expired"] = state.get("expired", 0) + 1
+        state["items"] = items
+        return None
+
+
+def requeue_retain(item: dict) -> None:
+    """Put a retain that failed to send back at the front, unless it has failed too often."""
+    item = {**item, "attempts": item.get("attempts", 0) + 1}
+    with locked_state(STATE_NAME) as state:
+        if item["attempts"] >= MAX_ATTEMPTS:
+            state["dropped"] = state.get("dropped", 0) + 1
+            return
+        state["items"] = [item] + state.get("items", [])
+
+
+def record_sent() -> None:
+    """Count a queued retain the worker sent."""
+    with locked_state(STATE_NAME) as state:
+        state["sent"] = state.get("sent", 0) + 1
+
+
+def pending_count() -> int:
+    """Return how many retains are queued, without taking the lock."""
+    return len(read_state(get_state_dir() / f"{STATE_NAME}.json").get("items", []))
+
+
+def claim_drainer() -> bool:
+    """Become the drain worker; False if a live worker already holds the role."""
+    pid = os.getpid()
+    with locked_state(STATE_NAME) as state:
+        current = state.get("drainer")
+        if current and current != pid and _alive(current):
+            return False
+        state["drainer"] = pid
+        return True
+
+
+def release_drainer() -> None:
+    """Give up the drain worker role."""
+    with locked_state(STATE_NAME) as state:
+        if state.get("drainer") == os.getpid():
+            state["drainer"] = None
+
+
+def start_drainer(debug_callback: Optional[Callable[[str], None]] = None) -> None:
+    """
+    Start a detached drain worker if retains are queued and none is running.
+
+    Cheap when the queue is empty: a single read of the queue state.
+    """
+    state = read_state(get_state_dir() / f"{STATE_NAME}.json")
+    if not state.get("items"):
+        return
+    drainer = state.get("drainer")
+    if drainer and _alive(drainer):
+        return
+    debug = os.environ.get("HINDSIGHT_DEBUG", "").lower() in ("1", "true", "yes")
+    try:
+        subprocess.Popen(
+            [sys.executable, str(DRAIN_SCRIPT)],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=None if debug else subprocess.DEVNULL,
+            start_new_session=True,
+        )
+    except OSError as e:
+        if debug_callback:
+            debug_callback(f"Failed to start retain drain worker: {e}")
+        return
+    if debug_callback:
+        debug_callback(f"Started retain drain worker for {len(state['items'])} queued retains")
+
+
+def defer_retain(
+    kind: str,
+    bank_id: str,
+    content: str,
+    debug_callback: Optional[Callable[[str], None]] = None,
+    start: bool = True,
+    **fields,
+) -> None:
+    """
+    Queue a retain from a hook and, unless start is False, start the drain worker.
+
+    Pass start=False while the server is known to be failing; the next hook
+    that retains successfully starts the worker. Never raises.
+    """
+    try:
+        enqueue_retain(kind, bank_id, content, **fields)
+    except OSError as e:
+        if debug_callback:
+            debug_callback(f"Retain queue unavailable, dropping {kind} retain: {e}")
+        return
+    if debug_callback:
+        debug_callback(f"Queued {kind} retain for later")
+    if start:
+        start_drainer(debug_callback)
+
+
+def get_queue_stats() -> dict:
+    """
+    Return the retain queue counters.
+
+    Returns:
+        Dict with "pending", "queued", "sent", "dropped" and "expired"
+    """
+    with locked_state(STATE_NAME) as state:
+        return {
+            "pending": len(state.get("items", [])),
+            "queued": state.get("queued", 0),
+            "sent": state.get("sent", 0),
+            "dropped": state.get("dropped", 0),
+            "expired": state.get("expired", 0),
+        }
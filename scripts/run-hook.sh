@@ -0,0 +1,27 @@
+#!/bin/sh
+
+# Run a plugin script with the scripts venv
+# Used by hooks and slash commands so they degrade gracefully while
+# install-dependencies.sh is still installing in the background.
+#
+# Usage: run-hook.sh <script.py> [args...]
+
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
+SCRIPT="$1"
+shift
+
+# The stamp is removed while an install runs and must be newer than
+# requirements.txt, so an upgraded plugin never runs against the old venv
+STAMP="$SCRIPT_DIR/.venv/.hindsight-cc-ready"
+if [ ! -f "$STAMP" ] || [ ! "$STAMP" -nt "$SCRIPT_DIR/requirements.txt" ]; then
+    case "${HINDSIGHT_DEBUG:-}" in
+        1|[Tt][Rr][Uu][Ee]|[Yy][Ee][Ss])
+            echo "[hindsight-cc:run-hook] Dependencies not installed yet, skipping $SCRIPT" >&2
+            ;;
+    esac
+    # Slash commands show their output; hooks ignore stderr on success
+    echo "hindsight-cc is still installing its dependencies; try again in a minute." >&2
+    exit 0
+fi
+
+exec "$SCRIPT_DIR/.venv/bin/python3" "$SCRIPT_DIR/$SCRIPT" "$@"
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Shared utilities for scoring the value of transcript turns before retain.
+
+Many turns carry little that is worth remembering ("thanks", "ok, continue", a
+quick lookup), yet each retain costs an LLM extraction on the server. Turns are
+scored from cheap signals in the transcript:
+
+- code edits: Edit, Write, MultiEdit or NotebookEdit tool calls
+- commands: Bash tool calls
+- decisions and preferences stated explicitly in the conversation
+- error resolutions: a failed tool call or error output later followed by
+  successful calls or a fix
+- compacted length
+
+Turns scoring below HINDSIGHT_RETAIN_MIN_SCORE are skipped, except for a
+deterministic sample (HINDSIGHT_RETAIN_SAMPLE_RATE) that is retained anyway so the
+bank still sees some of them. Outcomes are counted machine-wide for get-status.py.
+"""
+
+import hashlib
+import os
+import re
+from typing import Dict, List, Tuple
+
+from state_utils import locked_state
+from transcript_utils import extract_text
+
+STATE_NAME = "scoring"
+
+DEFAULT_MIN_SCORE = 1.0
+DEFAULT_SAMPLE_RATE = 0.1
+
+EDIT_TOOLS = {"Edit", "Write", "MultiEdit", "NotebookEdit"}
+COMMAND_TOOLS = {"Bash"}
+
+# Signal weights; a turn with any one strong signal reaches the default threshold
+WEIGHTS = {
+    "edits": 2.0,
+    "commands": 0.5,
+    "decisions": 1.5,
+    "errors": 0.5,
+    "resolutions": 1.5,
+}
+# Compacted size that earns a length score of 1.0: an explanation this long is worth
+# retaining without any other signal, while quick answers stay below the threshold
+LENGTH_FULL_SCORE_BYTES = 1000
+
+# Explicit decision and preference phrasing only; words like "because" or "never"
+# appear in most explanations and would mark every chatty turn as a decision
+DECISION_PATTERN = re.compile(
+    r"\b(?:decided|decision is|let's (?:go with|use|stick with)|(?:we|i)(?:'ll| will) (?:use|go with|stick with)|"
+    r"going with|settled on|(?:we|i) (?:chose|opted|prefer)|(?:always|never|don't|do not) use|"
+    r"from now on|going forward|convention is|trade-?off)\b",
+    re.IGNORECASE,
+)
+ERROR_PATTERN = re.compile(r"Traceback|\b\w*(?:Error|Exception)\b|\bFAILED\b|\berror:", re.IGNORECASE)
+FIX_PATTERN = re.compile(r"\b(?:fixed|resolved|works now|passing|passes|root cause)\b", re.IGNORECASE)
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        value = float(os.environ.get(name, default))
+    except ValueError:
+        return default
+    return value if value >= 0 else default
+
+
+def get_scoring_config() -> Tuple[float, float]:
+    """
+    Return the configured (min_score, sample_rate).
+
+    HINDSIGHT_RETAIN_MIN_SCORE sets the score below which turns are skipped (0
+    retains every turn) and HINDSIGHT_RETAIN_SAMPLE_RATE the fraction of those
+    turns retained anyway, between 0 and 1.
+    """
+    min_score = _env_number("HINDSIGHT_RETAIN_MIN_SCORE", DEFAULT_MIN_SCORE)
+    sample_rate = min(_env_number("HINDSIGHT_RETAIN_SAMPLE_RATE", DEFAULT_SAMPLE_RATE), 1.0)
+    return min_score, sample_rate
+
+
+def _parts(entry: dict) -> List[dict]:
+    content = entry.get("message", {}).get("content", "")
+    return [part for part in content if isinstance(part, dict)] if isinstance(content, list) else []
+
+
+def score_turn(entries: List[dict], compacted_bytes: int) -> Tuple[float, Dict[str, float]]:
+    """
+    Score how much a turn is worth retaining.
+
+    Args:
+        entries: Transcript entries of one turn
+        compacted_bytes: Size of the turn after compaction
+
+    Returns:
+        (score, signals) where signals maps each contributing signal to its score
+
+    Examples:
+        A turn that edits a file and explains why scores about 3.5-4.5; a
+        "thanks" / "you're welcome" exchange scores under 0.1.
+    """
+    edits = commands = 0
+    errors = resolved = False
+    conversation = []
+
+    for entry in entries:
+        if entry.get("isSidechain"):
+            continue
+        role = entry.get("message", {}).get("role")
+        text = extract_text(entry.get("message", {}).get("content", ""))
+        if role in ("user", "assistant") and text.strip():
+            conversation.append(text)
+            if errors and role == "assistant" and FIX_PATTERN.search(text):
+                resolved = True
+        for part in _parts(entry):
+            if part.get("type") == "tool_use":
+                name = part.get("name")
+                if name in EDIT_TOOLS:
+                    edits += 1
+                elif name in COMMAND_TOOLS:
+                    commands += 1
+                if errors and name in EDIT_TOOLS:
+                    # An edit after an error is an attempted fix
+                    resolved = True
+            elif part.get("type") == "tool_result":
+                output = extract_text(part.get("content", ""))
+                if part.get("is_error") is True or ERROR_PATTERN.search(output):
+                    errors = True
+                elif errors and part.get("is_error") is False:
+                    resolved = True
+
+    signals: Dict[str, float] = {}
+    if edits:
+        signals["edits"] = WEIGHTS["edits"] + min(edits - 1, 2) * 0.5
+    if commands:
+        signals["commands"] = WEIGHTS["commands"]
+    if any(DECISION_PATTERN.search(text) for text in conversation):
+        signals["decisions"] = WEIGHTS["decisions"]
+    if errors:
+        signals["resolutions" if resolved else "errors"] = WEIGHTS["resolutions" if resolved else "errors"]
+    signals["length"] = round(min(compacted_bytes / LENGTH_FULL_SCORE_BYTES, 1.0), 2)
+    return round(sum(signals.values()), 2), signals
+
+
+def in_sample(key: str, rate: float) -> bool:
+    """Return whether key falls in a deterministic sample of the given rate."""
+    if rate <= 0:
+        return False
+    bucket = int(hashlib.sha256(key.encode()).hexdigest()[:8], 16) / 0xFFFFFFFF
+    return bucket < rate
+
+
+def decide(score: float, key: str) -> str:
+    """
+    Decide what to do with a scored turn.
+
+    Args:
+        score: Result of score_turn()
+        key: Stable key for the turn (content or document ID), used for sampling
+
+    Returns:
+        "retain", "sample" (below the threshold but sampled) or "skip"
+    """
+    min_score, sample_rate = get_scoring_config()
+    if score >= min_score:
+        return "retain"
+    return "sample" if in_sample(key, sample_rate) else "skip"
+
+
+def record_decision(decision: str, score: float) -> None:
+    """Add a decision to the machine-wide scoring counters."""
+    try:
+        with locked_state(STATE_NAME) as state:
+            counts = state.setdefault("counts", {"retain": 0, "sample": 0, "skip": 0})
+            counts[decision] = counts.get(decision, 0) + 1
+            state["score_total"] = round(state.get("score_total", 0.0) + score, 2)
+    except OSError:
+        # Counters are informational; never fail a hook over them
+        pass
+
+
+def get_scoring_stats() -> dict:
+    """
+    Return the scoring counters.
+
+    Returns:
+        Dict with "counts" per decision and "mean_score" over all scored turns
+    """
+    with locked_state(STATE_NAME) as state:
+        counts = dict(state.get("counts", {"retain": 0, "sample": 0, "skip": 0}))
+        total = sum(counts.values())
+        return {
+            "counts": counts,
+            "mean_score": state.get("score_total", 0.0) / total if total else 0.0,
+        }
@@ -1,22 +1,131 @@
 #!/usr/bin/env python3
+import argparse
+import statistics
 import sys
-from bank_utils import get_bank_id
+import time
+from bank_utils import get_bank_id, get_project_dir
+from client_utils import HindsightClient, circuit_open
+from metadata_utils import SCOPES, TAGS_MATCH, build_recall_tags, get_recall_scopes
+from throttle_utils import PRIORITY_INTERACTIVE, acquire
+
+
+def parse_scopes(value: str) -> list:
+    scopes = [scope.strip().lower() for scope in value.split(",") if scope.strip()]
+    unknown = [scope for scope in scopes if scope not in SCOPES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown scope {unknown[0]!r} (choose from {', '.join(SCOPES)})")
+    return scopes
+
+
+def split_query(argv: list, value_options: set, flag_options: set) -> tuple:
+    """
+    Split command-line arguments into options and query words, keeping word order.
+
+    Anything that is not one of the given options is part of the query, so queries
+    may contain words such as "-v" or "--force". Words after "--" are always query.
+
+    Examples:
+        split_query(["--scope", "path", "what", "does", "-v", "do"], {"--scope"}, set())
+        -> (["--scope", "path"], ["what", "does", "-v", "do"])
+    """
+    options, words = [], []
+    index = 0
+    while index < len(argv):
+        arg = argv[index]
+        if arg == "--":
+            words.extend(argv[index + 1 :])
+            break
+        if arg in flag_options:
+            options.append(arg)
+        elif arg.split("=", 1)[0] in value_options:
+            options.append(arg)
+            if "=" not in arg and index + 1 < len(argv):
+                index += 1
+                options.append(argv[index])
+        else:
+            words.append(arg)
+        index += 1
+    return options, words
+
+
+def timed_recall(client, bank_id: str, query: str, runs: int, **kwargs):
+    """Recall `runs` times (at least once); return the last response and the median latency in milliseconds."""
+    timings = []
+    while True:
+        start = time.perf_counter()
+        response = client.recall(bank_id=bank_id, query=query, **kwargs)
+        timings.append((time.perf_counter() - start) * 1000)
+        if len(timings) >= runs:
+            return response, statistics.median(timings)
+
+
+def compare(client, bank_id: str, query: str, tags: list, runs: int) -> None:
+    """Print how much the scope narrows the candidate set and recall latency."""
+    scoped = {"tags": tags, "tags_match": TAGS_MATCH}
+    total = client.list_memories(bank_id=bank_id, limit=1).total
+    in_scope = client.list_memories(bank_id=bank_id, limit=1, **scoped).total
+    reduction = 100 * (total - in_scope) // total if total else 0
+    print(f"Candidates: {in_scope} of {total} memories in scope ({reduction}% fewer)")
+
+    unscoped_response, unscoped_ms = timed_recall(client, bank_id, query, runs)
+    scoped_response, scoped_ms = timed_recall(client, bank_id, query, runs, **scoped)
+    print(
+        f"Recall latency: {unscoped_ms:.0f} ms unscoped, {scoped_ms:.0f} ms scoped "
+        f"(median of {runs}); {len(unscoped_response.results)} -> {len(scoped_response.results)} results\n"
+    )
 
 
 def main():
-    query = " ".join(sys.argv[1:]) if len(sys.argv) > 1 else ""
+    parser = argparse.ArgumentParser(description="Search the project's Hindsight memory bank")
+    parser.add_argument("query", nargs="*", help="Search query; may contain words starting with -")
+    parser.add_argument(
+        "--scope",
+        type=parse_scopes,
+        default=None,
+        help="Narrow to memories tagged with the current branch and/or directories the query "
+        "mentions, e.g. branch,path (default: HINDSIGHT_RECALL_SCOPE)",
+    )
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Report candidate set size and recall latency with and without the scope",
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=3,
+        help="Recalls per measurement with --compare (default: 3)",
+    )
+    options, words = split_query(sys.argv[1:], {"--scope", "--runs"}, {"--compare", "-h", "--help"})
+    args = parser.parse_args(options)
+
+    query = " ".join(words)
     if not query:
         print("Usage: search-memories.py <query>")
         sys.exit(1)
 
     bank_id = get_bank_id()
+    scopes = get_recall_scopes() if args.scope is None else args.scope
+    tags = build_recall_tags(scopes, get_project_dir(), prompt=query) if scopes else []
+    if circuit_open():
+        print("Error searching memories: Hindsight server is failing, try again later")
+        sys.exit(1)
+    acquire(PRIORITY_INTERACTIVE)
 
     try:
-        from hindsight_client import Hindsight
-
-        client = Hindsight(base_url="http://localhost:8888")
-        response = client.recall(bank_id=bank_id, query=query)
-        client.close()
+        client = HindsightClient()
+        try:
+            if tags:
+                print(f"Scope: {', '.join(tags)}")
+            if args.compare:
+                if tags:
+                    compare(client, bank_id, query, tags, max(args.runs, 1))
+                else:
+                    print("Nothing to compare: no scope applies to this query\n")
+            kwargs = {"tags": tags, "tags_match": TAGS_MATCH} if tags else {}
+            response = client.recall(bank_id=bank_id, query=query, **kwargs)
+        finally:
+            client.close()
 
         if response.results:
             print(f"Found {len(response.results)} relevant memories:\n")
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Shared utilities for per-session plugin state.
+
+Hooks receive the Claude Code session ID in their JSON payload. State that only
+matters for the lifetime of one session, such as which memories have already been
+injected into its context, lives in a session-<id>.json file in the plugin state
+directory. The SessionEnd hook deletes it, and files left behind by sessions that
+never ended cleanly are pruned after a week.
+
+Prompts are retained when submitted and again as the start of the turn's
+transcript. The session records which prompts were retained, so the transcript
+retain can reference them instead; bytes and retains saved this way are counted
+machine-wide for get-status.py.
+
+Each turn the hooks retain is also recorded in a live-<id>.json file, kept for 90
+days, so backfill-transcripts.py leaves those turns alone while still retaining
+turns the hooks shed or failed to retain.
+"""
+
+import fcntl
+import hashlib
+import time
+from typing import Iterable, List, Optional, Set
+
+from state_utils import get_state_dir, locked_state, read_state, safe_name
+
+MAX_INJECTED = 5000  # memory keys remembered per session
+MAX_RETAINED_PROMPTS = 1000  # prompt hashes remembered per session
+MAX_LIVE_TURNS = 5000  # retained turns remembered per session for backfill
+STALE_SECONDS = 7 * 24 * 3600
+LIVE_STALE_SECONDS = 90 * 24 * 3600  # past Claude Code's default transcript retention
+
+DEDUPE_STATE_NAME = "dedupe"
+
+
+def _state_name(session_id: str) -> str:
+    return f"session-{safe_name(session_id)}"
+
+
+def content_hash(text: str) -> str:
+    """Return a short hash of text that ignores differences in whitespace."""
+    return "sha256:" + hashlib.sha256(" ".join(text.split()).encode()).hexdigest()[:16]
+
+
+def memory_key(memory_id, text: str) -> str:
+    """
+    Return a stable key for a recalled memory.
+
+    Uses the server's memory ID when present, otherwise a hash of the text.
+
+    Examples:
+        memory_key("0b6c...", "text") -> "0b6c..."
+        memory_key(None, "text") -> "sha256:982d9e3eb996f559"
+    """
+    if memory_id:
+        return str(memory_id)
+    return content_hash(text)
+
+
+def filter_injected(session_id: str, keys: Iterable[str]) -> List[str]:
+    """
+    Return the keys not yet injected in this session and record them as injected.
+
+    Args:
+        session_id: Claude Code session ID from the hook payload
+        keys: memory_key() of each recalled memory
+
+    Returns:
+        The new keys, in their original order
+    """
+    with locked_state(_state_name(session_id)) as state:
+        injected = state.get("injected", [])
+        seen = set(injected)
+        new = []
+        for key in keys:
+            if key not in seen:
+                seen.add(key)
+                new.append(key)
+        state["injected"] = (injected + new)[-MAX_INJECTED:]
+        state["updated"] = time.time()
+    return new
+
+
+def reset_injected(session_id: str) -> None:
+    """Forget injected memories, e.g. after the session's context was compacted."""
+    with locked_state(_state_name(session_id)) as state:
+        state["injected"] = []
+        state["updated"] = time.time()
+
+
+def record_retained_prompt(session_id: str, prompt: str) -> None:
+    """Remember that a prompt was retained in this session."""
+    record_retained_hash(session_id, content_hash(prompt))
+
+
+def record_retained_hash(session_id: str, prompt_hash: str) -> None:
+    """Remember that the prompt with this content_hash() was retained, e.g. after a deferred retain."""
+    with locked_state(_state_name(session_id)) as state:
+        retained = state.get("retained_prompts", [])
+        state["retained_prompts"] = (retained + [prompt_hash])[-MAX_RETAINED_PROMPTS:]
+        state["updated"] = time.time()
+
+
+def is_prompt_retained(session_id: str, prompt: str) -> bool:
+    """Return whether a prompt was already retained in this session."""
+    state = read_state(get_state_dir() / f"{_state_name(session_id)}.json")
+    return content_hash(prompt) in state.get("retained_prompts", [])
+
+
+def count_avoided(retains: int = 0, bytes_saved: int = 0) -> None:
+    """
+    Add to the machine-wide counters of retain work avoided by deduplication.
+
+    Args:
+        retains: Retain calls skipped entirely
+        bytes_saved: Bytes left out of retained content
+    """
+    try:
+        with locked_state(DEDUPE_STATE_NAME) as state:
+            state["retains_avoided"] = state.get("retains_avoided", 0) + retains
+            state["bytes_avoided"] = state.get("bytes_avoided", 0) + bytes_saved
+    except OSError:
+        # Counters are informational; never fail a hook over them
+        pass
+
+
+def get_avoided() -> dict:
+    """
+    Return the retain deduplication counters.
+
+    Returns:
+        Dict with "retains_avoided" and "bytes_avoided"
+    """
+    with locked_state(DEDUPE_STATE_NAME) as state:
+        return {
+            "retains_avoided": state.get("retains_avoided", 0),
+            "bytes_avoided": state.get("bytes_avoided", 0),
+        }
+
+
+def _live_state_name(session_id: str) -> str:
+    return f"live-{safe_name(session_id)}"
+
+
+def record_live_turn(session_id: str, timestamp: Optional[str]) -> None:
+    """
+    Record that the hooks retained a turn of this session.
+
+    Args:
+        session_id: Claude Code session ID from the hook payload
+        timestamp: Transcript timestamp of the turn's prompt entry, which
+            backfill_utils.parse_transcript_file() reports for the same turn
+    """
+    if not timestamp:
+        return
+    try:
+        with locked_state(_live_state_name(session_id)) as state:
+            turns = state.get("turns", [])
+            if timestamp not in turns:
+                state["turns"] = (turns + [timestamp])[-MAX_LIVE_TURNS:]
+    except OSError:
+        # The record only spares backfill duplicate work; never fail a hook over it
+        pass
+
+
+def get_live_turns(session_id: str) -> Set[str]:
+    """Return the timestamps of the turns the hooks retained in a session."""
+    return set(read_state(get_state_dir() / f"{_live_state_name(session_id)}.json").get("turns", []))
+
+
+def end_session(session_id: str) -> None:
+    """
+    Delete the state kept for a session.
+
+    The lock file stays: another process may still hold it, and one that opened
+    a fresh file under the same name would not be excluded. prune_sessions()
+    removes it later.
+    """
+    (get_state_dir() / f"{_state_name(session_id)}.json").unlink(missing_ok=True)
+
+
+def _prune(pattern: str, max_age: float) -> int:
+    cutoff = time.time() - max_age
+    pruned = 0
+    for path in get_state_dir().glob(f"{pattern}.json"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                pruned += 1
+        except OSError:
+            continue
+    return pruned
+
+
+def _prune_locks(pattern: str, max_age: float) -> None:
+    """Delete lock files older than max_age whose state file is gone and that nobody holds."""
+    cutoff = time.time() - max_age
+    for path in get_state_dir().glob(f"{pattern}.lock"):
+        try:
+            if path.with_suffix(".json").exists() or path.stat().st_mtime >= cutoff:
+                continue
+            with open(path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                # Unlink while holding the lock, so no one is inside it now
+                path.unlink()
+        except OSError:
+            continue
+
+
+def prune_sessions(max_age: float = STALE_SECONDS) -> int:
+    """
+    Delete session state not updated for max_age seconds.
+
+    Records of retained turns are kept for LIVE_STALE_SECONDS instead, as
+    backfill may run long after a session ended. Lock files are only deleted once
+    their state file is gone and no process holds them.
+
+    Args:
+        max_age: Age in seconds after which a session is considered abandoned
+
+    Returns:
+        Number of sessions pruned
+    """
+    _prune("live-*", LIVE_STALE_SECONDS)
+    pruned = _prune("session-*", max_age)
+    _prune_locks("live-*", STALE_SECONDS)
+    _prune_locks("session-*", max_age)
+    return pruned
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Shared utilities for machine-wide plugin state.
+
+Hook scripts run as short-lived processes, often several at once across Claude
+sessions. State they need to share (rate limits, counters) lives in small JSON files
+under a common state directory, each guarded by an exclusive file lock so concurrent
+read-modify-write cycles do not lose updates.
+"""
+
+import fcntl
+import json
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+
+def get_state_dir() -> Path:
+    """
+    Return the plugin state directory, creating it if needed.
+
+    Uses HINDSIGHT_STATE_DIR when set, otherwise ~/.hindsight-cc.
+
+    Returns:
+        Path to the state directory
+    """
+    state_dir = Path(os.environ.get("HINDSIGHT_STATE_DIR") or Path.home() / ".hindsight-cc")
+    state_dir.mkdir(parents=True, exist_ok=True)
+    return state_dir
+
+
+def safe_name(key: str) -> str:
+    """
+    Turn an arbitrary key (bank ID, session ID) into a safe file name component.
+
+    Examples:
+        "claude-code--gcswan-hindsight-cc" -> "claude-code--gcswan-hindsight-cc"
+        "claude-code--/-tmp" -> "claude-code--_-tmp"
+    """
+    return re.sub(r"[^A-Za-z0-9._-]", "_", key) or "_"
+
+
+def read_state(path: Path) -> dict:
+    """
+    Read a JSON state file.
+
+    Args:
+        path: Path to the state file
+
+    Returns:
+        The stored object, or an empty dict if the file is missing or corrupt
+    """
+    try:
+        with open(path, "r") as f:
+            state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError, OSError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def write_state(path: Path, state: dict) -> None:
+    """
+    Atomically replace a JSON state file.
+
+    The state is written to a temporary file in the same directory and renamed
+    over the target, so readers never see a partial write.
+
+    Args:
+        path: Path to the state file
+        state: Object to store
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def locked_state(name: str) -> Iterator[dict]:
+    """
+    Lock, read and write back a named state file.
+
+    The dict yielded may be modified in place; it is written back when the block
+    exits without an exception. The lock is held for the whole block, so keep it
+    short and never sleep or make network calls inside it.
+
+    Args:
+        name: State file name without extension (e.g. "throttle")
+
+    Yields:
+        The current state dict
+
+    Examples:
+        with locked_state("throttle") as state:
+            state["count"] = state.get("count", 0) + 1
+    """
+    state_dir = get_state_dir()
+    path = state_dir / f"{name}.json"
+    with open(state_dir / f"{name}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            state = read_state(path)
+            yield state
+            write_state(path, state)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+"""Shared fixtures for the plugin script tests."""
+
+from unittest.mock import patch
+
+import pytest
+
+
+@pytest.fixture
+def state_dir(tmp_path):
+    """Isolate plugin state (HINDSIGHT_STATE_DIR) in a temporary directory."""
+    with patch.dict("os.environ", {"HINDSIGHT_STATE_DIR": str(tmp_path)}):
+        yield tmp_path
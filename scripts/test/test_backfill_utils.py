@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Unit tests for backfill_utils.py"""
+
+import json
+import os
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from backfill_utils import (
+    discover_transcripts,
+    file_signature,
+    get_projects_dir,
+    parse_transcript_file,
+    resume_index,
+)
+
+
+def write_transcript(path: Path, entries: list) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(json.dumps(entry) for entry in entries) + "\n")
+    return path
+
+
+class TestDiscovery:
+    """Tests for get_projects_dir() and discover_transcripts()."""
+
+    def test_projects_dir_honours_config_dir(self):
+        with patch.dict("backfill_utils.os.environ", {"CLAUDE_CONFIG_DIR": "/cfg"}):
+            assert get_projects_dir() == Path("/cfg/projects")
+
+    def test_finds_session_files_oldest_first(self, tmp_path):
+        old = write_transcript(tmp_path / "-home-a" / "old.jsonl", [{}])
+        new = write_transcript(tmp_path / "-home-b" / "new.jsonl", [{}])
+        (tmp_path / "-home-a" / "notes.txt").write_text("not a transcript")
+        os.utime(old, (1_000, 1_000))
+        os.utime(new, (2_000, 2_000))
+        assert discover_transcripts(tmp_path) == [old, new]
+
+
+class TestResumeIndex:
+    """Tests for resume_index() function."""
+
+    def test_new_file_starts_at_zero(self):
+        assert resume_index(None, {"size": 10, "mtime": 1.0}) == 0
+
+    def test_unchanged_complete_file_is_done(self):
+        record = {"size": 10, "mtime": 1.0, "turns_done": 3, "complete": True}
+        assert resume_index(record, {"size": 10, "mtime": 1.0}) is None
+
+    def test_interrupted_file_resumes_after_done_turns(self):
+        record = {"size": 10, "mtime": 1.0, "turns_done": 3, "complete": False}
+        assert resume_index(record, {"size": 10, "mtime": 1.0}) == 3
+
+    def test_grown_file_retains_last_turn_again(self):
+        """The last retained turn may have been in progress when it was retained."""
+        record = {"size": 10, "mtime": 1.0, "turns_done": 3, "complete": True}
+        assert resume_index(record, {"size": 20, "mtime": 2.0}) == 2
+
+    def test_shrunk_file_starts_over(self):
+        record = {"size": 10, "mtime": 1.0, "turns_done": 3, "complete": True}
+        assert resume_index(record, {"size": 5, "mtime": 2.0}) == 0
+
+
+class TestParseTranscriptFile:
+    """Tests for parse_transcript_file() function."""
+
+    def test_parses_turns_and_maps_bank(self, tmp_path):
+        path = write_transcript(
+            tmp_path / "-home-user-code-app" / "abc.jsonl",
+            [
+                {"type": "summary", "summary": "x"},
+                {
+                    "cwd": "/home/user/code/app",
+                    "sessionId": "abc",
+                    "timestamp": "2025-03-01T10:00:00Z",
+                    "message": {"role": "user", "content": "add a flag"},
+                },
+                {"message": {"role": "assistant", "content": [{"type": "text", "text": "Added."}]}},
+                {"message": {"role": "user", "content": [{"type": "tool_result", "content": "ok"}]}},
+                {"timestamp": "2025-03-01T11:00:00Z", "message": {"role": "user", "content": "thanks"}},
+            ],
+        )
+        with patch("backfill_utils.get_bank_id", return_value="claude-code--code-app") as bank_mock:
+            parsed = parse_transcript_file(str(path))
+            bank_mock.assert_called_once_with(cwd="/home/user/code/app")
+
+        assert parsed["bank_id"] == "claude-code--code-app"
+        assert parsed["session_id"] == "abc"
+        assert parsed["bytes"] == file_signature(path)["size"]
+        assert parsed["turns"] == [
+            {
+                "content": "user: add a flag\nassistant: Added.",
+                "timestamp": "2025-03-01T10:00:00Z",
+                "document_id": "transcript-abc-0",
+                "score": 0.03,
+                "tags": ["session:abc"],
+                "metadata": {"timestamp": "2025-03-01T10:00:00Z", "session_id": "abc"},
+            },
+            {
+                "content": "user: thanks",
+                "timestamp": "2025-03-01T11:00:00Z",
+                "document_id": "transcript-abc-1",
+                "score": 0.01,
+                "tags": ["session:abc"],
+                "metadata": {"timestamp": "2025-03-01T11:00:00Z", "session_id": "abc"},
+            },
+        ]
+
+    def test_tags_branch_and_touched_dirs(self, tmp_path):
+        path = write_transcript(
+            tmp_path / "p" / "s.jsonl",
+            [
+                {
+                    "cwd": "/home/user/code/app",
+                    "gitBranch": "feature/x",
+                    "timestamp": "2025-03-01T10:00:00Z",
+                    "message": {"role": "user", "content": "fix the parser"},
+                },
+                {
+                    "message": {
+                        "role": "assistant",
+                        "content": [
+                            {
+                                "type": "tool_use",
+                                "name": "Edit",
+                                "input": {"file_path": "/home/user/code/app/src/parse.py"},
+                            }
+                        ],
+                    }
+                },
+            ],
+        )
+        with patch("backfill_utils.get_bank_id", return_value="bank"), patch(
+            "backfill_utils.get_project_dir", return_value="/home/user/code/app"
+        ):
+            turn = parse_transcript_file(str(path))["turns"][0]
+        assert turn["tags"] == ["branch:feature/x", "dir:src", "session:s"]
+        assert turn["metadata"]["paths"] == "src/parse.py"
+
+    def test_missing_cwd_has_no_bank(self, tmp_path):
+        path = write_transcript(tmp_path / "p" / "s.jsonl", [{"message": {"role": "user", "content": "hi"}}])
+        parsed = parse_transcript_file(str(path))
+        assert parsed["bank_id"] is None
+        assert parsed["session_id"] == "s"
+
+    def test_skips_invalid_lines(self, tmp_path):
+        """A truncated last line does not make the transcript unreadable."""
+        path = tmp_path / "p" / "s.jsonl"
+        write_transcript(path, [{"message": {"role": "user", "content": "hi"}}])
+        with open(path, "a") as f:
+            f.write('{"message": {"rol')
+        assert len(parse_transcript_file(str(path))["turns"]) == 1
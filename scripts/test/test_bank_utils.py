@@ -56,6 +56,30 @@ class TestGetProjectDir:
                 result = get_project_dir()
                 assert result == "/projects/demo"
 
+    def test_detects_from_given_directory(self):
+        """An explicit cwd is passed to git with -C."""
+        mock_result = MagicMock()
+        mock_result.returncode = 0
+        mock_result.stdout = "/home/user/my-repo\n"
+
+        with patch("bank_utils.subprocess.run", return_value=mock_result) as run_mock:
+            result = get_project_dir("/home/user/my-repo/src")
+            assert result == "/home/user/my-repo"
+            assert run_mock.call_args[0][0] == [
+                "git",
+                "-C",
+                "/home/user/my-repo/src",
+                "rev-parse",
+                "--show-toplevel",
+            ]
+
+    def test_falls_back_to_given_directory(self):
+        """When git fails for an explicit cwd, that directory is returned."""
+        with patch("bank_utils.subprocess.run", side_effect=FileNotFoundError()):
+            with patch("bank_utils.os.getcwd", return_value="/somewhere/else"):
+                result = get_project_dir("/old/project")
+                assert result == "/old/project"
+
     def test_strips_whitespace_from_git_output(self):
         """Git output whitespace is stripped."""
         mock_result = MagicMock()
@@ -279,6 +303,14 @@ class TestGetBankId:
                 assert result == "claude-code--owner-repo"
                 assert result == result.lower()
 
+    def test_uses_given_cwd(self):
+        """An explicit cwd is used for project detection."""
+        with patch("bank_utils.get_project_dir", return_value="/home/user/code/old") as dir_mock:
+            with patch("bank_utils.get_git_remote_id", return_value=None):
+                result = get_bank_id(cwd="/home/user/code/old/src")
+                assert result == "claude-code--code-old"
+                dir_mock.assert_called_once_with("/home/user/code/old/src")
+
     def test_debug_callback_receives_messages(self):
         """Debug callback is called with log messages."""
         messages = []
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Unit tests for breaker_utils.py"""
+
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from breaker_utils import CLOSED, HALF_OPEN, OPEN, allow, get_breaker_config, get_status, is_open, record_result
+
+URL = "http://localhost:8888"
+
+
+@pytest.fixture
+def state_dir(state_dir):
+    """Isolated state (see conftest.py) with a short cool-down."""
+    with patch.dict("os.environ", {"HINDSIGHT_BREAKER_THRESHOLD": "3", "HINDSIGHT_BREAKER_COOLDOWN": "10"}):
+        yield state_dir
+
+
+def fail(times: int) -> None:
+    for _ in range(times):
+        record_result(URL, success=False)
+
+
+class TestGetBreakerConfig:
+    """Tests for get_breaker_config() function."""
+
+    def test_defaults(self):
+        with patch.dict("os.environ", {}, clear=True):
+            assert get_breaker_config() == (5, 30.0)
+
+    def test_invalid_values_use_defaults(self):
+        env = {"HINDSIGHT_BREAKER_THRESHOLD": "many", "HINDSIGHT_BREAKER_COOLDOWN": "-1"}
+        with patch.dict("os.environ", env, clear=True):
+            assert get_breaker_config() == (5, 30.0)
+
+
+class TestCircuitBreaker:
+    """Tests for allow() and record_result()."""
+
+    def test_opens_after_threshold(self, state_dir):
+        fail(2)
+        assert allow(URL)
+        fail(1)
+        assert get_status(URL)["state"] == OPEN
+        assert not allow(URL)
+        assert get_status(URL)["short_circuited"] == 1
+
+    def test_success_resets_failures(self, state_dir):
+        fail(2)
+        record_result(URL, success=True)
+        fail(2)
+        assert get_status(URL)["state"] == CLOSED
+
+    def test_single_probe_after_cooldown(self, state_dir):
+        fail(3)
+        with patch("breaker_utils.time.time", return_value=get_status(URL)["opened_at"] + 11):
+            assert allow(URL)
+            assert get_status(URL)["state"] == HALF_OPEN
+            assert not allow(URL)
+
+    def test_probe_success_closes(self, state_dir):
+        fail(3)
+        with patch("breaker_utils.time.time", return_value=get_status(URL)["opened_at"] + 11):
+            allow(URL)
+            record_result(URL, success=True)
+        status = get_status(URL)
+        assert status["state"] == CLOSED
+        assert [t["to"] for t in status["transitions"]] == [OPEN, HALF_OPEN, CLOSED]
+
+    def test_probe_failure_reopens(self, state_dir):
+        fail(3)
+        probe_time = get_status(URL)["opened_at"] + 11
+        with patch("breaker_utils.time.time", return_value=probe_time):
+            allow(URL)
+            record_result(URL, success=False)
+            assert get_status(URL)["state"] == OPEN
+            assert not allow(URL)
+
+    def test_stale_probe_is_replaced(self, state_dir):
+        """A probe that never reports back does not keep the circuit half-open forever."""
+        fail(3)
+        opened_at = get_status(URL)["opened_at"]
+        with patch("breaker_utils.time.time", return_value=opened_at + 11):
+            assert allow(URL)
+        with patch("breaker_utils.time.time", return_value=opened_at + 22):
+            assert allow(URL)
+
+    def test_endpoints_are_independent(self, state_dir):
+        fail(3)
+        assert allow("https://memory.example.com")
+
+    def test_disabled(self, state_dir):
+        with patch.dict("os.environ", {"HINDSIGHT_BREAKER_THRESHOLD": "0"}):
+            fail(10)
+            assert allow(URL)
+        assert get_status(URL)["failures"] == 0
+
+    def test_transitions_reported(self, state_dir):
+        messages = []
+        for _ in range(3):
+            record_result(URL, success=False, debug_callback=messages.append)
+        assert messages == ["Circuit breaker closed -> open: 3 consecutive failures"]
+
+
+class TestIsOpen:
+    """Tests for is_open() function."""
+
+    def test_closed(self, state_dir):
+        fail(2)
+        assert not is_open(URL)
+        assert get_status(URL)["short_circuited"] == 0
+
+    def test_open_counts_short_circuit(self, state_dir):
+        fail(3)
+        assert is_open(URL)
+        assert get_status(URL)["short_circuited"] == 1
+
+    def test_leaves_probe_to_allow(self, state_dir):
+        fail(3)
+        with patch("breaker_utils.time.time", return_value=get_status(URL)["opened_at"] + 11):
+            assert not is_open(URL)
+            assert get_status(URL)["state"] == OPEN
+            assert allow(URL)
+
+    def test_disabled(self, state_dir):
+        fail(3)
+        with patch.dict("os.environ", {"HINDSIGHT_BREAKER_THRESHOLD": "0"}):
+            assert not is_open(URL)
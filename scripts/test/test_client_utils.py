@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""Unit tests for client_utils.py"""
+
+import asyncio
+import json
+import sys
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from breaker_utils import CircuitOpenError, get_status, record_result
+from client_utils import (
+    DEFAULT_BASE_URL,
+    HindsightClient,
+    circuit_open,
+    get_base_url,
+    get_gzip_min_bytes,
+    get_timeout,
+    is_server_failure,
+)
+
+
+# Keep circuit breaker state out of the real state directory
+pytestmark = pytest.mark.usefixtures("state_dir")
+
+
+class TestGetBaseUrl:
+    """Tests for get_base_url() function."""
+
+    def test_defaults_to_local_container(self):
+        with patch.dict("client_utils.os.environ", {}, clear=True):
+            assert get_base_url() == DEFAULT_BASE_URL
+
+    def test_env_override_without_trailing_slash(self):
+        with patch.dict("client_utils.os.environ", {"HINDSIGHT_URL": "https://memory.example.com/"}):
+            assert get_base_url() == "https://memory.example.com"
+
+
+class TestGetTimeout:
+    """Tests for get_timeout() function."""
+
+    def test_per_operation_defaults(self):
+        with patch.dict("client_utils.os.environ", {}, clear=True):
+            assert get_timeout("recall") < get_timeout("reflect")
+            assert get_timeout("unknown") == 60.0
+
+    def test_env_override(self):
+        with patch.dict("client_utils.os.environ", {"HINDSIGHT_TIMEOUT_RECALL": "2.5"}):
+            assert get_timeout("recall") == 2.5
+
+    def test_invalid_values_ignored(self):
+        with patch.dict("client_utils.os.environ", {"HINDSIGHT_TIMEOUT_RECALL": "soon"}):
+            assert get_timeout("recall") == 30.0
+        with patch.dict("client_utils.os.environ", {"HINDSIGHT_TIMEOUT_RECALL": "0"}):
+            assert get_timeout("recall") == 30.0
+
+
+class TestGetGzipMinBytes:
+    """Tests for get_gzip_min_bytes() function."""
+
+    def test_disabled_by_default(self):
+        with patch.dict("client_utils.os.environ", {}, clear=True):
+            assert get_gzip_min_bytes() == 0
+
+    def test_env_override(self):
+        with patch.dict("client_utils.os.environ", {"HINDSIGHT_GZIP_MIN_BYTES": "4096"}):
+            assert get_gzip_min_bytes() == 4096
+
+    def test_invalid_disables(self):
+        with patch.dict("client_utils.os.environ", {"HINDSIGHT_GZIP_MIN_BYTES": "big"}):
+            assert get_gzip_min_bytes() == 0
+
+
+class TestIsServerFailure:
+    """Tests for is_server_failure() function."""
+
+    def test_connection_errors_and_timeouts(self):
+        assert is_server_failure(ConnectionError("refused"))
+        assert is_server_failure(asyncio.TimeoutError())
+
+    def test_http_status(self):
+        class StatusError(Exception):
+            def __init__(self, status):
+                super().__init__(f"HTTP {status}")
+                self.status = status
+
+        def error(status):
+            return StatusError(status)
+
+        assert is_server_failure(error(503))
+        assert is_server_failure(error(429))
+        assert not is_server_failure(error(404))
+
+
+class FakeServer:
+    """Minimal Hindsight retain endpoint that records request bodies."""
+
+    def __init__(self):
+        self.bodies = []
+        self.runner = None
+        self.url = None
+
+    async def retain(self, request):
+        from aiohttp import web
+
+        # aiohttp's server transparently decodes gzip request bodies
+        body = json.loads(await request.read())
+        self.bodies.append((request.headers.get("Content-Encoding"), body))
+        bank_id = request.match_info["bank_id"]
+        return web.json_response({"success": True, "bank_id": bank_id, "items_count": 1, "async": False})
+
+    async def start(self):
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_post("/v1/default/banks/{bank_id}/memories", self.retain)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+
+class TestHindsightClient:
+    """Tests for HindsightClient against a local fake server."""
+
+    def run_retains(self, env, contents):
+        pytest.importorskip("hindsight_client")
+        server = FakeServer()
+        messages = []
+
+        async def scenario():
+            await server.start()
+            try:
+                with patch.dict("client_utils.os.environ", env):
+                    client = HindsightClient(base_url=server.url, debug_callback=messages.append)
+                for content in contents:
+                    await client.aretain(bank_id="bank", content=content)
+                await client.aclose()
+                return client
+            finally:
+                await server.stop()
+
+        return asyncio.run(scenario()), server, messages
+
+    def test_reuses_connections(self):
+        client, server, messages = self.run_retains({}, ["one", "two", "three"])
+        assert len(server.bodies) == 3
+        assert client.stats["requests"] == 3
+        assert client.stats["connections_created"] == 1
+        assert client.stats["connections_reused"] == 2
+        assert any("3 requests over 1 connections" in m for m in messages)
+
+    def test_gzips_large_retains_only(self):
+        large = "the build failed because the cache was stale\n" * 200
+        client, server, messages = self.run_retains({"HINDSIGHT_GZIP_MIN_BYTES": "1024"}, ["small", large])
+        encodings = [encoding for encoding, _ in server.bodies]
+        assert encodings == [None, "gzip"]
+        assert server.bodies[1][1]["items"][0]["content"] == large
+        assert client.stats["compressed_requests"] == 1
+        assert client.stats["bytes_compressed"] < client.stats["bytes_uncompressed"]
+
+    def test_sync_interface(self):
+        pytest.importorskip("hindsight_client")
+        server = FakeServer()
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(server.start())
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        try:
+            client = HindsightClient(base_url=server.url)
+            try:
+                assert client.retain(bank_id="bank", content="hello").success
+                assert client.retain(bank_id="bank", content="again").success
+            finally:
+                client.close()
+            assert client.stats["connections_reused"] == 1
+        finally:
+            asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+    def test_breaker_opens_on_unreachable_server(self):
+        pytest.importorskip("hindsight_client")
+        # Nothing listens on port 9 (discard) on a test machine
+        url = "http://127.0.0.1:9"
+        env = {"HINDSIGHT_BREAKER_THRESHOLD": "2", "HINDSIGHT_BREAKER_COOLDOWN": "60"}
+        with patch.dict("os.environ", env):
+            client = HindsightClient(base_url=url)
+            try:
+                for _ in range(2):
+                    with pytest.raises(Exception) as excinfo:
+                        client.retain(bank_id="bank", content="hello")
+                    assert not isinstance(excinfo.value, CircuitOpenError)
+                with pytest.raises(CircuitOpenError):
+                    client.retain(bank_id="bank", content="hello")
+            finally:
+                client.close()
+            assert get_status(url)["state"] == "open"
+
+    def test_open_circuit_skips_client_setup(self):
+        url = "http://127.0.0.1:9"
+        env = {"HINDSIGHT_BREAKER_THRESHOLD": "1", "HINDSIGHT_BREAKER_COOLDOWN": "60"}
+        with patch.dict("os.environ", env):
+            assert not circuit_open(url)
+            record_result(url, success=False)
+            assert circuit_open(url)
+            # The SDK is never imported while the circuit is open
+            with patch.dict("sys.modules", {"hindsight_client": None}):
+                with pytest.raises(CircuitOpenError):
+                    HindsightClient(base_url=url)
+            assert get_status(url)["short_circuited"] == 2
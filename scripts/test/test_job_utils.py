@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Unit tests for job_utils.py"""
+
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from job_utils import (
+    DONE,
+    FAILED,
+    QUEUED,
+    claim_slot,
+    create_job,
+    get_concurrency,
+    list_jobs,
+    load_job,
+    prune_jobs,
+    reap_job,
+    release_slot,
+    update_job,
+)
+
+
+class TestGetConcurrency:
+    """Tests for get_concurrency() function."""
+
+    def test_default(self):
+        with patch.dict("os.environ", {}, clear=True):
+            assert get_concurrency() == 2
+
+    def test_env_override(self):
+        with patch.dict("os.environ", {"HINDSIGHT_REFLECT_CONCURRENCY": "4"}):
+            assert get_concurrency() == 4
+
+    def test_invalid_uses_default(self):
+        with patch.dict("os.environ", {"HINDSIGHT_REFLECT_CONCURRENCY": "0"}):
+            assert get_concurrency() == 2
+
+
+class TestJobRecords:
+    """Tests for create_job(), load_job(), update_job() and prune_jobs()."""
+
+    def test_round_trip(self, state_dir):
+        job = create_job("bank", {"query": "why?", "budget": "low"})
+        assert job["status"] == QUEUED
+        update_job(job, status=DONE, result="because", finished_at=time.time())
+        loaded = load_job(job["id"])
+        assert loaded is not None
+        assert loaded["result"] == "because"
+        assert loaded["request"] == {"query": "why?", "budget": "low"}
+
+    def test_unknown_job(self, state_dir):
+        assert load_job("missing") is None
+
+    def test_list_newest_first(self, state_dir):
+        first = create_job("bank", {"query": "a"})
+        second = create_job("bank", {"query": "b"})
+        update_job(second, submitted_at=first["submitted_at"] + 1)
+        assert [job["id"] for job in list_jobs()] == [second["id"], first["id"]]
+
+    def test_prune_only_old_finished_jobs(self, state_dir):
+        old = create_job("bank", {"query": "a"})
+        update_job(old, status=DONE, finished_at=time.time() - 8 * 24 * 3600)
+        recent = create_job("bank", {"query": "b"})
+        update_job(recent, status=DONE, finished_at=time.time())
+        queued = create_job("bank", {"query": "c"})
+        assert prune_jobs() == 1
+        assert sorted(job["id"] for job in list_jobs()) == sorted([recent["id"], queued["id"]])
+
+
+class TestSlots:
+    """Tests for claim_slot() and release_slot()."""
+
+    def test_limit_per_bank(self, state_dir):
+        assert claim_slot("bank", "j1", limit=1)
+        assert not claim_slot("bank", "j2", limit=1)
+        assert claim_slot("other", "j3", limit=1)
+        release_slot("bank", "j1")
+        assert claim_slot("bank", "j2", limit=1)
+
+    def test_submission_order(self, state_dir):
+        assert claim_slot("bank", "j1", limit=1)
+        assert not claim_slot("bank", "j2", limit=1)
+        assert not claim_slot("bank", "j3", limit=1)
+        release_slot("bank", "j1")
+        # j3 polls first but j2 queued earlier
+        assert not claim_slot("bank", "j3", limit=1)
+        assert claim_slot("bank", "j2", limit=1)
+
+    def test_claim_is_idempotent(self, state_dir):
+        assert claim_slot("bank", "j1", limit=1)
+        assert claim_slot("bank", "j1", limit=1)
+
+    def test_dead_workers_release_slots(self, state_dir):
+        assert claim_slot("bank", "j1", limit=1)
+        with patch("job_utils._alive", return_value=False):
+            assert claim_slot("bank", "j2", limit=1)
+
+
+class TestReapJob:
+    """Tests for reap_job() function."""
+
+    def test_live_worker_untouched(self, state_dir):
+        job = update_job(create_job("bank", {"query": "a"}), pid=12345)
+        with patch("job_utils._alive", return_value=True):
+            assert reap_job(job)["status"] == QUEUED
+
+    def test_dead_worker_fails_job(self, state_dir):
+        job = update_job(create_job("bank", {"query": "a"}), pid=12345)
+        with patch("job_utils._alive", return_value=False):
+            assert reap_job(job)["status"] == FAILED
+        loaded = load_job(job["id"])
+        assert loaded is not None
+        assert loaded["error"] == "worker exited before finishing"
+
+    def test_finished_between_reads(self, state_dir):
+        job = create_job("bank", {"query": "a"})
+        update_job(dict(job), status=DONE, result="ok")
+        assert reap_job(job, exited=True)["result"] == "ok"
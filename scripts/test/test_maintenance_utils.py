@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Unit tests for maintenance_utils.py"""
+
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from maintenance_utils import (
+    choose_keeper,
+    find_duplicate_clusters,
+    jaccard,
+    minhash_signature,
+    normalize_text,
+    plan_maintenance,
+    shingles,
+)
+
+NOW = datetime(2026, 6, 1, tzinfo=timezone.utc)
+
+
+def memory(item_id, text, **fields):
+    return {"id": item_id, "text": text, "fact_type": "world", **fields}
+
+
+class TestTextSimilarity:
+    """Tests for normalize_text(), shingles(), jaccard() and minhash_signature()."""
+
+    def test_normalize_ignores_case_and_punctuation(self):
+        assert normalize_text("Use  Postgres, not MySQL!") == "use postgres not mysql"
+
+    def test_shingles_of_short_text(self):
+        assert shingles("Hello world") == {"hello world"}
+
+    def test_shingles_of_empty_text(self):
+        assert shingles("  ") == set()
+
+    def test_shingles_are_word_trigrams(self):
+        assert shingles("a b c d") == {"a b c", "b c d"}
+
+    def test_jaccard(self):
+        assert jaccard({"a", "b"}, {"b", "c"}) == 1 / 3
+        assert jaccard(set(), set()) == 1.0
+
+    def test_signature_is_deterministic(self):
+        """Signatures are stable across calls (and processes)."""
+        s = shingles("the user prefers tabs over spaces")
+        assert minhash_signature(s) == minhash_signature(set(s))
+
+
+class TestFindDuplicateClusters:
+    """Tests for find_duplicate_clusters() function."""
+
+    def test_groups_near_duplicates(self):
+        items = [
+            memory("1", "The user prefers pytest fixtures over unittest setUp methods in this repo"),
+            memory("2", "The user prefers pytest fixtures over unittest setUp methods in this repo."),
+            memory("3", "Deployments run from the main branch via GitHub Actions every night"),
+        ]
+        assert [sorted(c) for c in find_duplicate_clusters(items)] == [["1", "2"]]
+
+    def test_transitive_clusters(self):
+        """Chains of duplicates end up in one cluster."""
+        text = "the build uses uv to manage the python virtual environment for scripts"
+        items = [memory(str(i), text) for i in range(4)]
+        clusters = find_duplicate_clusters(items)
+        assert len(clusters) == 1
+        assert sorted(clusters[0]) == ["0", "1", "2", "3"]
+
+    def test_distinct_memories_not_clustered(self):
+        items = [
+            memory("1", "Bank IDs are derived from the git remote owner and repository name"),
+            memory("2", "The Hindsight server runs in a Docker container on port 8888"),
+        ]
+        assert find_duplicate_clusters(items) == []
+
+    def test_threshold_controls_matching(self):
+        items = [
+            memory("1", "alpha beta gamma delta epsilon zeta"),
+            memory("2", "alpha beta gamma delta epsilon eta"),
+        ]
+        # 3 of 5 distinct trigrams shared: similarity 0.6
+        assert find_duplicate_clusters(items, threshold=0.9) == []
+
+
+class TestChooseKeeper:
+    """Tests for choose_keeper() function."""
+
+    def test_prefers_proof_count(self):
+        items = [memory("1", "a", proof_count=1), memory("2", "a", proof_count=3)]
+        assert choose_keeper(items)["id"] == "2"
+
+    def test_prefers_most_recent(self):
+        items = [
+            memory("1", "a", mentioned_at="2026-01-01T00:00:00Z"),
+            memory("2", "a", mentioned_at="2026-03-01T00:00:00Z"),
+        ]
+        assert choose_keeper(items)["id"] == "2"
+
+
+class TestPlanMaintenance:
+    """Tests for plan_maintenance() function."""
+
+    def test_duplicates_keep_one(self):
+        text = "the team decided to store memory banks per git repository"
+        items = [memory("1", text, proof_count=2), memory("2", text), memory("3", text)]
+        actions = plan_maintenance(items, now=NOW)
+        assert sorted(a["id"] for a in actions) == ["2", "3"]
+        assert all(a["action"] == "duplicate" and a["keeper"] == "1" for a in actions)
+
+    def test_ttl_expires_old_memories(self):
+        items = [
+            memory("old", "something from long ago", mentioned_at="2025-01-01T00:00:00Z"),
+            memory("new", "something recent", mentioned_at="2026-05-20T00:00:00Z"),
+            memory("undated", "no timestamp"),
+        ]
+        actions = plan_maintenance(items, ttl_days=90, now=NOW)
+        assert [(a["id"], a["action"]) for a in actions] == [("old", "expired")]
+
+    def test_no_ttl_keeps_everything_unique(self):
+        items = [memory("old", "something from long ago", mentioned_at="2020-01-01T00:00:00Z")]
+        assert plan_maintenance(items, now=NOW) == []
+
+    def test_observations_never_selected(self):
+        """Observations are derived by the server and cannot be invalidated."""
+        text = "the user likes concise commit messages with a short subject line"
+        items = [
+            {"id": "1", "text": text, "fact_type": "observation"},
+            {"id": "2", "text": text, "fact_type": "observation"},
+        ]
+        assert plan_maintenance(items, ttl_days=1, now=NOW) == []
+
+    def test_invalidated_memories_ignored(self):
+        """An invalidated copy is never the keeper, so the valid copies are not all dropped."""
+        text = "the team decided to store memory banks per git repository"
+        items = [
+            memory("old", text, proof_count=5, state="invalidated"),
+            memory("1", text, proof_count=2, state="valid"),
+            memory("2", text, state="valid"),
+        ]
+        actions = plan_maintenance(items, now=NOW)
+        assert [(a["id"], a["keeper"]) for a in actions] == [("2", "1")]
+
+    def test_invalidated_memories_not_expired(self):
+        items = [memory("old", "long ago", mentioned_at="2020-01-01T00:00:00Z", state="invalidated")]
+        assert plan_maintenance(items, ttl_days=1, now=NOW) == []
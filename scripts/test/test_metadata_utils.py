@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Unit tests for metadata_utils.py"""
+
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from metadata_utils import (
+    build_recall_tags,
+    build_retain_metadata,
+    extract_touched_paths,
+    get_git_branch,
+    get_recall_scopes,
+    path_dirs,
+    prompt_dirs,
+    relative_path,
+    transcript_branch,
+)
+
+
+def tool_use(name: str, **tool_input) -> dict:
+    return {"message": {"role": "assistant", "content": [{"type": "tool_use", "name": name, "input": tool_input}]}}
+
+
+class TestGetGitBranch:
+    """Tests for get_git_branch() and transcript_branch()."""
+
+    def test_branch(self):
+        result = subprocess.CompletedProcess([], 0, stdout="feature/tags\n", stderr="")
+        with patch("metadata_utils.subprocess.run", return_value=result):
+            assert get_git_branch("/repo") == "feature/tags"
+
+    def test_detached_head(self):
+        result = subprocess.CompletedProcess([], 0, stdout="HEAD\n", stderr="")
+        with patch("metadata_utils.subprocess.run", return_value=result):
+            assert get_git_branch("/repo") is None
+
+    def test_not_a_repo(self, tmp_path):
+        assert get_git_branch(str(tmp_path)) is None
+
+    def test_git_missing(self):
+        with patch("metadata_utils.subprocess.run", side_effect=FileNotFoundError):
+            assert get_git_branch("/repo") is None
+
+    def test_transcript_branch_latest_wins(self):
+        entries = [{"gitBranch": "main"}, {}, {"gitBranch": "fix"}, {"gitBranch": "HEAD"}]
+        assert transcript_branch(entries) == "fix"
+        assert transcript_branch([{}]) is None
+
+
+class TestTouchedPaths:
+    """Tests for relative_path(), extract_touched_paths() and path_dirs()."""
+
+    def test_relative_path(self):
+        assert relative_path("/repo/src/a.py", "/repo") == "src/a.py"
+        assert relative_path("src/../b.py", "/repo") == "b.py"
+        assert relative_path("/etc/hosts", "/repo") is None
+        assert relative_path("/repo", "/repo") is None
+
+    def test_extracts_paths_from_tool_inputs(self):
+        entries = [
+            tool_use("Read", file_path="/repo/README.md"),
+            tool_use("Edit", file_path="/repo/src/a.py"),
+            tool_use("Grep", pattern="x", path="/repo/tests"),
+            tool_use("NotebookEdit", notebook_path="/repo/nb/x.ipynb"),
+            tool_use("Edit", file_path="/repo/src/a.py"),
+            tool_use("Read", file_path="/tmp/outside.txt"),
+            tool_use("Bash", command="ls /repo/src"),
+        ]
+        assert extract_touched_paths(entries, "/repo") == ["README.md", "src/a.py", "tests", "nb/x.ipynb"]
+
+    def test_ignores_sidechains_and_text(self):
+        entries = [
+            {**tool_use("Edit", file_path="/repo/a.py"), "isSidechain": True},
+            {"message": {"role": "user", "content": "edit /repo/b.py"}},
+        ]
+        assert extract_touched_paths(entries, "/repo") == []
+
+    def test_path_dirs(self):
+        assert path_dirs(["scripts/test/x.py", "README.md", "scripts/a.py", "tests"]) == ["scripts", "."]
+
+
+class TestPromptDirs:
+    """Tests for prompt_dirs() function."""
+
+    def test_only_existing_project_paths(self, tmp_path):
+        (tmp_path / "scripts").mkdir()
+        (tmp_path / "scripts" / "a.py").write_text("")
+        prompt = f"Why does scripts/a.py fail, and/or {tmp_path}/scripts/a.py? Also missing/b.py"
+        assert prompt_dirs(prompt, str(tmp_path)) == ["scripts"]
+
+    def test_no_paths(self, tmp_path):
+        assert prompt_dirs("how do retains work?", str(tmp_path)) == []
+
+
+class TestBuildRetainMetadata:
+    """Tests for build_retain_metadata() function."""
+
+    def test_full(self):
+        tags, metadata = build_retain_metadata(
+            branch="main",
+            paths=["scripts/a.py", "README.md"],
+            session_id="s1",
+            timestamp="2026-01-01T00:00:00Z",
+        )
+        assert tags == ["branch:main", "dir:scripts", "dir:.", "session:s1"]
+        assert metadata == {
+            "timestamp": "2026-01-01T00:00:00Z",
+            "branch": "main",
+            "paths": "scripts/a.py,README.md",
+            "session_id": "s1",
+        }
+
+    def test_minimal(self):
+        tags, metadata = build_retain_metadata()
+        assert tags == []
+        assert list(metadata) == ["timestamp"]
+
+
+class TestRecallScopes:
+    """Tests for get_recall_scopes() and build_recall_tags()."""
+
+    def test_default_is_whole_bank(self):
+        with patch.dict("os.environ", {}, clear=True):
+            assert get_recall_scopes() == []
+
+    def test_parses_and_filters(self):
+        with patch.dict("os.environ", {"HINDSIGHT_RECALL_SCOPE": " Branch, path,bogus"}):
+            assert get_recall_scopes() == ["branch", "path"]
+
+    def test_recall_tags(self, tmp_path):
+        (tmp_path / "src" / "lib").mkdir(parents=True)
+        with patch("metadata_utils.get_git_branch", return_value="main"):
+            tags = build_recall_tags(["branch", "path", "session"], str(tmp_path), "look at src/lib", "s1")
+        assert tags == ["branch:main", "dir:src", "session:s1"]
+
+    def test_unused_scopes_add_nothing(self, tmp_path):
+        with patch("metadata_utils.get_git_branch") as branch_mock:
+            assert build_recall_tags(["path"], str(tmp_path), "no paths here", "s1") == []
+            branch_mock.assert_not_called()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Unit tests for query_utils.py"""
+
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from query_utils import build_recall_query, extract_key_terms, get_max_query_chars, split_prose
+
+TRACEBACK = """Traceback (most recent call last):
+  File "/srv/app/importer/run_import.py", line 42, in main
+    load_batch(conn, rows)
+  File "/srv/app/importer/db_utils.py", line 88, in load_batch
+    cursor.copy_expert(sql, buffer)
+AttributeError: 'Cursor' object has no attribute 'copy_expert'"""
+
+LOG = "\n".join(f"2026-01-01 12:00:{i % 60:02d} INFO processed batch {i} in 12ms" for i in range(500))
+
+PROMPT = (
+    "The nightly import job started failing after we upgraded psycopg. Can you figure out why?\n\n"
+    f"```\n{TRACEBACK}\n```\n{LOG}\n"
+    "I think it is related to the BatchLoader class."
+)
+
+
+class TestGetMaxQueryChars:
+    """Tests for get_max_query_chars() function."""
+
+    def test_default(self):
+        with patch.dict("query_utils.os.environ", {}, clear=True):
+            assert get_max_query_chars() == 1000
+
+    def test_env_override(self):
+        with patch.dict("query_utils.os.environ", {"HINDSIGHT_RECALL_MAX_QUERY_CHARS": "300"}):
+            assert get_max_query_chars() == 300
+
+    def test_invalid_uses_default(self):
+        with patch.dict("query_utils.os.environ", {"HINDSIGHT_RECALL_MAX_QUERY_CHARS": "0"}):
+            assert get_max_query_chars() == 1000
+
+
+class TestSplitProse:
+    """Tests for split_prose() function."""
+
+    def test_separates_question_from_paste(self):
+        prose, pasted = split_prose(PROMPT)
+        assert prose.startswith("The nightly import job started failing")
+        assert prose.endswith("related to the BatchLoader class.")
+        assert "Traceback" in pasted
+        assert "processed batch 499" in pasted
+
+    def test_code_in_fences_is_pasted(self):
+        prose, pasted = split_prose("Look at this\n```\nthis line reads like prose\n```")
+        assert prose == "Look at this"
+        assert pasted == "this line reads like prose"
+
+
+class TestExtractKeyTerms:
+    """Tests for extract_key_terms() function."""
+
+    def test_error_signatures_first(self):
+        terms = extract_key_terms(TRACEBACK)
+        assert terms[0] == "AttributeError: 'Cursor' object has no attribute 'copy_expert'"
+
+    def test_paths_and_identifiers(self):
+        terms = extract_key_terms(TRACEBACK)
+        assert "/srv/app/importer/run_import.py" in terms
+        assert "load_batch" in terms
+
+    def test_ignores_urls(self):
+        assert extract_key_terms("see https://example.com/some/path_name") == []
+
+
+class TestBuildRecallQuery:
+    """Tests for build_recall_query() function."""
+
+    def test_short_prompt_unchanged(self):
+        assert build_recall_query("why does login fail?\n") == "why does login fail?\n"
+
+    def test_long_prompt_bounded(self):
+        query = build_recall_query(PROMPT, max_chars=400)
+        assert len(PROMPT) > 20000
+        assert len(query) <= 400
+        assert query.startswith("The nightly import job started failing")
+        assert "BatchLoader" in query
+        assert "AttributeError" in query
+        assert "run_import.py" in query
+        assert "processed batch" not in query
+
+    def test_long_question_keeps_start_and_end(self):
+        prompt = " ".join(f"word{i}" for i in range(1000))
+        query = build_recall_query(prompt, max_chars=200)
+        assert len(query) <= 200
+        assert query.startswith("word0 ")
+        assert query.endswith(" word999")
+
+    def test_paste_only_prompt(self):
+        query = build_recall_query(LOG, max_chars=200)
+        assert 0 < len(query) <= 200
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Unit tests for retain_queue_utils.py"""
+
+import os
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from retain_queue_utils import (
+    KIND_PROMPT,
+    KIND_TRANSCRIPT,
+    MAX_ATTEMPTS,
+    claim_drainer,
+    defer_retain,
+    enqueue_retain,
+    get_queue_stats,
+    pending_count,
+    pop_retain,
+    release_drainer,
+    requeue_retain,
+    start_drainer,
+)
+from state_utils import locked_state
+
+pytestmark = pytest.mark.usefixtures("state_dir")
+
+
+class TestQueue:
+    """Tests for enqueue_retain(), pop_retain() and requeue_retain()."""
+
+    def test_first_in_first_out(self):
+        enqueue_retain(KIND_PROMPT, "bank", "one", session_id="s1", prompt_hash="sha256:1")
+        enqueue_retain(KIND_TRANSCRIPT, "bank", "two", tags=["branch:main"])
+        assert pending_count() == 2
+        first = pop_retain()
+        assert first is not None
+        assert (first["kind"], first["content"], first["prompt_hash"]) == (KIND_PROMPT, "one", "sha256:1")
+        second = pop_retain()
+        assert second is not None
+        assert (second["content"], second["tags"]) == ("two", ["branch:main"])
+        assert pop_retain() is None
+
+    def test_oldest_dropped_when_full(self):
+        with patch("retain_queue_utils.MAX_QUEUED", 2):
+            for content in ("a", "b", "c"):
+                enqueue_retain(KIND_TRANSCRIPT, "bank", content)
+        assert [pop_retain()["content"], pop_retain()["content"]] == ["b", "c"]  # type: ignore[index]
+        assert get_queue_stats()["dropped"] == 1
+
+    def test_expired_skipped(self):
+        enqueue_retain(KIND_TRANSCRIPT, "bank", "old")
+        enqueue_retain(KIND_TRANSCRIPT, "bank", "new")
+        with locked_state("retain-queue") as state:
+            state["items"][0]["queued_at"] = time.time() - 2 * 24 * 3600
+        item = pop_retain()
+        assert item is not None and item["content"] == "new"
+        assert get_queue_stats()["expired"] == 1
+
+    def test_requeue_goes_first_until_attempts_run_out(self):
+        enqueue_retain(KIND_TRANSCRIPT, "bank", "a")
+        enqueue_retain(KIND_TRANSCRIPT, "bank", "b")
+        item = pop_retain()
+        for _ in range(MAX_ATTEMPTS - 1):
+            assert item is not None
+            requeue_retain(item)
+            item = pop_retain()
+            assert item is not None and item["content"] == "a"
+        assert item is not None
+        requeue_retain(item)
+        item = pop_retain()
+        assert item is not None and item["content"] == "b"
+        assert get_queue_stats()["dropped"] == 1
+
+
+class TestDrainer:
+    """Tests for claim_drainer(), release_drainer(), start_drainer() and defer_retain()."""
+
+    def test_single_drainer(self):
+        assert claim_drainer()
+        assert claim_drainer()  # the same process may claim again
+        with locked_state("retain-queue") as state:
+            state["drainer"] = os.getppid()
+        assert not claim_drainer()
+
+    def test_dead_drainer_replaced(self):
+        with locked_state("retain-queue") as state:
+            state["drainer"] = 2**22 + 12345  # above the default pid range
+        assert claim_drainer()
+        release_drainer()
+        with locked_state("retain-queue") as state:
+            assert state["drainer"] is None
+
+    def test_start_only_with_pending_retains(self):
+        with patch("retain_queue_utils.subprocess.Popen") as popen:
+            start_drainer()
+            popen.assert_not_called()
+            enqueue_retain(KIND_TRANSCRIPT, "bank", "a")
+            start_drainer()
+            popen.assert_called_once()
+
+    def test_start_skipped_while_drainer_runs(self):
+        enqueue_retain(KIND_TRANSCRIPT, "bank", "a")
+        with locked_state("retain-queue") as state:
+            state["drainer"] = os.getppid()
+        with patch("retain_queue_utils.subprocess.Popen") as popen:
+            start_drainer()
+            popen.assert_not_called()
+
+    def test_defer_without_starting(self):
+        with patch("retain_queue_utils.subprocess.Popen") as popen:
+            defer_retain(KIND_TRANSCRIPT, "bank", "a", start=False, turn_timestamp="2026-01-01T00:00:00Z")
+            popen.assert_not_called()
+        assert get_queue_stats()["pending"] == 1
+
+    def test_defer_never_raises(self):
+        messages = []
+        with patch("retain_queue_utils.enqueue_retain", side_effect=OSError("read-only")):
+            defer_retain(KIND_PROMPT, "bank", "a", debug_callback=messages.append)
+        assert "dropping prompt retain" in messages[0]
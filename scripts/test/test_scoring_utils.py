@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""Unit tests for scoring_utils.py"""
+
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scoring_utils import (
+    decide,
+    get_scoring_config,
+    get_scoring_stats,
+    in_sample,
+    record_decision,
+    score_turn,
+)
+
+
+def message(role: str, content) -> dict:
+    return {"message": {"role": role, "content": content}}
+
+
+def tool_use(name: str) -> dict:
+    return message("assistant", [{"type": "tool_use", "name": name, "input": {}}])
+
+
+def tool_result(content: str, is_error: bool = False) -> dict:
+    return message("user", [{"type": "tool_result", "content": content, "is_error": is_error}])
+
+
+class TestGetScoringConfig:
+    """Tests for get_scoring_config() function."""
+
+    def test_defaults(self):
+        with patch.dict("os.environ", {}, clear=True):
+            assert get_scoring_config() == (1.0, 0.1)
+
+    def test_env_override(self):
+        env = {"HINDSIGHT_RETAIN_MIN_SCORE": "0", "HINDSIGHT_RETAIN_SAMPLE_RATE": "0.5"}
+        with patch.dict("os.environ", env):
+            assert get_scoring_config() == (0.0, 0.5)
+
+    def test_invalid_values(self):
+        env = {"HINDSIGHT_RETAIN_MIN_SCORE": "high", "HINDSIGHT_RETAIN_SAMPLE_RATE": "3"}
+        with patch.dict("os.environ", env):
+            assert get_scoring_config() == (1.0, 1.0)
+
+
+class TestScoreTurn:
+    """Tests for score_turn() function."""
+
+    def test_small_talk_scores_low(self):
+        score, signals = score_turn([message("user", "thanks"), message("assistant", "You're welcome!")], 40)
+        assert score < 0.1
+        assert list(signals) == ["length"]
+
+    def test_code_edits(self):
+        entries = [message("user", "rename the flag"), tool_use("Edit"), tool_use("Edit"), tool_result("ok")]
+        score, signals = score_turn(entries, 400)
+        assert signals["edits"] == 2.5
+        assert score >= 1.0
+
+    def test_edit_bonus_is_capped(self):
+        entries = [tool_use("Write")] * 10
+        assert score_turn(entries, 0)[1]["edits"] == 3.0
+
+    @pytest.mark.parametrize(
+        "text",
+        [
+            "Let's go with SQLite instead of Postgres",
+            "We decided to keep the old API",
+            "From now on, run the linter before committing",
+            "Never use print for logging in this repo",
+            "I'll use a dataclass here; the trade-off is a little more code",
+        ],
+    )
+    def test_decisions(self, text):
+        entries = [message("user", text), message("assistant", "OK.")]
+        assert "decisions" in score_turn(entries, 100)[1]
+
+    @pytest.mark.parametrize(
+        "text",
+        [
+            "It returns None because the key is missing.",
+            "The cache is always rebuilt on startup and never written back.",
+            "Don't worry, the tests do not touch the network.",
+            "The parser falls back to UTF-8 instead of failing.",
+        ],
+    )
+    def test_explanations_are_not_decisions(self, text):
+        entries = [message("user", "why does it do that?"), message("assistant", text)]
+        assert "decisions" not in score_turn(entries, 100)[1]
+
+    def test_error_resolution(self):
+        entries = [
+            tool_use("Bash"),
+            tool_result("Traceback (most recent call last):\nKeyError: 'x'"),
+            tool_use("Edit"),
+            tool_use("Bash"),
+            tool_result("3 passed", is_error=False),
+            message("assistant", "Fixed: the key is now optional."),
+        ]
+        signals = score_turn(entries, 800)[1]
+        assert "resolutions" in signals
+        assert "errors" not in signals
+
+    def test_unresolved_error(self):
+        entries = [tool_use("Bash"), tool_result("command not found", is_error=True)]
+        signals = score_turn(entries, 100)[1]
+        assert signals["errors"] == 0.5
+        assert "resolutions" not in signals
+
+    def test_length_caps_at_one(self):
+        assert score_turn([message("user", "x")], 100_000)[1]["length"] == 1.0
+
+    def test_ignores_sidechains(self):
+        entries = [{**tool_use("Edit"), "isSidechain": True}]
+        assert "edits" not in score_turn(entries, 0)[1]
+
+
+class TestDecide:
+    """Tests for decide() and in_sample()."""
+
+    def test_above_threshold_retains(self):
+        with patch.dict("os.environ", {"HINDSIGHT_RETAIN_MIN_SCORE": "1"}):
+            assert decide(1.0, "key") == "retain"
+
+    def test_below_threshold_skips_without_sampling(self):
+        env = {"HINDSIGHT_RETAIN_MIN_SCORE": "1", "HINDSIGHT_RETAIN_SAMPLE_RATE": "0"}
+        with patch.dict("os.environ", env):
+            assert decide(0.5, "key") == "skip"
+
+    def test_below_threshold_sampled(self):
+        env = {"HINDSIGHT_RETAIN_MIN_SCORE": "1", "HINDSIGHT_RETAIN_SAMPLE_RATE": "1"}
+        with patch.dict("os.environ", env):
+            assert decide(0.5, "key") == "sample"
+
+    def test_default_threshold_retains_medium_explanations(self, monkeypatch):
+        monkeypatch.delenv("HINDSIGHT_RETAIN_MIN_SCORE", raising=False)
+        monkeypatch.delenv("HINDSIGHT_RETAIN_SAMPLE_RATE", raising=False)
+        explanation = "The cache is keyed by bank and query, so a changed scope misses it. " * 30
+        entries = [message("user", "Why does recall miss the cache?"), message("assistant", explanation)]
+        score = score_turn(entries, len(explanation))[0]
+        assert decide(score, "explanation") == "retain"
+
+        entries = [message("user", "which port?"), message("assistant", "It listens on 8888.")]
+        assert score_turn(entries, 40)[0] < get_scoring_config()[0]
+
+    def test_zero_threshold_retains_everything(self):
+        with patch.dict("os.environ", {"HINDSIGHT_RETAIN_MIN_SCORE": "0"}):
+            assert decide(0.0, "key") == "retain"
+
+    def test_sample_is_deterministic_and_proportional(self):
+        keys = [f"turn-{i}" for i in range(2000)]
+        sampled = [key for key in keys if in_sample(key, 0.1)]
+        assert sampled == [key for key in keys if in_sample(key, 0.1)]
+        assert 120 < len(sampled) < 280
+
+
+class TestScoringStats:
+    """Tests for record_decision() and get_scoring_stats()."""
+
+    def test_empty(self, state_dir):
+        assert get_scoring_stats() == {"counts": {"retain": 0, "sample": 0, "skip": 0}, "mean_score": 0.0}
+
+    def test_counts_and_mean(self, state_dir):
+        record_decision("retain", 3.0)
+        record_decision("skip", 0.2)
+        record_decision("skip", 0.4)
+        stats = get_scoring_stats()
+        assert stats["counts"] == {"retain": 1, "sample": 0, "skip": 2}
+        assert stats["mean_score"] == pytest.approx(1.2)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Unit tests for session_utils.py"""
+
+import fcntl
+import os
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from session_utils import (
+    count_avoided,
+    end_session,
+    filter_injected,
+    get_avoided,
+    get_live_turns,
+    is_prompt_retained,
+    memory_key,
+    prune_sessions,
+    record_live_turn,
+    record_retained_prompt,
+    reset_injected,
+)
+
+
+class TestMemoryKey:
+    """Tests for memory_key() function."""
+
+    def test_prefers_memory_id(self):
+        assert memory_key("abc-123", "some text") == "abc-123"
+
+    def test_hashes_text_without_id(self):
+        assert memory_key(None, "The user  prefers tabs") == memory_key("", "The user prefers tabs")
+        assert memory_key(None, "a").startswith("sha256:")
+        assert memory_key(None, "a") != memory_key(None, "b")
+
+
+class TestFilterInjected:
+    """Tests for filter_injected() and reset_injected()."""
+
+    def test_suppresses_repeats_within_session(self, state_dir):
+        assert filter_injected("s1", ["a", "b"]) == ["a", "b"]
+        assert filter_injected("s1", ["b", "c", "a"]) == ["c"]
+
+    def test_sessions_are_independent(self, state_dir):
+        filter_injected("s1", ["a"])
+        assert filter_injected("s2", ["a"]) == ["a"]
+
+    def test_duplicates_in_one_recall(self, state_dir):
+        assert filter_injected("s1", ["a", "a"]) == ["a"]
+
+    def test_reset(self, state_dir):
+        filter_injected("s1", ["a"])
+        reset_injected("s1")
+        assert filter_injected("s1", ["a"]) == ["a"]
+
+
+class TestRetainedPrompts:
+    """Tests for record_retained_prompt(), is_prompt_retained() and the avoided counters."""
+
+    def test_round_trip(self, state_dir):
+        assert not is_prompt_retained("s1", "fix the build")
+        record_retained_prompt("s1", "fix the build")
+        assert is_prompt_retained("s1", "fix  the build\n")
+        assert not is_prompt_retained("s2", "fix the build")
+
+    def test_read_does_not_create_state(self, state_dir):
+        is_prompt_retained("s1", "anything")
+        assert list(state_dir.iterdir()) == []
+
+    def test_counters_accumulate(self, state_dir):
+        assert get_avoided() == {"retains_avoided": 0, "bytes_avoided": 0}
+        count_avoided(retains=1, bytes_saved=100)
+        count_avoided(bytes_saved=50)
+        assert get_avoided() == {"retains_avoided": 1, "bytes_avoided": 150}
+
+
+class TestLiveTurns:
+    """Tests for record_live_turn() and get_live_turns()."""
+
+    def test_empty(self, state_dir):
+        assert get_live_turns("s1") == set()
+
+    def test_records_each_turn(self, state_dir):
+        record_live_turn("s1", "2026-01-01T00:00:00Z")
+        record_live_turn("s1", "2026-01-01T00:05:00Z")
+        record_live_turn("s1", "2026-01-01T00:05:00Z")
+        record_live_turn("s2", "2026-01-02T00:00:00Z")
+        assert get_live_turns("s1") == {"2026-01-01T00:00:00Z", "2026-01-01T00:05:00Z"}
+        assert get_live_turns("s2") == {"2026-01-02T00:00:00Z"}
+
+    def test_missing_timestamp_ignored(self, state_dir):
+        record_live_turn("s1", None)
+        assert list(state_dir.iterdir()) == []
+
+    def test_oldest_turns_dropped(self, state_dir):
+        with patch("session_utils.MAX_LIVE_TURNS", 2):
+            for minute in range(3):
+                record_live_turn("s1", f"2026-01-01T00:0{minute}:00Z")
+        assert get_live_turns("s1") == {"2026-01-01T00:01:00Z", "2026-01-01T00:02:00Z"}
+
+    def test_outlive_session_state(self, state_dir):
+        filter_injected("s1", ["a"])
+        record_live_turn("s1", "2026-01-01T00:00:00Z")
+        end_session("s1")
+        stale = time.time() - 8 * 24 * 3600
+        os.utime(state_dir / "live-s1.json", (stale, stale))
+        prune_sessions()
+        assert get_live_turns("s1") == {"2026-01-01T00:00:00Z"}
+
+
+class TestSessionCleanup:
+    """Tests for end_session() and prune_sessions()."""
+
+    def test_end_session_removes_state(self, state_dir):
+        filter_injected("s1", ["a"])
+        filter_injected("s2", ["a"])
+        end_session("s1")
+        assert sorted(p.name for p in state_dir.iterdir()) == ["session-s1.lock", "session-s2.json", "session-s2.lock"]
+        assert filter_injected("s1", ["a"]) == ["a"]
+
+    def test_end_unknown_session(self, state_dir):
+        end_session("missing")
+
+    def test_prune_only_stale_sessions(self, state_dir):
+        filter_injected("old", ["a"])
+        filter_injected("new", ["a"])
+        stale = time.time() - 8 * 24 * 3600
+        os.utime(state_dir / "session-old.json", (stale, stale))
+        assert prune_sessions() == 1
+        names = sorted(p.name for p in state_dir.iterdir())
+        assert names == ["session-new.json", "session-new.lock", "session-old.lock"]
+
+    def test_prune_orphaned_locks(self, state_dir):
+        for session_id in ("ended", "recent", "running"):
+            filter_injected(session_id, ["a"])
+        end_session("ended")
+        end_session("recent")
+        stale = time.time() - 8 * 24 * 3600
+        for name in ("session-ended.lock", "session-running.lock"):
+            os.utime(state_dir / name, (stale, stale))
+        prune_sessions()
+        names = sorted(p.name for p in state_dir.iterdir())
+        # A long-running session keeps its lock; a recently ended one's is not old enough
+        assert names == ["session-recent.lock", "session-running.json", "session-running.lock"]
+
+    def test_held_lock_kept(self, state_dir):
+        filter_injected("s1", ["a"])
+        end_session("s1")
+        lock_path = state_dir / "session-s1.lock"
+        stale = time.time() - 8 * 24 * 3600
+        os.utime(lock_path, (stale, stale))
+        with open(lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            prune_sessions()
+        assert lock_path.exists()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Unit tests for state_utils.py"""
+
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from state_utils import get_state_dir, locked_state, read_state, safe_name, write_state
+
+
+class TestGetStateDir:
+    """Tests for get_state_dir() function."""
+
+    def test_uses_env_override(self, tmp_path):
+        """HINDSIGHT_STATE_DIR overrides the default location."""
+        target = tmp_path / "state"
+        with patch.dict("state_utils.os.environ", {"HINDSIGHT_STATE_DIR": str(target)}):
+            assert get_state_dir() == target
+        assert target.is_dir()
+
+    def test_defaults_to_home(self, tmp_path):
+        """Without an override, state lives in ~/.hindsight-cc."""
+        with patch.dict("state_utils.os.environ", {}, clear=True):
+            with patch("state_utils.Path.home", return_value=tmp_path):
+                assert get_state_dir() == tmp_path / ".hindsight-cc"
+
+
+class TestSafeName:
+    """Tests for safe_name() function."""
+
+    def test_keeps_bank_ids(self):
+        assert safe_name("claude-code--gcswan-hindsight-cc") == "claude-code--gcswan-hindsight-cc"
+
+    def test_replaces_path_separators(self):
+        assert safe_name("claude-code--/-tmp") == "claude-code--_-tmp"
+
+    def test_empty_key(self):
+        assert safe_name("") == "_"
+
+
+class TestReadWriteState:
+    """Tests for read_state() and write_state()."""
+
+    def test_round_trip(self, tmp_path):
+        path = tmp_path / "s.json"
+        write_state(path, {"a": 1})
+        assert read_state(path) == {"a": 1}
+
+    def test_missing_file_is_empty(self, tmp_path):
+        assert read_state(tmp_path / "missing.json") == {}
+
+    def test_corrupt_file_is_empty(self, tmp_path):
+        path = tmp_path / "s.json"
+        path.write_text("{not json")
+        assert read_state(path) == {}
+
+    def test_non_dict_is_empty(self, tmp_path):
+        path = tmp_path / "s.json"
+        path.write_text("[1, 2]")
+        assert read_state(path) == {}
+
+    def test_no_temp_files_left(self, tmp_path):
+        write_state(tmp_path / "s.json", {"a": 1})
+        assert [p.name for p in tmp_path.iterdir()] == ["s.json"]
+
+
+class TestLockedState:
+    """Tests for locked_state() context manager."""
+
+    def test_changes_persist(self, tmp_path):
+        with patch.dict("state_utils.os.environ", {"HINDSIGHT_STATE_DIR": str(tmp_path)}):
+            with locked_state("counter") as state:
+                state["count"] = 1
+            with locked_state("counter") as state:
+                state["count"] += 1
+            assert read_state(tmp_path / "counter.json") == {"count": 2}
+
+    def test_changes_discarded_on_exception(self, tmp_path):
+        with patch.dict("state_utils.os.environ", {"HINDSIGHT_STATE_DIR": str(tmp_path)}):
+            try:
+                with locked_state("counter") as state:
+                    state["count"] = 1
+                    raise RuntimeError("boom")
+            except RuntimeError:
+                pass
+            assert read_state(tmp_path / "counter.json") == {}
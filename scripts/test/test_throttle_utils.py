@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Unit tests for throttle_utils.py"""
+
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from state_utils import locked_state
+from throttle_utils import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_PROMPT,
+    acquire,
+    get_rate_limit,
+    get_stats,
+)
+
+
+@pytest.fixture
+def state_dir(state_dir):
+    """Isolated state (see conftest.py) with a small bucket."""
+    with patch.dict("os.environ", {"HINDSIGHT_RATE_LIMIT": "1", "HINDSIGHT_RATE_BURST": "4"}):
+        yield state_dir
+
+
+def drain(tokens: float) -> None:
+    """Set the bucket to a fixed level."""
+    with locked_state("throttle") as state:
+        state["tokens"] = tokens
+        state["updated"] = time.time()
+
+
+class TestGetRateLimit:
+    """Tests for get_rate_limit() function."""
+
+    def test_defaults(self):
+        with patch.dict("os.environ", {}, clear=True):
+            assert get_rate_limit() == (2.0, 10.0)
+
+    def test_env_overrides(self):
+        env = {"HINDSIGHT_RATE_LIMIT": "0.5", "HINDSIGHT_RATE_BURST": "3"}
+        with patch.dict("os.environ", env, clear=True):
+            assert get_rate_limit() == (0.5, 3.0)
+
+    def test_invalid_values_ignored(self):
+        env = {"HINDSIGHT_RATE_LIMIT": "fast", "HINDSIGHT_RATE_BURST": "-1"}
+        with patch.dict("os.environ", env, clear=True):
+            assert get_rate_limit() == (2.0, 10.0)
+
+
+class TestAcquire:
+    """Tests for acquire() function."""
+
+    def test_full_bucket_grants_immediately(self, state_dir):
+        with patch("throttle_utils.time.sleep") as sleep_mock:
+            assert acquire(PRIORITY_BACKGROUND) is True
+            sleep_mock.assert_not_called()
+        assert get_stats()["stats"][PRIORITY_BACKGROUND]["granted"] == 1
+
+    def test_disabled_when_rate_zero(self, state_dir):
+        with patch.dict("os.environ", {"HINDSIGHT_RATE_LIMIT": "0"}):
+            drain(0)
+            assert acquire(PRIORITY_BACKGROUND) is True
+
+    def test_interactive_never_waits(self, state_dir):
+        """Interactive calls proceed even with an empty bucket."""
+        drain(0)
+        with patch("throttle_utils.time.sleep") as sleep_mock:
+            assert acquire(PRIORITY_INTERACTIVE) is True
+            sleep_mock.assert_not_called()
+        assert get_stats()["tokens"] < 0.5
+
+    def test_background_respects_reserve(self, state_dir):
+        """Background retains leave half the bucket for interactive calls."""
+        drain(2.5)
+        with patch.dict("throttle_utils.PRIORITIES", {PRIORITY_BACKGROUND: (0.5, 0.0)}):
+            assert acquire(PRIORITY_BACKGROUND) is False
+        with patch.dict("throttle_utils.PRIORITIES", {PRIORITY_PROMPT: (0.0, 0.0)}):
+            assert acquire(PRIORITY_PROMPT) is True
+
+    def test_shed_after_max_wait(self, state_dir):
+        """A call that cannot get a token in time is shed and counted."""
+        drain(0)
+        with patch.dict("throttle_utils.PRIORITIES", {PRIORITY_PROMPT: (0.0, 0.05)}):
+            assert acquire(PRIORITY_PROMPT) is False
+        stats = get_stats()["stats"][PRIORITY_PROMPT]
+        assert stats["shed"] == 1
+        assert stats["throttled"] == 1
+        assert stats["throttled_seconds"] > 0
+
+    @pytest.mark.parametrize("priority", [PRIORITY_PROMPT, PRIORITY_BACKGROUND])
+    def test_hook_retains_shed_without_waiting(self, state_dir, priority):
+        """The prompt and Stop hooks never block the user waiting for a token."""
+        drain(0)
+        start = time.monotonic()
+        assert acquire(priority) is False
+        assert time.monotonic() - start < 0.5
+        assert get_stats()["stats"][priority]["throttled"] == 0
+
+    def test_max_wait_override(self, state_dir):
+        """Detached processes can wait longer than their priority's limit."""
+        with patch.dict("os.environ", {"HINDSIGHT_RATE_LIMIT": "50"}):
+            drain(0)
+            assert acquire(PRIORITY_BACKGROUND, max_wait=5.0) is True
+
+    def test_waits_for_refill(self, state_dir):
+        """A call waits for the bucket to refill and records the time throttled."""
+        with patch.dict("os.environ", {"HINDSIGHT_RATE_LIMIT": "50"}):
+            drain(0)
+            assert acquire(PRIORITY_PROMPT, max_wait=2.0) is True
+        stats = get_stats()["stats"][PRIORITY_PROMPT]
+        assert stats["granted"] == 1
+        assert stats["throttled"] == 1
+
+    def test_state_errors_do_not_block(self, state_dir):
+        """Rate limiting is best-effort when the state file is unusable."""
+        with patch("throttle_utils.locked_state", side_effect=OSError("read-only")):
+            assert acquire(PRIORITY_BACKGROUND) is True
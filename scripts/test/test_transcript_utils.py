@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""Unit tests for transcript_utils.py"""
+
+import base64
+import json
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from transcript_utils import (
+    byte_len,
+    collapse_long_blocks,
+    compact_messages,
+    compact_text,
+    extract_text,
+    fold_repeated_lines,
+    format_turn,
+    get_last_turn,
+    get_role_budgets,
+    omit_retained_prompt,
+    parse_timestamp,
+    read_transcript,
+    reference_prompt,
+    split_turns,
+    strip_ansi,
+    strip_base64,
+    truncate_to_budget,
+)
+
+
+class TestReadTranscript:
+    """Tests for read_transcript() and get_last_turn()."""
+
+    def test_reads_jsonl_skipping_blank_lines(self, tmp_path):
+        """Each non-blank line is parsed as one entry."""
+        path = tmp_path / "session.jsonl"
+        path.write_text(json.dumps({"a": 1}) + "\n\n" + json.dumps({"b": 2}) + "\n")
+        assert read_transcript(str(path)) == [{"a": 1}, {"b": 2}]
+
+    def test_last_turn_starts_at_last_user_message(self):
+        """Entries from the last user message onwards are returned."""
+        messages = [
+            {"message": {"role": "user", "content": "first"}},
+            {"message": {"role": "assistant", "content": "one"}},
+            {"message": {"role": "user", "content": "second"}},
+            {"message": {"role": "assistant", "content": "two"}},
+        ]
+        assert get_last_turn(messages) == messages[2:]
+
+    def test_last_turn_empty_without_user_message(self):
+        """No user message means no turn."""
+        assert get_last_turn([{"message": {"role": "assistant"}}]) == []
+
+    def test_tool_results_do_not_start_turns(self):
+        """Tool results carry the user role but are part of the current turn."""
+        messages = [
+            {"message": {"role": "user", "content": "run the tests"}},
+            {"message": {"role": "assistant", "content": [{"type": "tool_use", "name": "Bash"}]}},
+            {"message": {"role": "user", "content": [{"type": "tool_result", "content": "ok"}]}},
+            {"message": {"role": "assistant", "content": "All green."}},
+        ]
+        assert get_last_turn(messages) == messages
+
+    def test_split_turns(self):
+        """Turns start at user prompts; leading metadata is dropped."""
+        messages = [
+            {"type": "summary", "summary": "earlier session"},
+            {"message": {"role": "user", "content": "first"}},
+            {"message": {"role": "assistant", "content": "one"}},
+            {"isMeta": True, "message": {"role": "user", "content": "caveat"}},
+            {"message": {"role": "user", "content": "second"}},
+        ]
+        assert split_turns(messages) == [messages[1:4], messages[4:]]
+
+
+class TestFormatTurn:
+    """Tests for format_turn() function."""
+
+    def test_formats_role_lines(self):
+        entries = [
+            {"message": {"role": "user", "content": "fix it"}},
+            {"message": {"role": "assistant", "content": [{"type": "text", "text": "Fixed."}]}},
+        ]
+        transcript, before, after = format_turn(entries)
+        assert transcript == "user: fix it\nassistant: Fixed."
+        assert before == after == byte_len(transcript)
+
+    def test_skips_empty_and_sidechain_entries(self):
+        entries = [
+            {"message": {"role": "user", "content": "fix it"}},
+            {"message": {"role": "assistant", "content": [{"type": "tool_use", "name": "Edit"}]}},
+            {"isSidechain": True, "message": {"role": "assistant", "content": "subagent chatter"}},
+        ]
+        assert format_turn(entries)[0] == "user: fix it"
+
+    def test_reports_compaction(self):
+        entries = [{"message": {"role": "user", "content": "log:\n" + "same line\n" * 100}}]
+        transcript, before, after = format_turn(entries)
+        assert after < before
+        assert "repeated" in transcript
+
+
+class TestReferencePrompt:
+    """Tests for reference_prompt() and omit_retained_prompt()."""
+
+    def test_long_prompt_excerpted(self):
+        entry = {"uuid": "1", "message": {"role": "user", "content": [{"type": "text", "text": "word " * 500}]}}
+        reference = reference_prompt(entry, max_chars=50)
+        assert reference is not None
+        content = reference["message"]["content"]
+        assert content.startswith("[retained prompt] word")
+        assert content.endswith(" ...")
+        assert len(content) < 100
+        assert reference["uuid"] == "1"
+        assert entry["message"]["content"][0]["text"] == "word " * 500
+
+    def test_short_prompt_not_referenced(self):
+        """A reference to a short prompt would be longer than the prompt."""
+        entry = {"message": {"role": "user", "content": "fix  the\nbuild"}}
+        assert reference_prompt(entry) is None
+
+    @pytest.mark.parametrize("length", [5, 20, 60, 80, 150, 1000, 20000])
+    def test_retained_payload_shrinks(self, length):
+        prompt = ("x" * 9 + " ") * (length // 10) or "x" * length
+        entries = [
+            {"message": {"role": "user", "content": prompt}},
+            {"message": {"role": "assistant", "content": [{"type": "text", "text": "Done."}]}},
+        ]
+        trimmed, saved_bytes = omit_retained_prompt(entries)
+        before, after = format_turn(entries)[0], format_turn(trimmed)[0]
+        assert saved_bytes == byte_len(before) - byte_len(after) > 0
+        assert after.endswith("assistant: Done.")
+
+    def test_turn_not_formatted(self):
+        """The saving is measured on the prompt alone, not by formatting the turn."""
+        entries = [
+            {"message": {"role": "user", "content": "word " * 500}},
+            {"message": {"role": "assistant", "content": "Done."}},
+        ]
+        with patch("transcript_utils.format_turn", side_effect=AssertionError("formatted")):
+            _, saved_bytes = omit_retained_prompt(entries)
+        assert saved_bytes > 0
+
+    def test_short_prompt_dropped(self):
+        entries = [
+            {"message": {"role": "user", "content": "fix the build"}},
+            {"message": {"role": "assistant", "content": "Fixed."}},
+        ]
+        trimmed, _ = omit_retained_prompt(entries)
+        assert format_turn(trimmed)[0] == "assistant: Fixed."
+
+
+class TestExtractText:
+    """Tests for extract_text() function."""
+
+    def test_string_content_unchanged(self):
+        assert extract_text("hello") == "hello"
+
+    def test_list_content_keeps_text_parts(self):
+        """Only text parts of list content are kept."""
+        content = [
+            {"type": "text", "text": "a"},
+            {"type": "tool_use", "name": "Bash"},
+            {"type": "text", "text": "b"},
+        ]
+        assert extract_text(content) == "a\nb"
+
+    def test_other_content_serialized(self):
+        """Non-string, non-list content is serialized as JSON."""
+        assert extract_text({"k": "v"}) == '{"k": "v"}'
+
+
+class TestStripping:
+    """Tests for strip_ansi() and strip_base64()."""
+
+    def test_strips_ansi_colour_codes(self):
+        assert strip_ansi("\x1b[31mERROR\x1b[0m failed") == "ERROR failed"
+
+    def test_replaces_data_uri(self):
+        """Data URIs are replaced with a size marker."""
+        text = "image: data:image/png;base64," + "A" * 400 + " end"
+        result = strip_base64(text)
+        assert result.startswith("image: [base64 data:")
+        assert result.endswith(" end")
+
+    def test_replaces_long_base64_run(self):
+        """Long bare base64 runs are replaced with a size marker."""
+        blob = base64.b64encode(bytes(range(256)) * 2).decode()
+        result = strip_base64("blob " + blob + " end")
+        assert result == "blob [base64 data: 684 B] end"
+
+    def test_keeps_long_letter_runs(self):
+        """Long runs without the mix of cases and digits base64 has are kept."""
+        text = "=" * 10 + "a" * 300
+        assert strip_base64(text) == text
+
+    def test_keeps_short_tokens(self):
+        """Hashes and short identifiers are not treated as blobs."""
+        sha = "3f786850e387550fdab836ed7e6dc881de23001b"
+        assert strip_base64(sha) == sha
+
+
+class TestFoldRepeatedLines:
+    """Tests for fold_repeated_lines() function."""
+
+    def test_folds_identical_runs(self):
+        text = "start\n" + "retrying\n" * 5 + "done"
+        assert fold_repeated_lines(text) == "start\nretrying\n[previous line repeated 4 more times]\ndone"
+
+    def test_single_repeat_kept(self):
+        """A line repeated once is kept as-is; the marker would not save anything."""
+        assert fold_repeated_lines("a\na\nb") == "a\na\nb"
+
+    def test_blank_runs_collapse_without_marker(self):
+        assert fold_repeated_lines("a\n\n\n\n\nb") == "a\n\n\nb"
+
+
+class TestCollapseLongBlocks:
+    """Tests for collapse_long_blocks() function."""
+
+    def test_short_text_unchanged(self):
+        text = "para one\nline two\n\npara two"
+        assert collapse_long_blocks(text) == text
+
+    def test_collapses_long_fenced_block(self):
+        """Long fenced blocks keep fences and a head/tail excerpt."""
+        body = [f"line {i}" for i in range(100)]
+        text = "intro\n```python\n" + "\n".join(body) + "\n```\noutro"
+        result = collapse_long_blocks(text).split("\n")
+        assert result[0] == "intro"
+        assert result[1] == "```python"
+        assert result[2] == "line 0"
+        assert "[... 85 lines" in result[12]
+        assert result[-3] == "line 99"
+        assert result[-2] == "```"
+        assert result[-1] == "outro"
+
+    def test_collapses_long_unfenced_run(self):
+        """Pasted logs without fences are collapsed too."""
+        log = "\n".join(f"2026-01-01 INFO request {i}" for i in range(60))
+        result = collapse_long_blocks("what is wrong here?\n\n" + log)
+        assert result.startswith("what is wrong here?\n\n2026-01-01 INFO request 0")
+        assert "request 30" not in result
+        assert result.endswith("request 59")
+
+    def test_unterminated_fence(self):
+        """An unterminated fence is collapsed to the end of the text."""
+        text = "```\n" + "\n".join(str(i) for i in range(100))
+        result = collapse_long_blocks(text)
+        assert result.startswith("```\n0\n")
+        assert result.endswith("\n99")
+        assert "omitted" in result
+
+
+class TestTruncateToBudget:
+    """Tests for truncate_to_budget() function."""
+
+    def test_within_budget_unchanged(self):
+        assert truncate_to_budget("short", 100) == "short"
+
+    def test_keeps_head_and_tail(self):
+        text = "H" * 1000 + "T" * 1000
+        result = truncate_to_budget(text, 300)
+        assert result.startswith("H" * 200)
+        assert result.endswith("T" * 100)
+        assert "truncated" in result
+
+    def test_does_not_split_multibyte_characters(self):
+        """Cuts fall on character boundaries."""
+        result = truncate_to_budget("é" * 1000, 101)
+        result.encode("utf-8")
+        assert "�" not in result
+
+
+class TestCompaction:
+    """Tests for compact_text(), compact_messages() and get_role_budgets()."""
+
+    def test_compact_text_pipeline(self):
+        text = "\x1b[1mhello\x1b[0m\n" + "x\n" * 10 + "done"
+        assert compact_text(text) == "hello\nx\n[previous line repeated 9 more times]\ndone"
+
+    def test_compact_text_applies_budget(self):
+        text = "\n\n".join("word " * 50 for _ in range(20))
+        assert byte_len(compact_text(text, max_bytes=500)) < 600
+
+    def test_roles_held_to_budget(self):
+        """Each role's messages share that role's budget."""
+        messages = [
+            ("user", "u" * 5000),
+            ("assistant", "a" * 3000),
+            ("assistant", "b" * 1000),
+        ]
+        result = compact_messages(messages, budgets={"user": 1000, "assistant": 2000})
+        assert [role for role, _ in result] == ["user", "assistant", "assistant"]
+        assert byte_len(result[0][1]) < 1100
+        assert byte_len(result[1][1]) + byte_len(result[2][1]) < 2200
+        # Larger messages get a proportionally larger share
+        assert byte_len(result[1][1]) > byte_len(result[2][1])
+
+    def test_within_budget_unchanged(self):
+        messages = [("user", "fix the bug"), ("assistant", "done")]
+        assert compact_messages(messages, budgets={"user": 100, "assistant": 100}) == messages
+
+    def test_unknown_role_uses_default_budget(self):
+        result = compact_messages([("system", "s" * 5000)], budgets={}, default_budget=100)
+        assert byte_len(result[0][1]) < 200
+
+    def test_budget_env_overrides(self):
+        """HINDSIGHT_RETAIN_MAX_BYTES_<ROLE> overrides a role's budget."""
+        env = {
+            "HINDSIGHT_RETAIN_MAX_BYTES_USER": "1234",
+            "HINDSIGHT_RETAIN_MAX_BYTES_ASSISTANT": "not-a-number",
+        }
+        with patch.dict("transcript_utils.os.environ", env, clear=True):
+            budgets = get_role_budgets()
+        assert budgets["user"] == 1234
+        assert budgets["assistant"] == 8192
+
+
+class TestParseTimestamp:
+    """Tests for parse_timestamp() function."""
+
+    def test_zulu_suffix(self):
+        assert parse_timestamp("2026-01-01T00:00:00Z") == datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    def test_naive_assumed_utc(self):
+        assert parse_timestamp("2026-01-01T00:00:00") == datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    def test_invalid_or_empty(self):
+        assert parse_timestamp("yesterday") is None
+        assert parse_timestamp("") is None
+        assert parse_timestamp(None) is None
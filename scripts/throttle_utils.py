@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Machine-wide rate limiting for Hindsight server calls.
+
+All Claude sessions on a machine share one local Hindsight container. A token
+bucket stored in the plugin state directory coordinates every hook process, so
+bursts (several sessions ending at once) are smoothed instead of piling onto the
+server and slowing recall on the prompt path.
+
+Calls are tagged with a priority:
+
+- "interactive": recalls and other calls a user is waiting on. Never throttled;
+  they draw from the bucket so that retains back off while recall is busy.
+- "prompt": prompt retains. Never wait, because the UserPromptSubmit hook
+  delays the prompt.
+- "background": transcript retains and other bulk work. Leave a reserve of
+  tokens for interactive calls and never wait by default, because the Stop hook
+  that retains transcripts blocks the user. Detached processes (backfill, async
+  reflect workers, the retain drain worker) pass their own max_wait.
+
+When a retain cannot get a token within its wait limit, acquire() returns False
+as a backpressure signal. Hooks then queue the retain for drain-retains.py (see
+retain_queue_utils); other callers skip or postpone the call. Time spent waiting and
+skipped calls are counted per priority for get-status.py.
+"""
+
+import os
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from state_utils import locked_state
+
+STATE_NAME = "throttle"
+
+DEFAULT_RATE = 2.0  # tokens refilled per second
+DEFAULT_BURST = 10.0  # bucket capacity
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_PROMPT = "prompt"
+PRIORITY_BACKGROUND = "background"
+
+# priority: (fraction of the bucket left in reserve, max seconds to wait)
+PRIORITIES: Dict[str, Tuple[float, float]] = {
+    PRIORITY_INTERACTIVE: (0.0, 0.0),
+    PRIORITY_PROMPT: (0.0, 0.0),
+    PRIORITY_BACKGROUND: (0.5, 0.0),
+}
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read a non-negative float from the environment, falling back to default."""
+    try:
+        value = float(os.environ.get(name, ""))
+    except ValueError:
+        return default
+    return value if value >= 0 else default
+
+
+def get_rate_limit() -> Tuple[float, float]:
+    """
+    Return the configured (rate, burst) for the shared bucket.
+
+    HINDSIGHT_RATE_LIMIT sets tokens per second (0 disables throttling) and
+    HINDSIGHT_RATE_BURST sets the bucket capacity.
+    """
+    rate = _env_float("HINDSIGHT_RATE_LIMIT", DEFAULT_RATE)
+    burst = max(_env_float("HINDSIGHT_RATE_BURST", DEFAULT_BURST), 1.0)
+    return rate, burst
+
+
+def _refill(state: dict, rate: float, burst: float, now: float) -> float:
+    """Top up the bucket for time elapsed since the last update and return the token count."""
+    tokens = state.get("tokens", burst)
+    updated = state.get("updated", now)
+    tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+    state["tokens"] = tokens
+    state["updated"] = now
+    return tokens
+
+
+def _record(state: dict, priority: str, waited: float, granted: bool) -> None:
+    """Update per-priority counters."""
+    stats = state.setdefault("stats", {}).setdefault(
+        priority, {"granted": 0, "throttled": 0, "throttled_seconds": 0.0, "shed": 0}
+    )
+    if granted:
+        stats["granted"] += 1
+    else:
+        stats["shed"] += 1
+    if waited > 0:
+        stats["throttled"] += 1
+        stats["throttled_seconds"] = round(stats["throttled_seconds"] + waited, 3)
+
+
+def acquire(
+    priority: str = PRIORITY_BACKGROUND,
+    debug_callback: Optional[Callable[[str], None]] = None,
+    max_wait: Optional[float] = None,
+) -> bool:
+    """
+    Take a token from the machine-wide bucket, waiting if needed.
+
+    Interactive calls never wait and are always granted. Other priorities wait
+    until the bucket holds more than their reserve, up to their wait limit.
+
+    Args:
+        priority: One of the PRIORITY_* constants
+        debug_callback: Optional function to call with debug messages
+        max_wait: Seconds to wait for a token, overriding the priority's limit
+
+    Returns:
+        True if the call may proceed, False if it should be skipped (backpressure)
+    """
+
+    def debug(msg: str):
+        if debug_callback:
+            debug_callback(msg)
+
+    rate, burst = get_rate_limit()
+    if rate <= 0:
+        return True
+
+    reserve_fraction, default_wait = PRIORITIES.get(priority, PRIORITIES[PRIORITY_BACKGROUND])
+    max_wait = default_wait if max_wait is None else max_wait
+    needed = 1.0 + reserve_fraction * burst
+    start = time.monotonic()
+    waited = 0.0
+
+    try:
+        while True:
+            with locked_state(STATE_NAME) as state:
+                tokens = _refill(state, rate, burst, time.time())
+                if priority == PRIORITY_INTERACTIVE or tokens >= needed:
+                    state["tokens"] = max(0.0, tokens - 1.0)
+                    _record(state, priority, waited, granted=True)
+                    if waited > 0:
+                        debug(f"Throttled {priority} call for {waited:.2f}s")
+                    return True
+                if waited >= max_wait:
+                    _record(state, priority, waited, granted=False)
+                    debug(f"Backpressure: {priority} call shed after {waited:.2f}s ({tokens:.1f} tokens left)")
+                    return False
+            # Sleep outside the lock until enough tokens should have refilled
+            time.sleep(min((needed - tokens) / rate, max_wait - waited) + 0.01)
+            waited = time.monotonic() - start
+    except OSError as e:
+        # Rate limiting is best-effort; never block a call on state file errors
+        debug(f"Rate limiter unavailable: {e}")
+        return True
+
+
+def get_stats() -> dict:
+    """
+    Return the current bucket level and per-priority counters.
+
+    Returns:
+        Dict with "tokens", "rate", "burst" and "stats" keyed by priority
+    """
+    rate, burst = get_rate_limit()
+    with locked_state(STATE_NAME) as state:
+        tokens = _refill(state, rate, burst, time.time()) if rate > 0 else burst
+        return {
+            "tokens": tokens,
+            "rate": rate,
+            "burst": burst,
+            "stats": dict(state.get("stats", {})),
+        }
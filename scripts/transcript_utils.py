@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+Shared utilities for reading and compacting Claude Code transcripts.
+
+Transcripts are retained for LLM extraction on the Hindsight server, so every byte
+sent costs server work and LLM spend. Pasted logs, stack traces and code dumps tend
+to dominate that payload while contributing little to recall. This module turns raw
+transcript messages into role-tagged text and compacts it: ANSI escapes and base64
+blobs are stripped, repeated lines are folded, long code blocks and logs collapse to
+head/tail excerpts, and each role is held to a byte budget.
+"""
+
+import json
+import os
+import re
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+# Byte budget for each role across a whole turn, overridable per role with
+# HINDSIGHT_RETAIN_MAX_BYTES_<ROLE> (e.g. HINDSIGHT_RETAIN_MAX_BYTES_USER=4096)
+DEFAULT_ROLE_BUDGETS: Dict[str, int] = {
+    "user": 8192,
+    "assistant": 8192,
+}
+DEFAULT_OTHER_BUDGET = 2048
+
+# Blocks longer than this many lines are collapsed to a head/tail excerpt
+MAX_BLOCK_LINES = 40
+EXCERPT_HEAD_LINES = 10
+EXCERPT_TAIL_LINES = 5
+
+# Characters of an already-retained prompt kept when a transcript references it
+PROMPT_REFERENCE_CHARS = 40
+
+# Base64 runs shorter than this are left alone (hashes, short tokens, IDs)
+MIN_BASE64_CHARS = 200
+
+ANSI_PATTERN = re.compile(r"\x1b\[[0-9;?]*[ -/]*[@-~]|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)")
+DATA_URI_PATTERN = re.compile(r"data:[\w.+-]+/[\w.+-]+;base64,[A-Za-z0-9+/=]+(?:\r?\n[A-Za-z0-9+/=]+)*")
+BASE64_PATTERN = re.compile(r"[A-Za-z0-9+/]{%d,}={0,2}" % MIN_BASE64_CHARS)
+FENCE_PATTERN = re.compile(r"^\s*(```|~~~)")
+
+
+def byte_len(text: str) -> int:
+    """Return the UTF-8 encoded size of text in bytes."""
+    return len(text.encode("utf-8"))
+
+
+def format_size(num_bytes: int) -> str:
+    """
+    Format a byte count for size markers.
+
+    Examples:
+        512 -> "512 B"
+        20480 -> "20.0 KB"
+    """
+    if num_bytes < 1024:
+        return f"{num_bytes} B"
+    return f"{num_bytes / 1024:.1f} KB"
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parse an ISO 8601 timestamp as an aware datetime.
+
+    Naive timestamps are assumed to be UTC. Returns None for empty or invalid values.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def read_transcript(transcript_path: str) -> List[dict]:
+    """
+    Read a Claude Code JSONL transcript.
+
+    Args:
+        transcript_path: Path to the transcript file (``~`` is expanded)
+
+    Returns:
+        List of transcript entries in file order
+
+    Raises:
+        FileNotFoundError: If the transcript does not exist
+        json.JSONDecodeError: If a line is not valid JSON
+    """
+    messages = []
+    with open(os.path.expanduser(transcript_path), "r") as f:
+        for line in f:
+            if line.strip():
+                messages.append(json.loads(line))
+    return messages
+
+
+def is_user_prompt(entry: dict) -> bool:
+    """
+    Return True if a transcript entry is a prompt typed by the user.
+
+    Tool results are also recorded with the user role, but carry no text parts,
+    so they do not start a new turn. Meta entries injected by Claude Code are
+    skipped as well.
+    """
+    inner = entry.get("message", {})
+    if inner.get("role") != "user" or entry.get("isMeta"):
+        return False
+    return bool(extract_text(inner.get("content", "")).strip())
+
+
+def get_last_turn(messages: List[dict]) -> List[dict]:
+    """
+    Return the entries from the last user prompt onwards.
+
+    Args:
+        messages: Transcript entries in file order
+
+    Returns:
+        Entries of the final turn, or an empty list if there is no user prompt
+    """
+    for i in range(len(messages) - 1, -1, -1):
+        if is_user_prompt(messages[i]):
+            return messages[i:]
+    return []
+
+
+def reference_prompt(entry: dict, max_chars: int = PROMPT_REFERENCE_CHARS) -> Optional[dict]:
+    """
+    Replace a prompt entry's text with a short reference to the retained prompt.
+
+    Used when the prompt was already retained on its own, so the transcript keeps
+    the start of it for context without sending it again.
+
+    Args:
+        entry: Transcript entry of a user prompt
+        max_chars: Characters of the prompt to keep
+
+    Returns:
+        A copy of the entry with the reference as its content, or None if the
+        reference would not be smaller than the prompt (drop the entry instead)
+    """
+    text = " ".join(extract_text(entry.get("message", {}).get("content", "")).split())
+    excerpt = text[:max_chars].rsplit(" ", 1)[0] if len(text) > max_chars else text
+    reference = f"[retained prompt] {excerpt} ..."
+    if byte_len(reference) >= byte_len(text):
+        return None
+    message = {**entry.get("message", {}), "content": reference}
+    return {**entry, "message": message}
+
+
+def omit_retained_prompt(entries: List[dict]) -> Tuple[List[dict], int]:
+    """
+    Replace a turn's already-retained prompt with a reference, or drop it.
+
+    The saving is measured on the prompt entry alone, so the turn is not
+    formatted just to find out; it is exact unless other user entries in the
+    turn share the prompt's byte budget.
+
+    Args:
+        entries: Transcript entries of one turn, starting at its prompt
+
+    Returns:
+        (entries, saved_bytes) where saved_bytes is how much smaller the
+        formatted turn becomes; the entries are unchanged if nothing is saved
+    """
+    message = entries[0].get("message", {})
+    text = extract_text(message.get("content", ""))
+    if not text.strip():
+        return entries, 0
+    role = message.get("role", "unknown")
+    prompt_bytes = byte_len(compact_text(text, max_bytes=get_role_budgets().get(role, DEFAULT_OTHER_BUDGET)))
+    reference = reference_prompt(entries[0])
+    if reference is None:
+        # The whole "role: text" line and its line break go
+        trimmed, saved_bytes = entries[1:], prompt_bytes + byte_len(f"{role}: \n")
+    else:
+        trimmed, saved_bytes = [reference] + entries[1:], prompt_bytes - byte_len(reference["message"]["content"])
+    if saved_bytes <= 0:
+        return entries, 0
+    return trimmed, saved_bytes
+
+
+def split_turns(messages: List[dict]) -> List[List[dict]]:
+    """
+    Split a transcript into turns, each starting at a user prompt.
+
+    Entries before the first prompt (summaries, session metadata) are dropped.
+
+    Args:
+        messages: Transcript entries in file order
+
+    Returns:
+        List of turns, each a list of entries
+    """
+    turns: List[List[dict]] = []
+    for entry in messages:
+        if is_user_prompt(entry):
+            turns.append([entry])
+        elif turns:
+            turns[-1].append(entry)
+    return turns
+
+
+def extract_text(content) -> str:
+    """
+    Extract the text of a transcript message's content.
+
+    List content keeps only ``text`` parts; any other non-string content is
+    serialized as JSON.
+
+    Args:
+        content: The ``content`` field of a transcript message
+
+    Returns:
+        Message text
+    """
+    if isinstance(content, list):
+        return "\n".join(
+            part.get("text", "") for part in content if isinstance(part, dict) and part.get("type") == "text"
+        ).strip()
+    elif not isinstance(content, str):
+        return json.dumps(content, ensure_ascii=True)
+    return content
+
+
+def strip_ansi(text: str) -> str:
+    """Remove ANSI colour and cursor escape sequences."""
+    return ANSI_PATTERN.sub("", text)
+
+
+def strip_base64(text: str) -> str:
+    """
+    Replace data URIs and long base64 runs with a size marker.
+
+    Examples:
+        "img: data:image/png;base64,iVBOR..." -> "img: [base64 data: 12.3 KB]"
+    """
+
+    def marker(match: re.Match) -> str:
+        return f"[base64 data: {format_size(byte_len(match.group(0)))}]"
+
+    def blob_marker(match: re.Match) -> str:
+        # Real base64 mixes cases and digits; long runs of plain letters
+        # (repeated characters, long identifiers) are left alone
+        blob = match.group(0)
+        if not (re.search(r"[a-z]", blob) and re.search(r"[A-Z]", blob) and re.search(r"[0-9]", blob)):
+            return blob
+        return marker(match)
+
+    text = DATA_URI_PATTERN.sub(marker, text)
+    return BASE64_PATTERN.sub(blob_marker, text)
+
+
+def fold_repeated_lines(text: str) -> str:
+    """
+    Fold runs of identical consecutive lines into one line and a repeat marker.
+
+    Examples:
+        "retrying\\nretrying\\nretrying" -> "retrying\\n[previous line repeated 2 more times]"
+    """
+    lines = text.split("\n")
+    folded: List[str] = []
+    i = 0
+    while i < len(lines):
+        j = i + 1
+        while j < len(lines) and lines[j] == lines[i]:
+            j += 1
+        folded.append(lines[i])
+        repeats = j - i - 1
+        if repeats == 1:
+            folded.append(lines[i])
+        elif repeats > 1 and lines[i].strip():
+            folded.append(f"[previous line repeated {repeats} more times]")
+        elif repeats > 1:
+            # Collapse runs of blank lines without a marker
+            folded.append(lines[i])
+        i = j
+    return "\n".join(folded)
+
+
+def _excerpt(lines: List[str], max_lines: int) -> List[str]:
+    """Collapse a block of lines to head/tail lines around an omission marker."""
+    if len(lines) <= max_lines:
+        return lines
+    head = lines[:EXCERPT_HEAD_LINES]
+    tail = lines[-EXCERPT_TAIL_LINES:]
+    omitted = lines[EXCERPT_HEAD_LINES:-EXCERPT_TAIL_LINES]
+    omitted_bytes = byte_len("\n".join(omitted))
+    marker = f"[... {len(omitted)} lines ({format_size(omitted_bytes)}) omitted ...]"
+    return head + [marker] + tail
+
+
+def collapse_long_blocks(text: str, max_lines: int = MAX_BLOCK_LINES) -> str:
+    """
+    Collapse long fenced code blocks and long unbroken runs of lines.
+
+    Fenced blocks (``` or ~~~) longer than max_lines keep their fences and a
+    head/tail excerpt. Outside fences, a run of more than max_lines consecutive
+    non-blank lines (pasted logs, stack traces, diffs) is collapsed the same way.
+    Prose rarely runs that long without a blank line, so it is left intact.
+
+    Args:
+        text: Text to compact
+        max_lines: Longest block kept verbatim
+
+    Returns:
+        Text with long blocks replaced by excerpts
+    """
+    lines = text.split("\n")
+    result: List[str] = []
+    run: List[str] = []
+    fence: Optional[str] = None
+    fenced: List[str] = []
+
+    def flush_run():
+        result.extend(_excerpt(run, max_lines))
+        run.clear()
+
+    for line in lines:
+        fence_match = FENCE_PATTERN.match(line)
+        if fence is not None:
+            if fence_match and fence_match.group(1) == fence:
+                result.extend(_excerpt(fenced, max_lines))
+                result.append(line)
+                fence = None
+                fenced = []
+            else:
+                fenced.append(line)
+        elif fence_match:
+            flush_run()
+            result.append(line)
+            fence = fence_match.group(1)
+        elif line.strip():
+            run.append(line)
+        else:
+            flush_run()
+            result.append(line)
+
+    if fence is not None:
+        # Unterminated fence: treat the remainder as one block
+        result.extend(_excerpt(fenced, max_lines))
+    flush_run()
+    return "\n".join(result)
+
+
+def truncate_to_budget(text: str, max_bytes: int) -> str:
+    """
+    Cut text to roughly max_bytes, keeping the head and tail around a size marker.
+
+    Two thirds of the budget go to the head and the rest to the tail, since the
+    start of a message usually carries the intent and the end the outcome.
+
+    Args:
+        text: Text to truncate
+        max_bytes: Byte budget for the result
+
+    Returns:
+        The original text if within budget, otherwise a head/tail excerpt
+    """
+    size = byte_len(text)
+    if size <= max_bytes:
+        return text
+
+    encoded = text.encode("utf-8")
+    head_bytes = max_bytes * 2 // 3
+    tail_bytes = max_bytes - head_bytes
+    head = encoded[:head_bytes].decode("utf-8", errors="ignore")
+    tail = encoded[size - tail_bytes :].decode("utf-8", errors="ignore") if tail_bytes else ""
+    omitted = size - byte_len(head) - byte_len(tail)
+    return f"{head}\n[... {format_size(omitted)} truncated ...]\n{tail}"
+
+
+def compact_text(text: str, max_bytes: Optional[int] = None) -> str:
+    """
+    Run the full compaction pipeline over a single piece of text.
+
+    Args:
+        text: Text to compact
+        max_bytes: Optional byte budget applied after structural compaction
+
+    Returns:
+        Compacted text
+    """
+    text = strip_ansi(text)
+    text = strip_base64(text)
+    text = fold_repeated_lines(text)
+    text = collapse_long_blocks(text)
+    if max_bytes is not None:
+        text = truncate_to_budget(text, max_bytes)
+    return text
+
+
+def get_role_budgets() -> Dict[str, int]:
+    """
+    Return per-role byte budgets, applying HINDSIGHT_RETAIN_MAX_BYTES_<ROLE> overrides.
+
+    Invalid or non-positive overrides are ignored.
+    """
+    budgets = dict(DEFAULT_ROLE_BUDGETS)
+    prefix = "HINDSIGHT_RETAIN_MAX_BYTES_"
+    for key, value in os.environ.items():
+        if not key.startswith(prefix):
+            continue
+        try:
+            budget = int(value)
+        except ValueError:
+            continue
+        if budget > 0:
+            budgets[key[len(prefix) :].lower()] = budget
+    return budgets
+
+
+def compact_messages(
+    messages: List[Tuple[str, str]],
+    budgets: Optional[Dict[str, int]] = None,
+    default_budget: int = DEFAULT_OTHER_BUDGET,
+) -> List[Tuple[str, str]]:
+    """
+    Compact role-tagged messages, holding each role to its byte budget.
+
+    Each message is compacted structurally first. If a role's messages still
+    exceed its budget, the budget is shared between them in proportion to their
+    size and each is truncated to its share.
+
+    Args:
+        messages: (role, text) pairs in turn order
+        budgets: Per-role byte budgets (defaults to get_role_budgets())
+        default_budget: Budget for roles not listed in budgets
+
+    Returns:
+        Compacted (role, text) pairs in the same order
+    """
+    if budgets is None:
+        budgets = get_role_budgets()
+
+    compacted = [(role, compact_text(text)) for role, text in messages]
+
+    totals: Dict[str, int] = {}
+    for role, text in compacted:
+        totals[role] = totals.get(role, 0) + byte_len(text)
+
+    result = []
+    for role, text in compacted:
+        budget = budgets.get(role, default_budget)
+        total = totals[role]
+        if total > budget:
+            share = max(budget * byte_len(text) // total, 1)
+            text = truncate_to_budget(text, share)
+        result.append((role, text))
+    return result
+
+
+def format_turn(
+    entries: List[dict],
+    budgets: Optional[Dict[str, int]] = None,
+) -> Tuple[str, int, int]:
+    """
+    Format a turn's entries as compacted "role: text" lines.
+
+    Sidechain (subagent) entries and entries without text are skipped.
+
+    Args:
+        entries: Transcript entries of one turn
+        budgets: Per-role byte budgets (defaults to get_role_budgets())
+
+    Returns:
+        (transcript, bytes_before, bytes_after) where the byte counts measure the
+        formatted text before and after compaction
+    """
+    turn = []
+    for entry in entries:
+        if entry.get("isSidechain"):
+            continue
+        inner = entry.get("message", {})
+        text = extract_text(inner.get("content", ""))
+        if text.strip():
+            turn.append((inner.get("role", "unknown"), text))
+
+    bytes_before = byte_len("\n".join(f"{role}: {text}" for role, text in turn))
+    transcript = "\n".join(f"{role}: {text}" for role, text in compact_messages(turn, budgets))
+    return transcript, bytes_before, byte_len(transcript)